@@ -0,0 +1,310 @@
+"""
+비싼 분석 라우트의 입장 제어(admission control) 모듈
+라우트별 동시 실행 수 제한 + 짧은 대기열 + 클라이언트별 토큰 버킷 레이트 리밋.
+상태는 SharedState(SQLite)에 두어 gunicorn 워커 전체에 걸쳐 적용됩니다.
+
+환경변수:
+    PAWBOX_PROXY_HOPS   앱 앞의 신뢰하는 리버스 프록시 수 (기본 0 = X-Forwarded-For 무시)
+                        프록시가 덧붙인 X-Forwarded-For 항목만 클라이언트 주소로 사용
+"""
+
+import os
+import math
+import time
+import asyncio
+from functools import wraps
+
+from flask import request, jsonify
+
+
+# werkzeug ProxyFix의 x_for와 같은 의미 — ASGI 라우트도 같은 규칙을 쓰도록 client_id()에서 처리
+TRUSTED_PROXY_HOPS = int(os.environ.get('PAWBOX_PROXY_HOPS', 0))
+
+
+class AdmissionRejected(Exception):
+    """대기열이 가득 찼거나 레이트 리밋 초과"""
+
+    def __init__(self, message, status=503, retry_after=1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RouteLimit:
+    """라우트별 제한값"""
+
+    def __init__(self, concurrency=4, queue_size=8, queue_timeout=10.0):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            concurrency=int(os.environ.get('PAWBOX_ANALYZE_CONCURRENCY', 4)),
+            queue_size=int(os.environ.get('PAWBOX_ANALYZE_QUEUE', 8)),
+            queue_timeout=float(os.environ.get('PAWBOX_QUEUE_TIMEOUT', 10)),
+        )
+
+
+class AdmissionController:
+    """라우트별 동시성 슬롯과 클라이언트별 토큰 버킷 관리"""
+
+    NAMESPACE = 'admission'
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, state, limits=None, default_limit=None,
+                 rate_per_minute=None, burst=None, lease_seconds=120):
+        """
+        Args:
+            state: SharedState 인스턴스
+            limits: {route: RouteLimit} (없는 라우트는 default_limit 사용)
+            rate_per_minute: 클라이언트별 분당 허용 요청 수 (0이면 비활성)
+            burst: 토큰 버킷 용량
+            lease_seconds: 슬롯 임대 시간 (워커가 죽어도 슬롯이 회수되도록)
+        """
+        self.state = state
+        self.limits = limits or {}
+        self.default_limit = default_limit or RouteLimit.from_env()
+        self.rate_per_minute = float(
+            rate_per_minute if rate_per_minute is not None
+            else os.environ.get('PAWBOX_RATE_PER_MIN', 30)
+        )
+        self.burst = float(burst if burst is not None else os.environ.get('PAWBOX_RATE_BURST', 10))
+        self.lease_seconds = lease_seconds
+
+        state.ensure_schema(
+            "CREATE TABLE IF NOT EXISTS admission_slots ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " route TEXT, state TEXT, expires REAL)",
+            "CREATE INDEX IF NOT EXISTS admission_slots_route ON admission_slots (route, state, id)",
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " client TEXT PRIMARY KEY, tokens REAL, updated REAL)",
+            "CREATE INDEX IF NOT EXISTS rate_buckets_updated ON rate_buckets (updated)",
+        )
+
+    def limit_for(self, route):
+        return self.limits.get(route, self.default_limit)
+
+    # ──────────────────────────────────────────────────────────
+    #  토큰 버킷
+    # ──────────────────────────────────────────────────────────
+
+    def _take_token(self, conn, client, now):
+        if self.rate_per_minute <= 0:
+            return True, 0
+
+        refill = self.rate_per_minute / 60.0
+        # burst / refill초 동안 요청이 없던 버킷은 이미 가득 참 → 행이 없는 것과 같으므로 삭제
+        conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - self.burst / refill,))
+        row = conn.execute(
+            "SELECT tokens, updated FROM rate_buckets WHERE client = ?", (client,)
+        ).fetchone()
+        tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * refill)
+
+        if tokens < 1:
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (client, tokens, updated) VALUES (?, ?, ?)",
+                (client, tokens, now)
+            )
+            return False, math.ceil((1 - tokens) / refill)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_buckets (client, tokens, updated) VALUES (?, ?, ?)",
+            (client, tokens - 1, now)
+        )
+        return True, 0
+
+    # ──────────────────────────────────────────────────────────
+    #  슬롯 획득/해제
+    # ──────────────────────────────────────────────────────────
+
+    def _retry_after(self, conn, route, waiting):
+        """평균 처리 시간 × 앞선 대기 인원 / 동시성으로 재시도 시점 추정"""
+        counters = dict(conn.execute(
+            "SELECT name, value FROM counters WHERE namespace = ? AND name IN (?, ?)",
+            (self.NAMESPACE, f'{route}.completed', f'{route}.service_seconds')
+        ).fetchall())
+        completed = counters.get(f'{route}.completed', 0)
+        avg = counters.get(f'{route}.service_seconds', 0) / completed if completed else 2.0
+        limit = self.limit_for(route)
+        return max(1, math.ceil(avg * (waiting + 1) / max(1, limit.concurrency)))
+
+    def _enter(self, route, client):
+        """
+        토큰 차감 후 즉시 실행 가능하면 active 슬롯, 아니면 queued 슬롯을 잡는다.
+        Returns: (slot_id, admitted)
+        """
+        # 거절 카운터가 롤백되지 않도록 트랜잭션을 정상 종료한 뒤 예외를 던진다
+        with self.state.transaction() as conn:
+            outcome = self._enter_locked(conn, route, client, time.time())
+
+        if isinstance(outcome, AdmissionRejected):
+            raise outcome
+        return outcome
+
+    def _enter_locked(self, conn, route, client, now):
+        limit = self.limit_for(route)
+        conn.execute("DELETE FROM admission_slots WHERE expires < ?", (now,))
+
+        ok, wait = self._take_token(conn, client, now)
+        if not ok:
+            self.state.incr(self.NAMESPACE, f'{route}.rate_limited', conn=conn)
+            return AdmissionRejected('요청이 너무 많습니다. 잠시 후 다시 시도해 주세요',
+                                     status=429, retry_after=wait)
+
+        active, queued = self._occupancy(conn, route)
+        if active < limit.concurrency and queued == 0:
+            cur = conn.execute(
+                "INSERT INTO admission_slots (route, state, expires) VALUES (?, 'active', ?)",
+                (route, now + self.lease_seconds)
+            )
+            self.state.incr(self.NAMESPACE, f'{route}.admitted', conn=conn)
+            return cur.lastrowid, True
+
+        if queued >= limit.queue_size:
+            self.state.incr(self.NAMESPACE, f'{route}.rejected', conn=conn)
+            return AdmissionRejected('서버가 혼잡합니다. 잠시 후 다시 시도해 주세요',
+                                     retry_after=self._retry_after(conn, route, queued))
+
+        cur = conn.execute(
+            "INSERT INTO admission_slots (route, state, expires) VALUES (?, 'queued', ?)",
+            (route, now + limit.queue_timeout + self.POLL_INTERVAL * 10)
+        )
+        self.state.incr(self.NAMESPACE, f'{route}.queued', conn=conn)
+        return cur.lastrowid, False
+
+    def _poll(self, route, slot_id):
+        """대기열 맨 앞이고 빈 슬롯이 있으면 active로 승격"""
+        limit = self.limit_for(route)
+        now = time.time()
+
+        with self.state.transaction() as conn:
+            conn.execute("DELETE FROM admission_slots WHERE expires < ?", (now,))
+            head = conn.execute(
+                "SELECT MIN(id) FROM admission_slots WHERE route = ? AND state = 'queued'", (route,)
+            ).fetchone()[0]
+            active, _ = self._occupancy(conn, route)
+
+            if head == slot_id and active < limit.concurrency:
+                conn.execute(
+                    "UPDATE admission_slots SET state = 'active', expires = ? WHERE id = ?",
+                    (now + self.lease_seconds, slot_id)
+                )
+                self.state.incr(self.NAMESPACE, f'{route}.admitted', conn=conn)
+                return True
+            return False
+
+    def _give_up(self, route, slot_id):
+        with self.state.transaction() as conn:
+            conn.execute("DELETE FROM admission_slots WHERE id = ?", (slot_id,))
+            self.state.incr(self.NAMESPACE, f'{route}.rejected', conn=conn)
+            queued = self._occupancy(conn, route)[1]
+            retry_after = self._retry_after(conn, route, queued)
+        raise AdmissionRejected('대기 시간이 초과되었습니다. 잠시 후 다시 시도해 주세요',
+                                retry_after=retry_after)
+
+    def _occupancy(self, conn, route):
+        rows = dict(conn.execute(
+            "SELECT state, COUNT(*) FROM admission_slots WHERE route = ? GROUP BY state", (route,)
+        ).fetchall())
+        return rows.get('active', 0), rows.get('queued', 0)
+
+    def acquire(self, route, client):
+        """슬롯을 잡을 때까지 대기 (동기). Returns: slot_id"""
+        slot_id, admitted = self._enter(route, client)
+        deadline = time.monotonic() + self.limit_for(route).queue_timeout
+        while not admitted:
+            if time.monotonic() >= deadline:
+                self._give_up(route, slot_id)
+            time.sleep(self.POLL_INTERVAL)
+            admitted = self._poll(route, slot_id)
+        return slot_id
+
+    async def acquire_async(self, route, client):
+        """acquire의 비동기 버전 (대기 중 이벤트 루프를 막지 않음)"""
+        slot_id, admitted = await asyncio.to_thread(self._enter, route, client)
+        deadline = time.monotonic() + self.limit_for(route).queue_timeout
+        while not admitted:
+            if time.monotonic() >= deadline:
+                await asyncio.to_thread(self._give_up, route, slot_id)
+            await asyncio.sleep(self.POLL_INTERVAL)
+            admitted = await asyncio.to_thread(self._poll, route, slot_id)
+        return slot_id
+
+    def release(self, route, slot_id, service_seconds):
+        with self.state.transaction() as conn:
+            conn.execute("DELETE FROM admission_slots WHERE id = ?", (slot_id,))
+            self.state.incr(self.NAMESPACE, f'{route}.completed', conn=conn)
+            self.state.incr(self.NAMESPACE, f'{route}.service_seconds', service_seconds, conn=conn)
+
+    # ──────────────────────────────────────────────────────────
+    #  Flask 연동
+    # ──────────────────────────────────────────────────────────
+
+    def limit(self, route):
+        """라우트 데코레이터: 슬롯을 잡은 뒤 핸들러 실행, 거절 시 429/503 + Retry-After"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    slot_id = self.acquire(route, client_id())
+                except AdmissionRejected as e:
+                    return rejected_response(e)
+
+                started = time.monotonic()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    self.release(route, slot_id, time.monotonic() - started)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """라우트별 admitted/queued/rejected 카운터와 현재 점유 현황"""
+        counters = self.state.counters(self.NAMESPACE)
+        routes = {}
+        for key, value in counters.items():
+            route, name = key.rsplit('.', 1)
+            routes.setdefault(route, {})[name] = value
+
+        conn = self.state.connect()
+        now = time.time()
+        for route, state, count in conn.execute(
+            "SELECT route, state, COUNT(*) FROM admission_slots WHERE expires >= ? GROUP BY route, state",
+            (now,)
+        ).fetchall():
+            routes.setdefault(route, {})[f'current_{state}'] = count
+
+        for route, values in routes.items():
+            limit = self.limit_for(route)
+            values['limit'] = {'concurrency': limit.concurrency,
+                               'queue_size': limit.queue_size,
+                               'queue_timeout': limit.queue_timeout}
+        return routes
+
+
+def client_id(headers=None, remote_addr=None, trusted_hops=None):
+    """
+    프록시(Render 등) 뒤에서도 원 클라이언트를 구분.
+    X-Forwarded-For의 앞쪽 항목은 클라이언트가 마음대로 넣을 수 있으므로,
+    신뢰하는 프록시 수(trusted_hops)만큼 뒤에서 센 항목(프록시가 덧붙인 주소)만 사용합니다.
+    인자가 없으면 현재 Flask 요청에서 읽습니다.
+    """
+    if headers is None:
+        headers, remote_addr = request.headers, request.remote_addr
+    if trusted_hops is None:
+        trusted_hops = TRUSTED_PROXY_HOPS
+
+    if trusted_hops > 0:
+        forwarded = [v.strip() for v in headers.get('X-Forwarded-For', '').split(',') if v.strip()]
+        if len(forwarded) >= trusted_hops:
+            return forwarded[-trusted_hops]
+    return remote_addr or 'unknown'
+
+
+def rejected_response(error):
+    response = jsonify({'error': str(error)})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
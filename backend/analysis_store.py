@@ -0,0 +1,215 @@
+"""
+업로드 이미지 분석 기록 저장소
+분석 API가 저장한 업로드 파일(image_id = uploads/ 안의 파일명)과 분석 결과를 묶어 두어
+이후 요청이 이미지를 다시 올리거나 Vision을 다시 호출하지 않고 image_id로 참조합니다.
+같은 이미지·방법·기준 크기의 분석은 한 번만 수행됩니다.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from werkzeug.utils import secure_filename
+
+
+DIMENSIONS = ('width', 'height', 'depth')
+IMAGE_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'})
+
+
+def apply_overrides(dimensions, overrides):
+    """
+    분석 치수에 요청의 width/height/depth를 덮어씀 (없거나 빈 값은 분석 결과 유지).
+    Returns: 새 dict (원본 기록은 바꾸지 않음)
+    """
+    result = dict(dimensions)
+    for key in DIMENSIONS:
+        value = overrides.get(key)
+        if value not in (None, ''):
+            result[key] = float(value)
+    return result
+
+
+def reusable(method, dimensions):
+    """
+    기록해 재사용해도 되는 분석인지.
+    Vision 호출이 실패해(429·시간 초과 등 일시적 오류) 로컬/OpenCV로 대신 답한 결과는
+    기록하지 않아 다음 요청이 다시 분석하게 합니다.
+    """
+    if method == 'auto':
+        cascade = dimensions.get('cascade')
+        if cascade is None:    # 캐스케이드 전체 실패 → OpenCV 폴백
+            return False
+        return cascade['tier'] != 'local' or not any(s.get('failed') for s in cascade['steps'])
+    return method == 'opencv' or dimensions.get('method') != 'opencv'
+
+
+class AnalysisStore:
+    """image_id → 업로드 파일 경로 / 분석 결과"""
+
+    def __init__(self, upload_folder, state=None, max_entries=10000, extensions=IMAGE_EXTENSIONS):
+        """
+        Args:
+            upload_folder: 업로드 디렉토리 (image_id 해석 기준)
+            state: SharedState (있으면 워커 간 공유·재시작 후 유지, 없으면 메모리)
+            max_entries: 보관할 최대 분석 기록 수 (오래된 것부터 삭제)
+            extensions: image_id로 허용할 이미지 확장자
+                        (수신 중인 스트리밍 업로드 '<uuid>.part' 등은 참조 불가)
+        """
+        self.upload_folder = upload_folder
+        self.extensions = frozenset(extensions)
+        self.state = state
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._records = OrderedDict()    # state가 없을 때: (image_id, method, reference) → dimensions
+        self._stats = {'recorded': 0, 'lookups': 0, 'hits': 0}
+
+        if state is not None:
+            state.ensure_schema(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                " image_id TEXT, method TEXT, reference TEXT, dimensions TEXT, created REAL,"
+                " PRIMARY KEY (image_id, method, reference))",
+                "CREATE INDEX IF NOT EXISTS analyses_created ON analyses (image_id, created)"
+            )
+
+    @staticmethod
+    def _reference(reference_size):
+        return f'{float(reference_size):g}' if reference_size not in (None, '') else ''
+
+    def path(self, image_id):
+        """
+        image_id → 업로드 파일 경로. 경로 조작이 섞였거나, 이미지 확장자가 아니거나,
+        파일이 없으면 None (업로드는 항상 secure_filename을 거친 이미지 이름으로 저장됨)
+        """
+        if not image_id or image_id != secure_filename(image_id) or image_id.startswith('.'):
+            return None
+        if '.' not in image_id or image_id.rsplit('.', 1)[1].lower() not in self.extensions:
+            return None
+        filepath = os.path.join(self.upload_folder, image_id)
+        return filepath if os.path.isfile(filepath) else None
+
+    # ──────────────────────────────────────────────────────────
+    #  기록 / 조회
+    # ──────────────────────────────────────────────────────────
+
+    def record(self, image_id, method, reference_size, dimensions):
+        """분석 결과 기록 (같은 image_id·방법·기준 크기는 덮어씀)"""
+        key = (image_id, method, self._reference(reference_size))
+        if self.state is None:
+            with self._lock:
+                self._records[key] = dict(dimensions)
+                self._records.move_to_end(key)
+                while len(self._records) > self.max_entries:
+                    self._records.popitem(last=False)
+        else:
+            with self.state.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?)",
+                    (*key, json.dumps(dimensions, ensure_ascii=False), time.time())
+                )
+                conn.execute(
+                    "DELETE FROM analyses WHERE rowid NOT IN "
+                    "(SELECT rowid FROM analyses ORDER BY created DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+
+        with self._lock:
+            self._stats['recorded'] += 1
+
+    def get(self, image_id, method=None, reference_size=None):
+        """
+        분석 기록 조회.
+        method가 None이면 이 이미지의 가장 최근 분석 (방법·기준 크기 무관)
+        Returns: 치수 dict 또는 None
+        """
+        dimensions = self._get(image_id, method, reference_size)
+        with self._lock:
+            self._stats['lookups'] += 1
+            if dimensions is not None:
+                self._stats['hits'] += 1
+        return dimensions
+
+    def _get(self, image_id, method, reference_size):
+        if self.state is None:
+            with self._lock:
+                if method is not None:
+                    found = self._records.get((image_id, method, self._reference(reference_size)))
+                    return dict(found) if found is not None else None
+                for key in reversed(self._records):
+                    if key[0] == image_id:
+                        return dict(self._records[key])
+                return None
+
+        conn = self.state.connect()
+        if method is not None:
+            row = conn.execute(
+                "SELECT dimensions FROM analyses WHERE image_id = ? AND method = ? AND reference = ?",
+                (image_id, method, self._reference(reference_size))
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT dimensions FROM analyses WHERE image_id = ? ORDER BY created DESC LIMIT 1",
+                (image_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._records)
+        if self.state is not None:
+            entries = self.state.connect().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        stats['entries'] = entries
+        stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 3) if stats['lookups'] else 0.0
+        return stats
+
+
+def test_analysis_store():
+    """image_id 검증 / 방법별 기록 / 최근 기록 조회 / 덮어쓰기 확인"""
+    import tempfile
+    from shared_state import SharedState
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_id = 'f3b1_cat.jpg'
+        partial = f'{uuid.uuid4()}.part'    # streaming_upload가 수신 중에 쓰는 이름
+        for name in (image_id, partial):
+            with open(os.path.join(tmp, name), 'wb') as f:
+                f.write(b'\xff\xd8')
+
+        for state in (None, SharedState(os.path.join(tmp, 'state.sqlite3'))):
+            store = AnalysisStore(tmp, state=state)
+            assert store.path(image_id) == os.path.join(tmp, image_id)
+            for bad in ('../state.sqlite3', partial, 'state.sqlite3', 'missing.jpg', ''):
+                assert store.path(bad) is None, bad
+
+            store.record(image_id, 'opencv', 420, {'width': 500, 'height': 400, 'depth': 450})
+            time.sleep(0.01)
+            store.record(image_id, 'auto', None, {'width': 520, 'height': 380, 'depth': 430})
+
+            assert store.get(image_id, 'opencv', '420')['width'] == 500
+            assert store.get(image_id, 'opencv') is None
+            assert store.get(image_id)['width'] == 520
+            assert store.get('other.jpg') is None
+
+            dims = apply_overrides(store.get(image_id), {'width': '600', 'depth': ''})
+            assert (dims['width'], dims['height'], dims['depth']) == (600.0, 380, 430)
+            assert store.get(image_id)['width'] == 520
+            print(f"{'SQLite' if state else '메모리'}: {store.stats()}")
+
+    # Vision 실패로 대신 답한 결과는 재사용하지 않음
+    local = {'tier': 'local', 'steps': [{'tier': 'local'}]}
+    assert reusable('auto', {'cascade': local})
+    assert reusable('auto', {'cascade': {'tier': 'vision_high', 'steps': [
+        {'tier': 'local'}, {'tier': 'vision_low', 'failed': True}, {'tier': 'vision_high'}]}})
+    assert not reusable('auto', {'cascade': {'tier': 'local', 'steps': [
+        {'tier': 'local'}, {'tier': 'vision_low', 'failed': True}, {'tier': 'vision_high', 'failed': True}]}})
+    assert not reusable('auto', {'method': 'opencv'})
+    assert reusable('opencv', {'method': 'opencv'}) and reusable('gemini', {'method': 'gemini'})
+    assert not reusable('gemini', {'method': 'opencv'})
+
+
+if __name__ == '__main__':
+    test_analysis_store()
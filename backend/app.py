@@ -5,14 +5,25 @@ Flask 기반 웹 인터페이스
 
 import os
 import uuid
-import base64
+import zlib
+import itertools
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, url_for
+from flask import Flask, render_template, request, jsonify, send_file, url_for, redirect
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 from image_analyzer import ImageAnalyzer
+from breed_knowledge import BreedKnowledgeBase
 from box_generator import BoxGenerator
+from box_catalog import BoxCatalog, QuantizationPolicy
+from output_store import OutputStore
+from analysis_store import AnalysisStore, apply_overrides, reusable
+import storage
+from shared_state import SharedState
+from admission import AdmissionController
+from idempotency import IdempotencyStore
+import streaming_upload
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -21,22 +32,46 @@ load_dotenv()
 app = Flask(__name__)
 
 # CORS 설정 - 외부 호스팅(Cloudflare 등) 환경에서도 접근할 수 있도록 모든 Origin 허용
-CORS(app, resources={r"/*": {"origins": "*"}})
+CORS(app, resources={r"/*": {"origins": "*"}},
+     expose_headers=['Content-Disposition', 'X-Box-Dimensions'])
 
 
 # 설정
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['OUTPUT_FOLDER'] = 'outputs'
+# send_file은 상대 경로를 app.root_path 기준으로 해석하므로 실행 위치 기준 절대 경로로 고정
+app.config['UPLOAD_FOLDER'] = os.path.abspath('uploads')
+app.config['OUTPUT_FOLDER'] = os.path.abspath('outputs')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB 제한
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+# 다운로드 본문 전송을 리버스 프록시에 넘김 (PAWBOX_SENDFILE)
+#   x-sendfile: Apache/lighttpd — X-Sendfile: <파일 경로>
+#   x-accel:    nginx — X-Accel-Redirect: <PAWBOX_ACCEL_PREFIX><파일명> (internal location)
+app.config['SENDFILE'] = os.environ.get('PAWBOX_SENDFILE', '').lower()
+app.config['ACCEL_PREFIX'] = os.environ.get('PAWBOX_ACCEL_PREFIX', '/_protected/outputs/')
+app.config['USE_X_SENDFILE'] = app.config['SENDFILE'] == 'x-sendfile'
+
+# 인라인 SVG 응답을 앱에서 gzip 압축 (리버스 프록시가 압축하면 0으로 끔)
+app.config['INLINE_GZIP'] = os.environ.get('PAWBOX_INLINE_GZIP', '1') != '0'
+
 # 디렉토리 생성
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
 # 전역 객체
-analyzer = ImageAnalyzer()
-generator = BoxGenerator(output_dir=app.config['OUTPUT_FOLDER'])
+shared_state = SharedState()
+analyzer = ImageAnalyzer(knowledge=BreedKnowledgeBase.from_env(shared_state))
+generator = BoxGenerator(
+    output_dir=app.config['OUTPUT_FOLDER'],
+    quantization=QuantizationPolicy.from_env(),
+    store=OutputStore(app.config['OUTPUT_FOLDER'], state=shared_state,
+                      storage=storage.from_env(app.config['OUTPUT_FOLDER']))
+)
+generator.catalog = BoxCatalog(generator.render_svg, state=shared_state)
+generator.catalog.warm_in_background(generator.quantization)
+admission = AdmissionController(shared_state)
+idempotency = IdempotencyStore(shared_state)
+analyses = AnalysisStore(app.config['UPLOAD_FOLDER'], state=shared_state,
+                         extensions=app.config['ALLOWED_EXTENSIONS'])
 
 
 def allowed_file(filename):
@@ -45,6 +80,63 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
 
+def request_fields():
+    """multipart 폼 또는 JSON 본문 필드"""
+    if request.mimetype == 'application/json':
+        return request.get_json(silent=True) or {}
+    return request.form
+
+
+def stored_or_uploaded(data):
+    """
+    이전 업로드 참조(image_id) 또는 새 업로드 파일 → uploads/에 있는 이미지.
+    Returns: (image_id, filepath) 또는 오류 응답
+    """
+    image_id = data.get('image_id')
+    if image_id:
+        filepath = analyses.path(image_id)
+        if filepath is None:
+            return error_response('업로드된 이미지를 찾을 수 없습니다', 404)
+        return image_id, filepath
+
+    if 'image' not in request.files:
+        return error_response('이미지 파일이 없습니다', 400)
+
+    file = request.files['image']
+    if file.filename == '':
+        return error_response('파일이 선택되지 않았습니다', 400)
+
+    if not allowed_file(file.filename):
+        return error_response('허용되지 않은 파일 형식입니다', 400)
+
+    filename = secure_filename(file.filename)
+    unique_filename = f"{uuid.uuid4()}_{filename}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+    file.save(filepath)
+    return unique_filename, filepath
+
+
+def error_response(message, status):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+def analyze_upload(image_id, filepath, method=None, reference_size=None):
+    """
+    같은 이미지·방법·기준 크기의 분석 기록이 있으면 재사용, 없으면 분석 후 기록
+    (Vision 실패로 대신 답한 결과는 기록하지 않음 — analysis_store.reusable).
+    method가 None이면 방법과 무관하게 가장 최근 기록 (기록이 없으면 'auto'로 분석)
+    """
+    dimensions = analyses.get(image_id, method, reference_size)
+    if dimensions is None:
+        method = method or 'auto'
+        dimensions = analyzer.analyze(filepath, method=method, reference_size=reference_size)
+        if reusable(method, dimensions):
+            analyses.record(image_id, method, reference_size, dimensions)
+    return dimensions
+
+
 @app.route('/')
 def index():
     """메인 페이지"""
@@ -52,44 +144,36 @@ def index():
 
 
 @app.route('/api/analyze', methods=['POST'])
+@idempotency.idempotent('analyze')
+@admission.limit('analyze')
 def analyze_image():
-    """이미지 분석 API (FormData)"""
+    """
+    이미지 분석 API (FormData)
+    파일 대신 image_id(이전 응답의 image_id)를 보내면 저장된 이미지를 다시 분석
+    (같은 방법·기준 크기의 기록이 있으면 분석 없이 반환)
+    """
     try:
-        # 파일 확인
-        if 'image' not in request.files:
-            return jsonify({'error': '이미지 파일이 없습니다'}), 400
-        
-        file = request.files['image']
-        if file.filename == '':
-            return jsonify({'error': '파일이 선택되지 않았습니다'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': '허용되지 않은 파일 형식입니다'}), 400
-        
-        # 파일 저장
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
+        data = request_fields()
+        saved = stored_or_uploaded(data)
+        if not isinstance(saved, tuple):
+            return saved
+        image_id, filepath = saved
         
         # 분석 방법
-        method = request.form.get('method', 'auto')
-        reference_size = request.form.get('reference_size')
+        method = data.get('method', 'auto')
+        reference_size = data.get('reference_size')
         if reference_size:
             reference_size = float(reference_size)
         
         # 이미지 분석
-        dimensions = analyzer.analyze(
-            filepath,
-            method=method,
-            reference_size=reference_size
-        )
+        dimensions = analyze_upload(image_id, filepath, method, reference_size)
         
         # 결과 반환
         return jsonify({
             'success': True,
             'dimensions': dimensions,
-            'image_path': unique_filename
+            'image_id': image_id,
+            'image_path': image_id
         })
         
     except Exception as e:
@@ -97,25 +181,30 @@ def analyze_image():
 
 
 @app.route('/api/analyze-base64', methods=['POST'])
+@idempotency.idempotent('analyze-base64')
+@admission.limit('analyze-base64')
 def analyze_image_base64():
-    """이미지 분석 API (Base64)"""
+    """
+    이미지 분석 API (Base64 JSON 또는 application/octet-stream)
+    본문을 스트리밍으로 디코딩해 디스크에 바로 쓰므로 이미지 전체가 메모리에 올라가지 않습니다.
+    octet-stream 본문이면 filename/method/reference_size는 쿼리 파라미터로 받습니다.
+    """
     try:
-        data = request.get_json()
-        
-        if not data or 'image_base64' not in data:
-            return jsonify({'error': '이미지 데이터가 없습니다'}), 400
-        
-        # Base64 디코딩
-        image_data = base64.b64decode(data['image_base64'])
-        
-        # 임시 파일로 저장
-        filename = data.get('filename', 'upload.jpg')
-        filename = secure_filename(filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        with open(filepath, 'wb') as f:
-            f.write(image_data)
+        raw = request.mimetype == 'application/octet-stream'
+        try:
+            unique_filename, filepath, data = streaming_upload.ingest(
+                request.stream,
+                app.config['UPLOAD_FOLDER'],
+                raw=raw,
+                filename=request.args.get('filename') if raw else None
+            )
+        except RequestEntityTooLarge:
+            return jsonify({'error': '파일이 너무 큽니다'}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if raw:
+            data = request.args
         
         # 분석 방법
         method = data.get('method', 'auto')
@@ -124,16 +213,13 @@ def analyze_image_base64():
             reference_size = float(reference_size)
         
         # 이미지 분석
-        dimensions = analyzer.analyze(
-            filepath,
-            method=method,
-            reference_size=reference_size
-        )
+        dimensions = analyze_upload(unique_filename, filepath, method, reference_size)
         
         # 결과 반환
         return jsonify({
             'success': True,
             'dimensions': dimensions,
+            'image_id': unique_filename,
             'image_path': unique_filename
         })
         
@@ -142,24 +228,46 @@ def analyze_image_base64():
 
 
 @app.route('/api/generate', methods=['POST'])
+@idempotency.idempotent('generate')
 def generate_box():
-    """박스 도면 생성 API"""
+    """
+    박스 도면 생성 API
+    image_id를 보내면 그 이미지의 최근 분석 치수를 쓰고 width/height/depth는 덮어쓸 값만 받음
+    (이미지 업로드·분석 없이 렌더링만 수행)
+    """
     try:
         data = request.get_json()
         
         # 치수
-        width = float(data.get('width', 100))
-        height = float(data.get('height', 50))
-        depth = float(data.get('depth', 100))
+        dimensions = {'width': 100, 'height': 50, 'depth': 100}
+        image_id = data.get('image_id')
+        if image_id:
+            dimensions = analyses.get(image_id)
+            if dimensions is None:
+                return jsonify({'error': '분석 기록을 찾을 수 없습니다'}), 404
+        dimensions = apply_overrides(dimensions, data)
+        width = float(dimensions['width'])
+        height = float(dimensions['height'])
+        depth = float(dimensions['depth'])
         
         # 옵션
         box_type = data.get('box_type', 'Box')
         thickness = float(data.get('thickness', 3.0))
         output_format = data.get('format', 'svg')
         use_simple = data.get('simple', True)
+
+        # 인라인: SVG를 파일로 쓰지 않고 응답 본문으로 바로 스트리밍 (다운로드 요청 불필요)
+        if data.get('inline') or request.args.get('inline') == '1':
+            if not (use_simple or output_format == 'svg'):
+                return jsonify({'error': '인라인 응답은 SVG 도면만 지원합니다'}), 400
+            params, chunks = generator.stream_simple_box_svg(
+                width, height, depth, thickness, persist=bool(data.get('persist', False))
+            )
+            return svg_stream_response(params, chunks)
         
         # 도면 생성
         if use_simple or output_format == 'svg':
+            drawn = generator.drawn_dimensions(width, height, depth, thickness)
             output_path = generator.create_simple_box_svg(
                 width=width,
                 height=height,
@@ -175,15 +283,18 @@ def generate_box():
                 thickness=thickness,
                 output_format=output_format
             )
+            generator.store.storage.publish(output_path)
+            drawn = (width, height, depth, thickness)
         
         # 파일명 추출
         filename = os.path.basename(output_path)
         
         return jsonify({
             'success': True,
+            'box_dimensions': box_dimensions(drawn),
             'filename': filename,
             'download_url': url_for('download_file', filename=filename),
-            'file_size': os.path.getsize(output_path)
+            'file_size': generator.store.storage.size(filename)
         })
         
     except Exception as e:
@@ -191,33 +302,27 @@ def generate_box():
 
 
 @app.route('/api/generate-from-image', methods=['POST'])
+@idempotency.idempotent('generate-from-image')
+@admission.limit('generate-from-image')
 def generate_from_image():
-    """이미지에서 직접 박스 생성 (통합 API)"""
+    """
+    이미지에서 직접 박스 생성 (통합 API)
+    파일 대신 image_id를 보내면 저장된 이미지와 분석 기록을 재사용
+    (width/height/depth를 함께 보내면 분석 치수를 덮어씀)
+    """
     try:
-        # 파일 확인
-        if 'image' not in request.files:
-            return jsonify({'error': '이미지 파일이 없습니다'}), 400
-        
-        file = request.files['image']
-        if file.filename == '':
-            return jsonify({'error': '파일이 선택되지 않았습니다'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': '허용되지 않은 파일 형식입니다'}), 400
+        data = request_fields()
+        saved = stored_or_uploaded(data)
+        if not isinstance(saved, tuple):
+            return saved
+        image_id, filepath = saved
         
-        # 파일 저장
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
-        
-        # 1. 이미지 분석
-        method = request.form.get('method', 'auto')
-        dimensions = analyzer.analyze(filepath, method=method)
+        # 1. 이미지 분석 (method를 지정하지 않으면 최근 분석 기록 재사용)
+        method = data.get('method') or None
+        dimensions = apply_overrides(analyze_upload(image_id, filepath, method), data)
         
         # 2. 박스 생성
-        thickness = float(request.form.get('thickness', 3.0))
-        output_format = request.form.get('format', 'svg')
+        thickness = float(data.get('thickness', 3.0))
         
         output_path = generator.create_simple_box_svg(
             width=dimensions['width'],
@@ -227,13 +332,18 @@ def generate_from_image():
         )
         
         output_filename = os.path.basename(output_path)
+        drawn = generator.drawn_dimensions(
+            dimensions['width'], dimensions['height'], dimensions['depth'], thickness
+        )
         
         return jsonify({
             'success': True,
             'dimensions': dimensions,
+            'box_dimensions': box_dimensions(drawn),
+            'image_id': image_id,
             'filename': output_filename,
             'download_url': url_for('download_file', filename=output_filename),
-            'file_size': os.path.getsize(output_path)
+            'file_size': generator.store.storage.size(output_filename)
         })
         
     except Exception as e:
@@ -249,28 +359,108 @@ def get_box_types():
     })
 
 
+@app.route('/api/stats')
+def get_stats():
+    """운영 지표 (입장 제어 카운터 등)"""
+    return jsonify({
+        'admission': admission.stats(),
+        'vision': analyzer.usage_stats(),
+        'providers': analyzer.vision.stats(),
+        'cascade': analyzer.cascade_stats(),
+        'knowledge': analyzer.knowledge.stats(),
+        'analyses': analyses.stats(),
+        'catalog': generator.catalog.stats(),
+        'outputs': generator.store.stats(),
+        'idempotency': idempotency.stats()
+    })
+
+
+def box_dimensions(params):
+    """실제로 그린 치수 (양자화 후) — 인라인 응답의 X-Box-Dimensions와 같은 값"""
+    return dict(zip(('width', 'height', 'depth', 'thickness'), params))
+
+
+def gzip_stream(chunks, level=6):
+    """바이트 조각 → gzip 조각. 조각마다 SYNC_FLUSH해 만든 부분이 바로 클라이언트로 나감"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def svg_stream_response(params, chunks):
+    """
+    SVG 조각 생성기 → chunked 스트리밍 응답 (클라이언트가 받으면 gzip).
+    첫 조각은 미리 만들어 렌더링 초기 오류가 500 JSON으로 처리되게 함.
+    """
+    w, h, d, t = params
+    first = next(chunks)
+    body = (chunk.encode('utf-8') for chunk in itertools.chain([first], chunks))
+
+    headers = {
+        'Content-Disposition': f'inline; filename="box_{w:g}x{h:g}x{d:g}_t{t:g}.svg"',
+        'X-Box-Dimensions': f'{w:g},{h:g},{d:g},{t:g}',
+        'Vary': 'Accept-Encoding',
+    }
+    if app.config['INLINE_GZIP'] and request.accept_encodings['gzip']:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return app.response_class(body, mimetype='image/svg+xml', headers=headers)
+
+
+def send_output(filename, as_attachment):
+    """
+    저장소의 출력 파일 응답 — 가능한 한 워커가 본문을 보내지 않도록
+    - S3: presigned URL로 리다이렉트 (본문/Range 요청은 스토리지가 처리)
+    - 로컬 + PAWBOX_SENDFILE: 헤더만 보내고 본문은 리버스 프록시가 전송
+    - 로컬: send_file (ETag/If-None-Match 304, Range 206 처리)
+    """
+    not_found = jsonify({'error': '파일을 찾을 수 없습니다'}), 404
+    if secure_filename(filename) != filename:
+        return not_found
+
+    backend = generator.store.storage
+    url = backend.url(filename, download_name=filename if as_attachment else None)
+    if url:
+        # 존재 확인(HEAD)도 생략 — 없는 파일이면 스토리지가 404
+        return redirect(url, code=302)
+
+    filepath = backend.local_path(filename)
+    if not os.path.exists(filepath):
+        return not_found
+
+    mimetype = storage.content_type(filename)
+    if app.config['SENDFILE'] == 'x-accel':
+        response = app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = app.config['ACCEL_PREFIX'] + filename
+        if as_attachment:
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    # USE_X_SENDFILE이면 Flask가 X-Sendfile 헤더만 보냄
+    return send_file(
+        filepath,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=filename,
+        conditional=True
+    )
+
+
 @app.route('/download/<filename>')
 def download_file(filename):
     """파일 다운로드"""
-    filepath = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-    if os.path.exists(filepath):
-        return send_file(
-            filepath,
-            as_attachment=True,
-            download_name=filename
-        )
-    else:
-        return jsonify({'error': '파일을 찾을 수 없습니다'}), 404
+    return send_output(filename, as_attachment=True)
 
 
 @app.route('/preview/<filename>')
 def preview_file(filename):
     """파일 미리보기 (SVG)"""
-    filepath = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-    if os.path.exists(filepath) and filename.endswith('.svg'):
-        return send_file(filepath, mimetype='image/svg+xml')
-    else:
+    if not filename.endswith('.svg'):
         return jsonify({'error': '파일을 찾을 수 없습니다'}), 404
+    return send_output(filename, as_attachment=False)
 
 
 @app.route('/health')
@@ -279,7 +469,8 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'gemini_api_available': analyzer.model is not None
+        'gemini_api_available': 'gemini' in analyzer.vision.names,
+        'vision_providers': analyzer.vision.names
     })
 
 
@@ -289,7 +480,7 @@ if __name__ == '__main__':
     print("=" * 60)
     print(f"업로드 폴더: {os.path.abspath(app.config['UPLOAD_FOLDER'])}")
     print(f"출력 폴더: {os.path.abspath(app.config['OUTPUT_FOLDER'])}")
-    print(f"OpenAI API: {'사용 가능' if analyzer.model == 'openai' else '사용 불가 (OpenCV만 사용)'}")
+    print(f"Vision 제공자: {', '.join(analyzer.vision.names) or '없음 (OpenCV만 사용)'}")
     print("=" * 60)
     print("서버 시작 중...")
     print("브라우저에서 http://localhost:5000 접속")
@@ -0,0 +1,422 @@
+"""
+박스 도면 생성기 - 비동기(ASGI) 서빙 모드
+Vision 호출 대기가 대부분인 분석 라우트를 async 핸들러 + AsyncOpenAI로 처리해
+한 프로세스에서 수백 개의 호출을 동시에 대기할 수 있게 합니다.
+치수 편집 실시간 미리보기(WebSocket /ws/preview)도 이 모드에서만 제공합니다.
+그 외 라우트는 기존 Flask 앱(app.py)을 그대로 마운트합니다.
+
+실행:
+    cd backend && gunicorn asgi_app:app -k uvicorn.workers.UvicornWorker
+    (또는) uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import hashlib
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+from werkzeug.utils import secure_filename
+
+from admission import AdmissionRejected, client_id
+import idempotency as idem
+import streaming_upload
+from live_preview import LivePreviewSession
+from analysis_store import apply_overrides, reusable
+import app as flask_module
+
+flask_app = flask_module.app
+analyzer = flask_module.analyzer
+generator = flask_module.generator
+admission = flask_module.admission
+idempotency = flask_module.idempotency
+analyses = flask_module.analyses
+
+UPLOAD_FOLDER = flask_app.config['UPLOAD_FOLDER']
+MAX_CONTENT_LENGTH = flask_app.config['MAX_CONTENT_LENGTH']
+
+# OpenCV / SVG 렌더링 같은 CPU 작업 전용 스레드풀
+# (OpenCV는 GIL을 풀기 때문에 스레드로도 병렬 처리됨)
+cpu_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('PAWBOX_CPU_WORKERS', os.cpu_count() or 4)),
+    thread_name_prefix='pawbox-cpu',
+)
+
+
+def error(message, status):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+def run_cpu(func, *args, **kwargs):
+    """CPU 작업을 전용 스레드풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(cpu_executor, lambda: func(*args, **kwargs))
+
+
+def limited(route):
+    """admission.limit()의 비동기 버전 — 대기 중에도 이벤트 루프를 막지 않음"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            client = client_id(request.headers, request.client.host if request.client else None)
+            try:
+                slot_id = await admission.acquire_async(route, client)
+            except AdmissionRejected as e:
+                response = error(str(e), e.status)
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+
+            started = time.monotonic()
+            try:
+                return await handler(request)
+            finally:
+                await asyncio.to_thread(admission.release, route, slot_id,
+                                        time.monotonic() - started)
+        return wrapper
+    return decorator
+
+
+def idempotent(route):
+    """IdempotencyStore.idempotent()의 비동기 버전 (limited보다 바깥에 적용)"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            header = request.headers.get(idem.HEADER)
+            if not header:
+                return await handler(request)
+
+            key = idem.scoped_key(route, header, idem.client_scope(request.headers))
+            path = request.url.path + '?' + request.url.query
+            mimetype = request.headers.get('content-type', '').split(';')[0].strip()
+            if too_large(request):
+                return error('파일이 너무 큽니다', 413)
+            try:
+                digest, request = await body_digest(request, mimetype)
+            except ValueError as e:
+                return error(str(e), 413)
+            fingerprint = idem.request_fingerprint(request.method, path, mimetype, digest)
+
+            for _ in range(3):
+                try:
+                    outcome, record = await asyncio.to_thread(idempotency.begin, key, fingerprint)
+                except idem.IdempotencyConflict as e:
+                    return error(str(e), 422)
+
+                if outcome == 'pending':
+                    record = await idempotency.wait_async(key)
+                    if record is None:
+                        continue
+                if record is not None:
+                    status, body, content_type = record
+                    return Response(body, status_code=status, media_type=content_type,
+                                    headers={'Idempotent-Replayed': 'true'})
+                break
+            else:
+                return error('동일한 요청이 아직 처리 중입니다', 409)
+
+            try:
+                response = await handler(request)
+            except BaseException:
+                await asyncio.to_thread(idempotency.abandon, key)
+                raise
+
+            if idem.should_store(response.status_code):
+                await asyncio.to_thread(idempotency.complete, key, response.status_code,
+                                        response.body, response.headers.get('content-type'))
+            else:
+                await asyncio.to_thread(idempotency.abandon, key)
+            return response
+        return wrapper
+    return decorator
+
+
+def too_large(request):
+    length = request.headers.get('content-length')
+    return length is not None and int(length) > MAX_CONTENT_LENGTH
+
+
+async def limited_stream(request):
+    """Content-Length 없이(chunked) 들어와도 MAX_CONTENT_LENGTH를 넘지 않도록 제한"""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_CONTENT_LENGTH:
+            raise ValueError('파일이 너무 큽니다')
+        yield chunk
+
+
+async def body_digest(request, mimetype):
+    """
+    idempotent()용 본문 요약. multipart는 파싱된 필드·파일로 (boundary 무관, 폼은 캐시되어 재사용),
+    그 외는 본문을 읽어 해시하고 같은 본문을 다시 읽을 수 있는 Request를 만듦.
+    Returns: (digest, 이후 핸들러가 쓸 request)
+    """
+    if mimetype == 'multipart/form-data':
+        form = await request.form()
+        items = form.multi_items()
+        fields = [(name, value) for name, value in items if isinstance(value, str)]
+        files = [(name, value.filename, value.file) for name, value in items
+                 if not isinstance(value, str)]
+        return await asyncio.to_thread(idem.form_digest, fields, files), request
+
+    body = b''.join([chunk async for chunk in limited_stream(request)])
+
+    async def replay():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    digest = hashlib.sha256(body).hexdigest()
+    return digest, Request(request.scope, replay)
+
+
+async def save_upload(request):
+    """
+    multipart 업로드를 uploads/에 저장 (image_id 필드가 있으면 이전 업로드를 참조).
+    Returns: (form, image_id, filepath) 또는 오류 응답
+    """
+    if too_large(request):
+        return error('파일이 너무 큽니다', 413)
+
+    if request.headers.get('content-type', '').startswith('application/json'):
+        form = await request.json()
+    else:
+        form = await request.form()
+
+    image_id = form.get('image_id')
+    if image_id:
+        filepath = await asyncio.to_thread(analyses.path, image_id)
+        if filepath is None:
+            return error('업로드된 이미지를 찾을 수 없습니다', 404)
+        return form, image_id, filepath
+
+    file = form.get('image')
+    if file is None or isinstance(file, str):
+        return error('이미지 파일이 없습니다', 400)
+    if file.filename == '':
+        return error('파일이 선택되지 않았습니다', 400)
+    if not flask_module.allowed_file(file.filename):
+        return error('허용되지 않은 파일 형식입니다', 400)
+
+    filename = secure_filename(file.filename)
+    unique_filename = f"{uuid.uuid4()}_{filename}"
+    filepath = os.path.join(UPLOAD_FOLDER, unique_filename)
+
+    def copy():
+        file.file.seek(0)
+        with open(filepath, 'wb') as f:
+            shutil.copyfileobj(file.file, f)
+
+    await asyncio.to_thread(copy)
+    return form, unique_filename, filepath
+
+
+async def analyze_upload(image_id, filepath, method=None, reference_size=None):
+    """app.analyze_upload()의 비동기 버전 — 기록이 있으면 Vision 호출 없이 반환"""
+    dimensions = await asyncio.to_thread(analyses.get, image_id, method, reference_size)
+    if dimensions is None:
+        method = method or 'auto'
+        dimensions = await analyzer.analyze_async(
+            filepath,
+            method=method,
+            reference_size=reference_size,
+            executor=cpu_executor
+        )
+        if reusable(method, dimensions):
+            await asyncio.to_thread(analyses.record, image_id, method, reference_size, dimensions)
+    return dimensions
+
+
+@idempotent('analyze')
+@limited('analyze')
+async def analyze_image(request):
+    """이미지 분석 API (FormData)"""
+    try:
+        saved = await save_upload(request)
+        if isinstance(saved, JSONResponse):
+            return saved
+        form, image_id, filepath = saved
+
+        method = form.get('method', 'auto')
+        reference_size = form.get('reference_size')
+        if reference_size:
+            reference_size = float(reference_size)
+
+        dimensions = await analyze_upload(image_id, filepath, method, reference_size)
+
+        return JSONResponse({
+            'success': True,
+            'dimensions': dimensions,
+            'image_id': image_id,
+            'image_path': image_id
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@idempotent('analyze-base64')
+@limited('analyze-base64')
+async def analyze_image_base64(request):
+    """이미지 분석 API (Base64 JSON 또는 application/octet-stream, 스트리밍 수신)"""
+    try:
+        if too_large(request):
+            return error('파일이 너무 큽니다', 413)
+
+        raw = request.headers.get('content-type', '').startswith('application/octet-stream')
+        try:
+            unique_filename, filepath, data = await streaming_upload.ingest_async(
+                limited_stream(request),
+                UPLOAD_FOLDER,
+                raw=raw,
+                filename=request.query_params.get('filename') if raw else None
+            )
+        except ValueError as e:
+            return error(str(e), 400)
+
+        if raw:
+            data = request.query_params
+
+        method = data.get('method', 'auto')
+        reference_size = data.get('reference_size')
+        if reference_size:
+            reference_size = float(reference_size)
+
+        dimensions = await analyze_upload(unique_filename, filepath, method, reference_size)
+
+        return JSONResponse({
+            'success': True,
+            'dimensions': dimensions,
+            'image_id': unique_filename,
+            'image_path': unique_filename
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@idempotent('generate-from-image')
+@limited('generate-from-image')
+async def generate_from_image(request):
+    """이미지에서 직접 박스 생성 (통합 API, image_id면 저장된 이미지·분석 재사용)"""
+    try:
+        saved = await save_upload(request)
+        if isinstance(saved, JSONResponse):
+            return saved
+        form, image_id, filepath = saved
+
+        # 1. 이미지 분석 (method를 지정하지 않으면 최근 분석 기록 재사용)
+        method = form.get('method') or None
+        dimensions = apply_overrides(await analyze_upload(image_id, filepath, method), form)
+
+        # 2. 박스 생성
+        thickness = float(form.get('thickness', 3.0))
+        output_path = await run_cpu(
+            generator.create_simple_box_svg,
+            width=dimensions['width'],
+            height=dimensions['height'],
+            depth=dimensions['depth'],
+            thickness=thickness
+        )
+
+        output_filename = os.path.basename(output_path)
+        drawn = generator.drawn_dimensions(
+            dimensions['width'], dimensions['height'], dimensions['depth'], thickness
+        )
+
+        return JSONResponse({
+            'success': True,
+            'dimensions': dimensions,
+            'box_dimensions': flask_module.box_dimensions(drawn),
+            'image_id': image_id,
+            'filename': output_filename,
+            'download_url': f'/download/{output_filename}',
+            'file_size': await asyncio.to_thread(generator.store.storage.size, output_filename)
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def live_preview(websocket):
+    """
+    치수 편집 실시간 미리보기 (WebSocket)
+    클라이언트 → {"width", "height", "depth", "thickness"} (바뀐 항목만 보내도 됨)
+    서버 → {"type": "full" | "patch" | "error", ...} — 바뀐 패널/치수선만 전송
+    렌더링 중에 들어온 변경은 합쳐서 마지막 값만 반영 (슬라이더 드래그 시 밀리지 않도록)
+    """
+    await websocket.accept()
+    session = LivePreviewSession(generator)
+    latest = {}
+    pending = asyncio.Event()
+    closed = False
+
+    async def receive():
+        nonlocal closed
+        try:
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                except json.JSONDecodeError:
+                    message = None
+                if not isinstance(message, dict):
+                    await websocket.send_json({'type': 'error', 'error': 'JSON 객체를 보내야 합니다'})
+                    continue
+                latest.update(message)
+                pending.set()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            closed = True
+            pending.set()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            await pending.wait()
+            pending.clear()
+            if closed:
+                break
+            message = dict(latest)
+            latest.clear()
+
+            try:
+                patch = await run_cpu(session.update, message)
+            except ValueError as e:
+                await websocket.send_json({'type': 'error', 'error': str(e)})
+                continue
+            if patch is None:
+                continue
+
+            text = json.dumps(patch, ensure_ascii=False)
+            session.record_sent(len(text))
+            await websocket.send_text(text)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/analyze', analyze_image, methods=['POST']),
+        Route('/api/analyze-base64', analyze_image_base64, methods=['POST']),
+        Route('/api/generate-from-image', generate_from_image, methods=['POST']),
+        WebSocketRoute('/ws/preview', live_preview),
+        # 나머지 라우트는 기존 Flask 앱이 처리
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+    ],
+)
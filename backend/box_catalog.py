@@ -0,0 +1,266 @@
+"""
+표준 박스 크기 카탈로그
+치수 양자화(quantization)로 비슷한 요청을 같은 크기로 모으고,
+자주 쓰이는 크기/두께 조합의 SVG를 미리 렌더링해 메모리에 보관합니다.
+"""
+
+import os
+import math
+import heapq
+import threading
+from collections import Counter
+
+
+# 반려동물 박스 대표 크기 (W, H, D mm) — _build_prompt의 배율(×1.3/×1.2/×1.4) 적용 기준
+STANDARD_SIZES = {
+    'hamster':     (300, 200, 250),
+    'rabbit':      (450, 350, 350),
+    'small_cat':   (500, 380, 400),
+    'medium_cat':  (560, 420, 450),
+    'small_dog':   (550, 450, 420),
+    'medium_dog':  (750, 600, 550),
+    'large_dog':   (1000, 800, 700),
+}
+STANDARD_THICKNESSES = (3.0, 5.0)
+
+
+class QuantizationPolicy:
+    """
+    치수를 step_mm 단위로 올림(snap up)합니다.
+    박스는 동물이 들어가야 하므로 내림 대신 올림을 쓰고,
+    올림 폭이 tolerance_mm를 넘으면 원래 값(0.1mm 반올림)을 유지합니다.
+    재료 두께는 바꾸지 않습니다 (탭/슬롯 폭이 실제 판재 두께와 맞아야 조립됨).
+    """
+
+    def __init__(self, step_mm=10.0, tolerance_mm=None):
+        self.step_mm = float(step_mm)
+        self.tolerance_mm = float(tolerance_mm if tolerance_mm is not None else step_mm)
+
+    @classmethod
+    def from_env(cls):
+        """PAWBOX_QUANTIZE_STEP (기본 0 = 비활성), PAWBOX_QUANTIZE_TOLERANCE"""
+        step = float(os.environ.get('PAWBOX_QUANTIZE_STEP', 0))
+        if step <= 0:
+            return None
+        tolerance = os.environ.get('PAWBOX_QUANTIZE_TOLERANCE')
+        return cls(step, float(tolerance) if tolerance else None)
+
+    def _snap(self, value, step):
+        snapped = math.ceil(round(value / step, 6)) * step
+        if snapped - value <= self.tolerance_mm:
+            return round(snapped, 1)
+        return round(value, 1)
+
+    def quantize(self, width, height, depth, thickness):
+        return (
+            self._snap(width, self.step_mm),
+            self._snap(height, self.step_mm),
+            self._snap(depth, self.step_mm),
+            float(thickness),
+        )
+
+
+class BoxCatalog:
+    """
+    렌더링된 SVG 문자열의 웜 카탈로그.
+    - 시작 시 표준 크기 × 표준 두께를 백그라운드에서 렌더링
+    - 요청 빈도를 기록해 adapt_every 요청마다 인기 크기를 추가 렌더링하고
+      capacity를 넘으면 빈도가 가장 낮은 항목을 제거
+    - 빈도 표는 조정할 때마다 상위 freq_size개만 남김 (한 번씩만 요청된 크기가 쌓이지 않도록)
+    """
+
+    FREQ_NAMESPACE = 'catalog_freq'
+
+    def __init__(self, render, capacity=256, adapt_every=50, promote_after=3, state=None,
+                 freq_size=None):
+        """
+        Args:
+            render: (w, h, d, t) → SVG 문자열 함수
+            capacity: 보관할 최대 항목 수
+            adapt_every: 몇 번의 요청마다 카탈로그를 조정할지
+            promote_after: 이 횟수 이상 요청된 크기만 미리 렌더링
+            state: SharedState (있으면 요청 빈도를 워커 간 공유 → 새 워커도 인기 크기로 워밍)
+            freq_size: 빈도를 기억할 최대 크기 수 (기본 capacity × 4, 로컬·공유 모두 적용)
+        """
+        self.render = render
+        self.capacity = capacity
+        self.adapt_every = adapt_every
+        self.promote_after = promote_after
+        self.state = state
+        self.freq_size = freq_size if freq_size is not None else capacity * 4
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._freq = Counter()
+        self._pending_freq = Counter()
+        self._requests = 0
+        self._hits = 0
+        self._warmed = 0
+
+    @staticmethod
+    def key(width, height, depth, thickness):
+        return (float(width), float(height), float(depth), float(thickness))
+
+    # ──────────────────────────────────────────────────────────
+    #  조회
+    # ──────────────────────────────────────────────────────────
+
+    def get_or_render(self, width, height, depth, thickness):
+        """카탈로그 적중 시 저장된 SVG, 아니면 렌더링 (렌더링 결과는 빈도에 따라 보관)"""
+        svg = self.lookup(width, height, depth, thickness)
+        if svg is None:
+            svg = self.render(*self.key(width, height, depth, thickness))
+            self.offer(width, height, depth, thickness, svg)
+        return svg
+
+    def lookup(self, width, height, depth, thickness):
+        """요청 빈도를 기록하고 보관된 SVG 반환 (없으면 None — 렌더링은 호출자가)"""
+        key = self.key(width, height, depth, thickness)
+
+        with self._lock:
+            self._requests += 1
+            self._freq[key] += 1
+            self._pending_freq[key] += 1
+            svg = self._entries.get(key)
+            if svg is not None:
+                self._hits += 1
+            adapt = self._requests % self.adapt_every == 0
+
+        if adapt:
+            threading.Thread(target=self.adapt, daemon=True).start()
+        return svg
+
+    def offer(self, width, height, depth, thickness, svg):
+        """호출자가 렌더링한 SVG — 충분히 자주 요청된 크기면 보관"""
+        key = self.key(width, height, depth, thickness)
+        with self._lock:
+            if self._freq[key] >= self.promote_after:
+                self._store(key, svg)
+
+    def _store(self, key, svg):
+        """lock 보유 상태에서 호출"""
+        self._entries[key] = svg
+        if len(self._entries) > self.capacity:
+            victim = min(self._entries, key=lambda k: self._freq[k])
+            del self._entries[victim]
+
+    # ──────────────────────────────────────────────────────────
+    #  워밍 / 적응
+    # ──────────────────────────────────────────────────────────
+
+    def warm(self, keys):
+        for key in keys:
+            key = self.key(*key)
+            with self._lock:
+                if key in self._entries:
+                    continue
+            svg = self.render(*key)
+            with self._lock:
+                self._store(key, svg)
+                self._warmed += 1
+
+    def initial_keys(self, quantization=None):
+        keys = [
+            (*size, t)
+            for size in STANDARD_SIZES.values()
+            for t in STANDARD_THICKNESSES
+        ]
+        if quantization:
+            keys = [quantization.quantize(*k) for k in keys]
+        return keys + self._shared_popular(self.capacity // 2)
+
+    def warm_in_background(self, quantization=None):
+        """시작 시 표준 크기 + (공유 빈도 기준) 인기 크기 렌더링"""
+        thread = threading.Thread(
+            target=lambda: self.warm(self.initial_keys(quantization)),
+            name='box-catalog-warm', daemon=True
+        )
+        thread.start()
+        return thread
+
+    def adapt(self):
+        """빈도 상위 크기 중 아직 없는 것을 렌더링하고 빈도를 공유 저장소에 반영"""
+        self._flush_freq()
+        with self._lock:
+            self._trim_freq()
+            popular = [k for k, n in self._freq.most_common(self.capacity)
+                       if n >= self.promote_after and k not in self._entries]
+        self.warm(popular)
+
+    def _trim_freq(self):
+        """lock 보유 상태에서 호출 — 상위 freq_size개와 보관 중인 항목의 빈도만 유지"""
+        if len(self._freq) <= self.freq_size:
+            return
+        kept = Counter(dict(self._freq.most_common(self.freq_size)))
+        for key in self._entries:
+            if key in self._freq:
+                kept[key] = self._freq[key]
+        self._freq = kept
+
+    def _flush_freq(self):
+        if self.state is None:
+            return
+        with self._lock:
+            pending, self._pending_freq = self._pending_freq, Counter()
+        if not pending:
+            return
+        with self.state.transaction() as conn:
+            for key, n in pending.items():
+                self.state.incr(self.FREQ_NAMESPACE, ','.join(f'{v:g}' for v in key), n, conn=conn)
+            conn.execute(
+                "DELETE FROM counters WHERE namespace = ? AND name NOT IN "
+                "(SELECT name FROM counters WHERE namespace = ? ORDER BY value DESC LIMIT ?)",
+                (self.FREQ_NAMESPACE, self.FREQ_NAMESPACE, self.freq_size)
+            )
+
+    def _shared_popular(self, limit):
+        if self.state is None:
+            return []
+        counts = self.state.counters(self.FREQ_NAMESPACE)
+        top = heapq.nlargest(limit, counts.items(), key=lambda kv: kv[1])
+        return [tuple(float(v) for v in name.split(',')) for name, n in top
+                if n >= self.promote_after]
+
+    def stats(self):
+        with self._lock:
+            requests = self._requests
+            top = [{'size': 'x'.join(f'{v:g}' for v in k[:3]), 'thickness': k[3], 'requests': n}
+                   for k, n in self._freq.most_common(5)]
+            return {
+                'entries': len(self._entries),
+                'capacity': self.capacity,
+                'warmed': self._warmed,
+                'requests': requests,
+                'hits': self._hits,
+                'hit_rate': round(self._hits / requests, 3) if requests else 0.0,
+                'top_sizes': top,
+            }
+
+
+def test_box_catalog():
+    """인기 크기 보관 / 빈도 표 상한(로컬·공유) 확인"""
+    import tempfile
+    from shared_state import SharedState
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = SharedState(os.path.join(tmp, 'state.sqlite3'))
+        catalog = BoxCatalog(lambda *k: f'<svg {k}/>', capacity=4, adapt_every=10**9,
+                             promote_after=3, state=state)
+
+        for _ in range(5):
+            catalog.get_or_render(500, 400, 450, 3)
+        for i in range(100):    # 양자화 없이 매번 다른 크기
+            catalog.get_or_render(300 + i * 0.7, 200, 250, 3)
+        catalog.adapt()
+
+        assert catalog.lookup(500, 400, 450, 3) is not None
+        assert len(catalog._freq) <= catalog.freq_size
+        assert len(state.counters(BoxCatalog.FREQ_NAMESPACE)) <= catalog.freq_size
+        assert catalog.key(500, 400, 450, 3) in catalog._freq
+        print(f"빈도 표: 로컬 {len(catalog._freq)} / 공유 "
+              f"{len(state.counters(BoxCatalog.FREQ_NAMESPACE))} (상한 {catalog.freq_size})")
+        print(catalog.stats())
+
+
+if __name__ == '__main__':
+    test_box_catalog()
@@ -6,18 +6,34 @@ boxes.py 통합 모듈
 import os
 import subprocess
 import math
+import threading
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from output_store import OutputStore
 
 
 class BoxGenerator:
     """boxes.py를 사용하여 박스 도면 생성"""
+
+    PANEL_CACHE_SIZE = 512
     
-    def __init__(self, output_dir='outputs'):
+    def __init__(self, output_dir='outputs', quantization=None, catalog=None, store=None):
         """
         Args:
             output_dir: 출력 파일을 저장할 디렉토리
+            quantization: QuantizationPolicy (있으면 SVG 치수를 표준 단위로 스냅)
+            catalog: BoxCatalog (있으면 미리 렌더링된 SVG 재사용)
+            store: OutputStore (없으면 output_dir에 색인 공유 없는 저장소 생성)
         """
         self.output_dir = output_dir
+        self.quantization = quantization
+        self.catalog = catalog
+        self.store = store or OutputStore(output_dir)
+        self._panel_cache = OrderedDict()
+        self._panel_lock = threading.Lock()
+        self._persist_pool = None
         os.makedirs(output_dir, exist_ok=True)
     
     def generate_box(self, width, height, depth, 
@@ -145,17 +161,66 @@ class BoxGenerator:
             thickness: 재료 두께 (mm)
             
         Returns:
-            str: 생성된 SVG 파일 경로
+            str: 생성된 SVG 파일 경로 (파일명은 내용 해시, 같은 도면은 파일 하나를 공유)
         """
-        filename = f"box_{int(width)}x{int(height)}x{int(depth)}.svg"
-        output_path = os.path.join(self.output_dir, filename)
-        
-        svg_content = self._generate_precise_svg(width, height, depth, thickness)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(svg_content)
-        
-        return output_path
+        width, height, depth, thickness = self.drawn_dimensions(width, height, depth, thickness)
+
+        def render():
+            if self.catalog:
+                return self.catalog.get_or_render(width, height, depth, thickness)
+            return self.render_svg(width, height, depth, thickness)
+
+        return self.store.get_or_create(('simple', width, height, depth, thickness), render)
+
+    def stream_simple_box_svg(self, width, height, depth, thickness=3.0, persist=False):
+        """
+        create_simple_box_svg()의 인라인 버전 — 파일에 쓰고 다시 읽는 대신
+        SVG 조각을 만드는 대로 내보냅니다 (HTTP 응답 본문으로 바로 전송).
+
+        Args:
+            persist: 스트림을 끝까지 보내면 백그라운드에서 저장소에 기록
+                     (이후 같은 치수의 create_simple_box_svg()는 색인 적중)
+        Returns:
+            ((w, h, d, t) 양자화된 치수, SVG 조각(str) 생성기)
+        """
+        params = self.drawn_dimensions(width, height, depth, thickness)
+        return params, self._stream_svg(params, persist)
+
+    def drawn_dimensions(self, width, height, depth, thickness=3.0):
+        """create_simple_box_svg()가 실제로 그리는 치수 (w, h, d, t) — 양자화 정책 적용 후"""
+        if self.quantization:
+            width, height, depth, thickness = self.quantization.quantize(
+                width, height, depth, thickness
+            )
+        return float(width), float(height), float(depth), float(thickness)
+
+    def _stream_svg(self, params, persist):
+        svg = self.catalog.lookup(*params) if self.catalog else None
+        if svg is not None:
+            yield svg
+        else:
+            chunks = []
+            for chunk in self._generate_precise_svg(*params):
+                chunks.append(chunk)
+                yield chunk
+            svg = ''.join(chunks)
+            if self.catalog:
+                self.catalog.offer(*params, svg)
+
+        # 클라이언트가 중간에 끊으면 여기까지 오지 않음 → 저장하지 않음
+        if persist:
+            if self._persist_pool is None:
+                with self._panel_lock:
+                    if self._persist_pool is None:
+                        self._persist_pool = ThreadPoolExecutor(2, thread_name_prefix='svg-persist')
+            self._persist_pool.submit(self._persist, ('simple', *params), svg)
+
+    def _persist(self, params, svg):
+        try:
+            if self.store.lookup(self.store.params_key(*params, 'svg')) is None:
+                self.store.add(params, svg)
+        except Exception as e:
+            print(f"[BoxGenerator] 인라인 도면 저장 실패: {e}")
 
     # ──────────────────────────────────────────────────────────
     #  SVG 생성 헬퍼
@@ -325,50 +390,85 @@ class BoxGenerator:
         )
         return lines
 
-    def _generate_precise_svg(self, w, h, d, t):
-        """
-        정확한 십자형 전개도 SVG 생성.
+    # 패널 배치 (이름, 가로 치수, 세로 치수, 탭 방향)
+    PANELS = (
+        # Top (w × d): 아래→Front, 양옆→Left/Right 탭
+        ('Top',    'w', 'd', (None, None, True, None)),
+        # Front (w × h): 위→Top 슬롯, 좌→Left 탭, 우→Right 탭, 아래→Bottom 슬롯
+        ('Front',  'w', 'h', (False, True, False, True)),
+        ('Bottom', 'w', 'd', (True, None, None, None)),
+        ('Left',   'd', 'h', (None, False, None, None)),
+        ('Right',  'd', 'h', (None, None, None, False)),
+        ('Back',   'w', 'h', (None, None, None, False)),
+    )
 
-        레이아웃 (margin=20, spacing=5):
+    def _layout(self, w, h, d):
+        """
+        십자형 전개도 배치 계산 (margin=20, spacing=8).
 
               [Top  w×d]
         [L d×h][Front w×h][R d×h][Back w×h]
               [Bottom w×d]
+
+        Returns: (canvas_w, canvas_h, {패널 이름: (x, y)})
         """
         margin  = 20
         sp      = 8   # 패널 간격
 
-        # 캔버스 계산
         canvas_w = margin * 2 + d + w + d + w + sp * 3
         canvas_h = margin * 2 + d + h + d + sp * 2
 
-        # 패널 좌상단 좌표
-        # 첫 번째 열: Left (d×h)
-        left_x = margin
-        left_y = margin + d + sp
-
-        # 두 번째 열: Front (w×h), Top (w×d), Bottom (w×d)
         front_x = margin + d + sp
         front_y = margin + d + sp
-        top_x   = front_x
-        top_y   = margin
-        bot_x   = front_x
-        bot_y   = margin + d + sp + h + sp
-
-        # 세 번째 열: Right (d×h)
         right_x = front_x + w + sp
-        right_y = left_y
 
-        # 네 번째 열: Back (w×h)
-        back_x  = right_x + d + sp
-        back_y  = left_y
+        return canvas_w, canvas_h, {
+            'Top':    (front_x, margin),
+            'Front':  (front_x, front_y),
+            'Bottom': (front_x, front_y + h + sp),
+            'Left':   (margin, front_y),
+            'Right':  (right_x, front_y),
+            'Back':   (right_x + d + sp, front_y),
+        }
+
+    def _panel_svg(self, pw, ph, t, label, sides):
+        """원점 기준 패널 (크기/두께/탭이 같으면 캐시 재사용 — 위치는 transform으로 지정)"""
+        key = (pw, ph, t, label, sides)
+        with self._panel_lock:
+            svg = self._panel_cache.get(key)
+            if svg is not None:
+                self._panel_cache.move_to_end(key)
+                return svg
+
+        svg = self._rect_with_tabs(
+            0, 0, pw, ph, t, label,
+            dict(zip(('top', 'right', 'bottom', 'left'), sides))
+        )
+        with self._panel_lock:
+            self._panel_cache[key] = svg
+            while len(self._panel_cache) > self.PANEL_CACHE_SIZE:
+                self._panel_cache.popitem(last=False)
+        return svg
 
-        svg = f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg width="{canvas_w:.1f}mm" height="{canvas_h:.1f}mm"
-     viewBox="0 0 {canvas_w:.1f} {canvas_h:.1f}"
-     xmlns="http://www.w3.org/2000/svg">
+    def svg_parts(self, w, h, d, t):
+        """
+        도면을 부분별로 나눠 생성 (실시간 미리보기는 바뀐 부분만 전송).
+
+        Returns:
+            (canvas_w, canvas_h, parts)
+            parts: OrderedDict {부분 id: (transform 또는 None, 내용)}
+                   heading / legend / panel-{이름} ×6 / dim-W·H·D
+        """
+        canvas_w, canvas_h, origins = self._layout(w, h, d)
+        return canvas_w, canvas_h, OrderedDict(
+            self._iter_parts(w, h, d, t, canvas_w, canvas_h, origins)
+        )
+
+    def _iter_parts(self, w, h, d, t, canvas_w, canvas_h, origins):
+        """(부분 id, (transform, 내용))을 문서 순서(기타 → 컷 라인 → 치수선)대로 하나씩 생성"""
+        size = {'w': w, 'h': h, 'd': d}
 
-  <title>Pet Box {w:.0f}x{h:.0f}x{d:.0f}mm · t={t:.1f}mm</title>
+        yield 'heading', (None, f'''  <title>Pet Box {w:.0f}x{h:.0f}x{d:.0f}mm · t={t:.1f}mm</title>
 
   <!-- 배경 -->
   <rect width="{canvas_w:.1f}" height="{canvas_h:.1f}" fill="#FAFAFA"/>
@@ -378,76 +478,99 @@ class BoxGenerator:
         text-anchor="middle" fill="#222" font-weight="bold">
     반려동물 집 전개도 · W{w:.0f} × H{h:.0f} × D{d:.0f} mm · 재료두께 {t:.1f}mm
   </text>
-
-  <!-- 컷 라인 레이어 -->
-  <g id="cut">
-'''
-        # ── 6개 패널 ──────────────────────────────────────────────
-        # Top (w × d): 아래→Front, 양옆→Left/Right 탭
-        svg += self._rect_with_tabs(
-            top_x, top_y, w, d, t, "Top",
-            {'top': None, 'right': None, 'bottom': True, 'left': None}
-        )
-
-        # Front (w × h): 위→Top 슬롯, 좌→Left 탭, 우→Right 탭, 아래→Bottom 슬롯
-        svg += self._rect_with_tabs(
-            front_x, front_y, w, h, t, "Front",
-            {'top': False, 'right': True, 'bottom': False, 'left': True}
-        )
-
-        # Bottom (w × d)
-        svg += self._rect_with_tabs(
-            bot_x, bot_y, w, d, t, "Bottom",
-            {'top': True, 'right': None, 'bottom': None, 'left': None}
-        )
-
-        # Left (d × h)
-        svg += self._rect_with_tabs(
-            left_x, left_y, d, h, t, "Left",
-            {'top': None, 'right': False, 'bottom': None, 'left': None}
-        )
-
-        # Right (d × h)
-        svg += self._rect_with_tabs(
-            right_x, right_y, d, h, t, "Right",
-            {'top': None, 'right': None, 'bottom': None, 'left': False}
-        )
-
-        # Back (w × h)
-        svg += self._rect_with_tabs(
-            back_x, back_y, w, h, t, "Back",
-            {'top': None, 'right': None, 'bottom': None, 'left': False}
-        )
-
-        svg += "  </g>\n\n"
-
-        # ── 치수선 레이어 ──────────────────────────────────────────
-        svg += '  <g id="dimensions">\n'
-        # 폭 (W)
-        svg += self._dim_arrow(front_x, front_y, front_x + w, front_y, f"W={w:.0f}mm", offset=10)
-        # 높이 (H)
-        svg += self._dim_arrow(front_x, front_y, front_x, front_y + h, f"H={h:.0f}mm", offset=12)
-        # 깊이 (D)
-        svg += self._dim_arrow(top_x, top_y, top_x, top_y + d, f"D={d:.0f}mm", offset=12)
-        svg += "  </g>\n\n"
+''')
 
         # ── 범례 ──────────────────────────────────────────────────
-        leg_x = margin
+        leg_x = 20
         leg_y = canvas_h - 7
-        svg += f'''  <g id="legend" font-size="4.5" font-family="Arial,sans-serif" fill="#666">
+        yield 'legend', (None, f'''  <g font-size="4.5" font-family="Arial,sans-serif" fill="#666">
     <line x1="{leg_x}" y1="{leg_y-1}" x2="{leg_x+10}" y2="{leg_y-1}"
           stroke="#E02020" stroke-width="0.8"/>
     <text x="{leg_x+12}" y="{leg_y}">컷 라인 (빨간색)</text>
     <line x1="{leg_x+60}" y1="{leg_y-1}" x2="{leg_x+70}" y2="{leg_y-1}"
           stroke="#4488FF" stroke-width="0.4" stroke-dasharray="2,2"/>
     <text x="{leg_x+72}" y="{leg_y}">치수선 (파란색)</text>
-    <text x="{canvas_w - margin:.1f}" y="{leg_y}"
+    <text x="{canvas_w - leg_x:.1f}" y="{leg_y}"
           text-anchor="end">재료두께 {t:.1f}mm · Generated by Paw-Box</text>
   </g>
+''')
 
-</svg>'''
+        # ── 6개 패널 ──────────────────────────────────────────────
+        for name, pw, ph, sides in self.PANELS:
+            x, y = origins[name]
+            yield f'panel-{name}', (
+                f'translate({x:.2f},{y:.2f})',
+                self._panel_svg(size[pw], size[ph], t, name, sides)
+            )
 
-        return svg
+        # ── 치수선 ────────────────────────────────────────────────
+        front_x, front_y = origins['Front']
+        top_x, top_y = origins['Top']
+        yield 'dim-W', (None, self._dim_arrow(front_x, front_y, front_x + w, front_y,
+                                              f"W={w:.0f}mm", offset=10))
+        yield 'dim-H', (None, self._dim_arrow(front_x, front_y, front_x, front_y + h,
+                                              f"H={h:.0f}mm", offset=12))
+        yield 'dim-D', (None, self._dim_arrow(top_x, top_y, top_x, top_y + d,
+                                              f"D={d:.0f}mm", offset=12))
+
+    @staticmethod
+    def part_svg(part_id, part):
+        transform, body = part
+        attr = f' transform="{transform}"' if transform else ''
+        return f'<g id="{part_id}"{attr}>\n{body}</g>\n'
+
+    # 부분 id 접두사 → 레이어 (문서에 나오는 순서)
+    LAYERS = (('', None), ('panel-', 'cut'), ('dim-', 'dimensions'))
+    LAYER_COMMENTS = {'cut': '컷 라인 레이어', 'dimensions': '치수선 레이어'}
+
+    @classmethod
+    def _part_layer(cls, part_id):
+        for prefix, layer in reversed(cls.LAYERS):
+            if part_id.startswith(prefix):
+                return layer
+
+    def iter_svg(self, canvas_w, canvas_h, parts):
+        """
+        (부분 id, part) 스트림 → SVG 문서 조각 생성기.
+        parts는 레이어 순서(기타 → 패널 → 치수선)로 와야 하며, 받는 대로 조각을 내보냅니다.
+        """
+        yield f'''<?xml version="1.0" encoding="UTF-8"?>
+<svg width="{canvas_w:.1f}mm" height="{canvas_h:.1f}mm"
+     viewBox="0 0 {canvas_w:.1f} {canvas_h:.1f}"
+     xmlns="http://www.w3.org/2000/svg">
+
+'''
+        current = None
+        for part_id, part in parts:
+            layer = self._part_layer(part_id)
+            if layer != current:
+                if current is not None:
+                    yield '  </g>\n'
+                yield f'\n  <!-- {self.LAYER_COMMENTS[layer]} -->\n  <g id="{layer}">\n'
+                current = layer
+            yield self.part_svg(part_id, part)
+        if current is not None:
+            yield '  </g>\n'
+        yield '\n</svg>'
+
+    def assemble_svg(self, canvas_w, canvas_h, parts):
+        """svg_parts() 결과 → 완성된 SVG 문서 (컷 라인/치수선 레이어로 묶음)"""
+        order = [layer for _, layer in self.LAYERS]
+        ordered = sorted(parts.items(), key=lambda item: order.index(self._part_layer(item[0])))
+        return ''.join(self.iter_svg(canvas_w, canvas_h, ordered))
+
+    def _generate_precise_svg(self, w, h, d, t):
+        """
+        정확한 십자형 전개도 SVG 조각 생성기 (배치는 _layout, 부분 구성은 _iter_parts).
+        머리말 → 제목/범례 → 패널 6개 → 치수선 순으로 만드는 대로 내보냅니다.
+        """
+        canvas_w, canvas_h, origins = self._layout(w, h, d)
+        yield from self.iter_svg(canvas_w, canvas_h,
+                                 self._iter_parts(w, h, d, t, canvas_w, canvas_h, origins))
+
+    def render_svg(self, w, h, d, t):
+        """완성된 SVG 문자열 (카탈로그/파일 저장용)"""
+        return ''.join(self._generate_precise_svg(w, h, d, t))
 
 
 def test_generator():
@@ -0,0 +1,252 @@
+"""
+품종·자세별 박스 치수 지식 베이스
+고해상도 Vision 분석 결과(_parse_result 출력)를 (동물 종류, 자세)별로 누적해
+평균과 분산을 Welford 방식으로 갱신합니다. 표본이 충분하고 편차가 작은 품종은
+low detail 분류 호출만으로 치수를 답할 수 있습니다.
+
+환경변수:
+    PAWBOX_KB_MIN_SAMPLES    지식 베이스로 답하기 위한 최소 표본 수 (기본 5)
+    PAWBOX_KB_MAX_CV         허용 최대 변동계수 — 표준편차/평균, 치수 중 최댓값 (기본 0.15)
+    PAWBOX_KB_MIN_CONFIDENCE 누적할 분석 결과의 최소 신뢰도 (기본 0.75)
+"""
+
+import os
+import re
+import math
+import threading
+
+
+DIMENSIONS = ('width', 'height', 'depth')
+
+
+def normalize_label(animal_type):
+    """'고양이 (코리안  숏헤어)' → '고양이 (코리안 숏헤어)' (대소문자/공백 차이 통합)"""
+    return re.sub(r'\s+', ' ', str(animal_type)).strip().lower()
+
+
+def same_animal(label, result):
+    """
+    분류 라벨과 분석 결과가 같은 동물·자세인지.
+    한쪽에만 품종이 있으면('개' / '개 (말티즈)') 종류만 비교, 둘 다 있으면 품종까지 비교
+    """
+    if str(label.get('posture', '')) != str(result.get('posture', '')):
+        return False
+    a, b = normalize_label(label.get('animal_type', '')), normalize_label(result.get('animal_type', ''))
+    if a == b:
+        return bool(a)
+    if '(' in a and '(' in b:
+        return False
+    return a.split('(')[0].strip() == b.split('(')[0].strip()
+
+
+class BreedKnowledgeBase:
+    """(동물 종류, 자세) → 치수 평균/분산"""
+
+    def __init__(self, state=None, min_samples=5, max_cv=0.15, min_confidence=0.75):
+        """
+        Args:
+            state: SharedState (있으면 워커 간 공유·재시작 후 유지, 없으면 메모리)
+            min_samples: lookup()이 항목을 돌려주기 위한 최소 표본 수
+            max_cv: 허용 최대 변동계수
+            min_confidence: record()가 누적할 최소 신뢰도
+        """
+        self.state = state
+        self.min_samples = min_samples
+        self.max_cv = max_cv
+        self.min_confidence = min_confidence
+
+        self._lock = threading.Lock()
+        self._entries = {}    # state가 없을 때: (label, posture) → [count, mean×3, m2×3]
+        self._stats = {'recorded': 0, 'lookups': 0, 'hits': 0, 'unknown': 0, 'high_variance': 0}
+
+        if state is not None:
+            state.ensure_schema(
+                "CREATE TABLE IF NOT EXISTS breed_knowledge ("
+                " animal_type TEXT, posture TEXT, count INTEGER,"
+                " mean_w REAL, mean_h REAL, mean_d REAL, m2_w REAL, m2_h REAL, m2_d REAL,"
+                " PRIMARY KEY (animal_type, posture))"
+            )
+
+    @classmethod
+    def from_env(cls, state=None):
+        return cls(
+            state,
+            min_samples=int(os.environ.get('PAWBOX_KB_MIN_SAMPLES', 5)),
+            max_cv=float(os.environ.get('PAWBOX_KB_MAX_CV', 0.15)),
+            min_confidence=float(os.environ.get('PAWBOX_KB_MIN_CONFIDENCE', 0.75)),
+        )
+
+    def __getstate__(self):
+        """프로세스 풀로 보낼 때 락/공유 저장소 제외 (자식 프로세스는 로컬 계산만 수행)"""
+        state = self.__dict__.copy()
+        state.update(_lock=None, state=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _welford(row, values):
+        """row = [count, mean×3, m2×3] 에 표본 하나 반영"""
+        count, means, m2s = row[0] + 1, list(row[1:4]), list(row[4:7])
+        for i, x in enumerate(values):
+            delta = x - means[i]
+            means[i] += delta / count
+            m2s[i] += delta * (x - means[i])
+        return [count, *means, *m2s]
+
+    # ──────────────────────────────────────────────────────────
+    #  누적 / 조회
+    # ──────────────────────────────────────────────────────────
+
+    def record(self, result, label=None):
+        """
+        분석 결과 dict(animal_type, posture, width, height, depth, confidence)를 누적.
+        label: 조회에 쓴 분류 결과 — 결과와 같은 동물·자세일 때만 그 표기로 누적해
+               다음 조회 키와 맞춤 (다르면 결과 자신의 라벨로 누적)
+        Returns: 누적했으면 True (신뢰도 미달·라벨 없음이면 False)
+        """
+        if label is not None and same_animal(label, result):
+            result = {**result, 'animal_type': label['animal_type'], 'posture': label['posture']}
+        label = normalize_label(result.get('animal_type', ''))
+        posture = str(result.get('posture', ''))
+        if not label or not posture or result.get('confidence', 0) < self.min_confidence:
+            return False
+        values = [float(result[d]) for d in DIMENSIONS]
+
+        if self.state is None:
+            with self._lock:
+                row = self._entries.get((label, posture), [0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+                self._entries[(label, posture)] = self._welford(row, values)
+        else:
+            with self.state.transaction() as conn:
+                row = conn.execute(
+                    "SELECT count, mean_w, mean_h, mean_d, m2_w, m2_h, m2_d FROM breed_knowledge "
+                    "WHERE animal_type = ? AND posture = ?", (label, posture)
+                ).fetchone()
+                row = self._welford(row or [0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0], values)
+                conn.execute(
+                    "INSERT OR REPLACE INTO breed_knowledge VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (label, posture, *row)
+                )
+
+        with self._lock:
+            self._stats['recorded'] += 1
+        return True
+
+    def _row(self, label, posture):
+        if self.state is None:
+            with self._lock:
+                return self._entries.get((label, posture))
+        return self.state.connect().execute(
+            "SELECT count, mean_w, mean_h, mean_d, m2_w, m2_h, m2_d FROM breed_knowledge "
+            "WHERE animal_type = ? AND posture = ?", (label, posture)
+        ).fetchone()
+
+    def entry(self, animal_type, posture):
+        """
+        Returns: {'count', 'width', 'height', 'depth', 'std': {...}, 'cv'} 또는 None (표본 없음)
+        """
+        row = self._row(normalize_label(animal_type), str(posture))
+        if row is None:
+            return None
+        count, means, m2s = row[0], row[1:4], row[4:7]
+        std = [math.sqrt(m2 / (count - 1)) if count > 1 else float('inf') for m2 in m2s]
+        cv = max(s / m if m > 0 else float('inf') for s, m in zip(std, means))
+        return {
+            'count': count,
+            **{d: round(m, 1) for d, m in zip(DIMENSIONS, means)},
+            'std': {d: round(s, 1) for d, s in zip(DIMENSIONS, std)},
+            'cv': round(cv, 4),
+        }
+
+    def lookup(self, animal_type, posture):
+        """
+        답할 수 있는 항목만 반환 (표본 min_samples 이상, 변동계수 max_cv 이하).
+        Returns: (entry 또는 None, 사유 'hit' | 'unknown' | 'high_variance')
+        """
+        entry = self.entry(animal_type, posture)
+        if entry is None or entry['count'] < self.min_samples:
+            reason = 'unknown'
+        elif entry['cv'] > self.max_cv:
+            reason = 'high_variance'
+        else:
+            reason = 'hit'
+        with self._lock:
+            self._stats['lookups'] += 1
+            self._stats['hits' if reason == 'hit' else reason] += 1
+        return (entry if reason == 'hit' else None), reason
+
+    def labels(self, limit=40):
+        """표본이 많은 동물 종류 라벨 (분류 프롬프트에 넣어 표기를 통일)"""
+        if self.state is None:
+            with self._lock:
+                totals = {}
+                for (label, _), row in self._entries.items():
+                    totals[label] = totals.get(label, 0) + row[0]
+            return sorted(totals, key=totals.get, reverse=True)[:limit]
+        rows = self.state.connect().execute(
+            "SELECT animal_type FROM breed_knowledge GROUP BY animal_type "
+            "ORDER BY SUM(count) DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        if self.state is not None:
+            entries = self.state.connect().execute(
+                "SELECT COUNT(*) FROM breed_knowledge").fetchone()[0]
+        stats['entries'] = entries
+        stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 3) if stats['lookups'] else 0.0
+        return stats
+
+
+def test_breed_knowledge():
+    """Welford 누적이 일괄 계산과 같은지 / 조회 조건 확인"""
+    import random
+    import statistics
+    import tempfile
+    from shared_state import SharedState
+
+    random.seed(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        for state in (None, SharedState(os.path.join(tmp, 'kb.sqlite3'))):
+            kb = BreedKnowledgeBase(state, min_samples=5, max_cv=0.15)
+            widths = [random.gauss(520, 20) for _ in range(30)]
+            for w in widths:
+                kb.record({'animal_type': '고양이 (코리안 숏헤어)', 'posture': '앉음',
+                           'width': w, 'height': 380, 'depth': 420, 'confidence': 0.9})
+            # 신뢰도 미달은 누적하지 않음
+            assert not kb.record({'animal_type': '고양이', 'posture': '앉음', 'width': 1, 'height': 1,
+                                  'depth': 1, 'confidence': 0.3})
+
+            entry, reason = kb.lookup('고양이  (코리안 숏헤어)', '앉음')
+            assert reason == 'hit' and entry['count'] == 30
+            assert abs(entry['width'] - statistics.mean(widths)) < 0.1
+            assert abs(entry['std']['width'] - statistics.stdev(widths)) < 0.1
+
+            # 편차가 큰 품종 → 답하지 않음
+            for w in (300, 900, 450, 1200, 600):
+                kb.record({'animal_type': '믹스견', 'posture': '서있음', 'width': w, 'height': 500,
+                           'depth': 400, 'confidence': 0.9})
+            assert kb.lookup('믹스견', '서있음') == (None, 'high_variance')
+            assert kb.lookup('말티즈', '앉음') == (None, 'unknown')
+
+            # 분류 라벨은 분석 결과와 같은 동물·자세일 때만 사용
+            maltese = {'animal_type': '개 (말티즈)', 'posture': '앉음'}
+            kb.record({'animal_type': '고양이 (페르시안)', 'posture': '앉음', 'width': 480,
+                       'height': 360, 'depth': 400, 'confidence': 0.9}, label=maltese)
+            kb.record({'animal_type': '개', 'posture': '앉음', 'width': 320,
+                       'height': 280, 'depth': 300, 'confidence': 0.9}, label=maltese)
+            assert kb.entry('고양이 (페르시안)', '앉음')['count'] == 1
+            assert kb.entry('개 (말티즈)', '앉음')['width'] == 320
+            assert not same_animal(maltese, {'animal_type': '개 (푸들)', 'posture': '앉음'})
+            assert not same_animal(maltese, {'animal_type': '개 (말티즈)', 'posture': '누움'})
+            print(f"{'SQLite' if state else '메모리'}: {entry} / {kb.labels()} / {kb.stats()}")
+
+
+if __name__ == '__main__':
+    test_breed_knowledge()
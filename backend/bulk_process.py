@@ -0,0 +1,262 @@
+"""
+사진 폴더 일괄 처리 CLI
+보호소 등에서 받은 사진 아카이브를 HTTP API 없이 분석하고 박스 도면을 생성합니다.
+- Vision 호출은 동시 처리 이미지 수(--concurrency)로 제한
+- OpenCV/SVG 렌더링은 프로세스 풀(--workers)에서 처리
+- 처리 결과를 체크포인트(JSONL)에 즉시 기록 → 중단 후 다시 실행하면 이어서 처리
+- 마지막에 CSV 또는 Parquet 매니페스트 작성
+
+예시:
+    python bulk_process.py ~/shelter_photos --output bulk_out --concurrency 16 --workers 4
+    python bulk_process.py ~/shelter_photos --output bulk_out --manifest manifest.parquet
+"""
+
+import os
+import csv
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from image_analyzer import ImageAnalyzer
+from box_generator import BoxGenerator
+from box_catalog import QuantizationPolicy
+
+# Parquet 매니페스트 (선택)
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+load_dotenv()
+
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+MANIFEST_FIELDS = [
+    'path', 'status', 'width', 'height', 'depth', 'confidence', 'method', 'tier',
+    'animal_type', 'posture', 'svg', 'prompt_tokens', 'completion_tokens',
+    'elapsed_ms', 'error',
+]
+
+
+# ──────────────────────────────────────────────────────────
+#  프로세스 풀 작업 (SVG 렌더링)
+# ──────────────────────────────────────────────────────────
+
+_worker_generator = None
+
+
+def _init_worker(output_dir):
+    global _worker_generator
+    _worker_generator = BoxGenerator(output_dir, quantization=QuantizationPolicy.from_env())
+
+
+def _render_box(width, height, depth, thickness):
+    return _worker_generator.create_simple_box_svg(width, height, depth, thickness)
+
+
+# ──────────────────────────────────────────────────────────
+#  입력 / 체크포인트
+# ──────────────────────────────────────────────────────────
+
+def find_images(root):
+    """root 아래 이미지 파일 (정렬된 상대 경로)"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return found
+
+
+def file_signature(path):
+    """파일이 바뀌었으면 다시 처리하도록 크기 + 수정 시각으로 식별"""
+    st = os.stat(path)
+    return f'{st.st_size}:{st.st_mtime_ns}'
+
+
+def load_checkpoint(path):
+    """체크포인트 → {상대 경로: 마지막 기록}. 중단 시 잘린 마지막 줄은 무시"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record['path']] = record
+    return records
+
+
+def write_manifest(path, records):
+    rows = [{k: r.get(k) for k in MANIFEST_FIELDS} for r in records]
+    if path.endswith('.parquet'):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("Parquet 매니페스트에는 pyarrow가 필요합니다 (pip install pyarrow)")
+        table = pyarrow.Table.from_pylist(rows)
+        pyarrow.parquet.write_table(table, path)
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# ──────────────────────────────────────────────────────────
+#  처리
+# ──────────────────────────────────────────────────────────
+
+class BulkRun:
+    """한 번의 일괄 처리 실행 (진행률/처리량 집계 포함)"""
+
+    def __init__(self, args, analyzer, pool, checkpoint_file):
+        self.args = args
+        self.analyzer = analyzer
+        self.pool = pool
+        self.checkpoint_file = checkpoint_file
+        self.done = 0
+        self.failed = 0
+        self.total = 0
+        self.started = time.monotonic()
+        self.tiers = {}
+
+    async def process(self, rel_path):
+        loop = asyncio.get_running_loop()
+        path = os.path.join(self.args.input, rel_path)
+        record = {'path': rel_path, 'signature': file_signature(path)}
+        started = time.perf_counter()
+        try:
+            dims = await self.analyzer.analyze_async(
+                path,
+                method=self.args.method,
+                reference_size=self.args.reference_size,
+                executor=self.pool
+            )
+            svg_path = await loop.run_in_executor(
+                self.pool, _render_box,
+                dims['width'], dims['height'], dims['depth'], self.args.thickness
+            )
+            # 캐스케이드는 low detail 분류 호출까지 합산한 사용량을 따로 기록 (usage는 마지막 호출만)
+            cascade = dims.get('cascade', {})
+            usage = cascade if 'prompt_tokens' in cascade else dims.get('usage', {})
+            tier = cascade.get('tier', dims.get('method'))
+            record.update(
+                status='ok',
+                width=dims['width'], height=dims['height'], depth=dims['depth'],
+                confidence=dims.get('confidence'), method=dims.get('method'), tier=tier,
+                animal_type=dims.get('animal_type'), posture=dims.get('posture'),
+                svg=os.path.basename(svg_path),
+                prompt_tokens=usage.get('prompt_tokens', 0),
+                completion_tokens=usage.get('completion_tokens', 0),
+            )
+            self.tiers[tier] = self.tiers.get(tier, 0) + 1
+        except Exception as e:
+            record.update(status='error', error=f'{type(e).__name__}: {e}')
+            self.failed += 1
+
+        record['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        # 이벤트 루프 스레드에서만 기록하므로 잠금 불필요
+        self.checkpoint_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.checkpoint_file.flush()
+        self.done += 1
+        return record
+
+    async def worker(self, queue):
+        while queue:
+            await self.process(queue.pop())
+
+    async def report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.print_progress()
+
+    def print_progress(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        remaining = self.total - self.done
+        eta = remaining / rate if rate else float('inf')
+        usage = self.analyzer.usage_stats()
+        print(f"[Bulk] {self.done}/{self.total} ({self.failed} 실패) "
+              f"{rate:.2f} img/s, 남은 시간 {eta:.0f}s | "
+              f"Vision {usage['calls']}회 {usage['prompt_tokens'] + usage['completion_tokens']} tokens | "
+              f"단계 {self.tiers}", flush=True)
+
+
+async def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    checkpoint_path = os.path.join(args.output, args.checkpoint or 'checkpoint.jsonl')
+    manifest_path = os.path.join(args.output, args.manifest or 'manifest.csv')
+    if manifest_path.endswith('.parquet') and not PARQUET_AVAILABLE:
+        raise SystemExit("Parquet 매니페스트에는 pyarrow가 필요합니다 (pip install pyarrow)")
+
+    images = find_images(args.input)
+    if args.limit:
+        images = images[:args.limit]
+    previous = load_checkpoint(checkpoint_path)
+
+    # 성공 기록이 있고 파일이 그대로인 이미지는 건너뜀 (실패는 재시도)
+    todo = [p for p in images
+            if previous.get(p, {}).get('status') != 'ok'
+            or previous[p].get('signature') != file_signature(os.path.join(args.input, p))]
+    print(f"[Bulk] 이미지 {len(images)}개 중 {len(images) - len(todo)}개는 체크포인트로 건너뜀, "
+          f"{len(todo)}개 처리 (동시 {args.concurrency}, 프로세스 {args.workers})")
+
+    analyzer = ImageAnalyzer()
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(os.path.join(args.output, 'drawings'),),
+    )
+    queue = list(reversed(todo))
+
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint_file:
+        bulk = BulkRun(args, analyzer, pool, checkpoint_file)
+        bulk.total = len(todo)
+        reporter = asyncio.create_task(bulk.report(args.report_every))
+        try:
+            await asyncio.gather(*(bulk.worker(queue) for _ in range(args.concurrency)))
+        finally:
+            reporter.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+            bulk.print_progress()
+
+            records = load_checkpoint(checkpoint_path)
+            write_manifest(manifest_path, [records[p] for p in images if p in records])
+            print(f"[Bulk] 매니페스트: {manifest_path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='사진 폴더 일괄 분석 + 박스 도면 생성')
+    parser.add_argument('input', help='사진 폴더 (하위 폴더 포함)')
+    parser.add_argument('--output', default='bulk_output', help='도면/체크포인트/매니페스트 폴더')
+    parser.add_argument('--manifest', help='매니페스트 경로 (.csv 또는 .parquet, 상대 경로는 output 기준)')
+    parser.add_argument('--checkpoint', help='체크포인트 경로 (상대 경로는 output 기준)')
+    parser.add_argument('--method', default='auto', help="분석 방법 ('auto' | 'openai' | 'opencv')")
+    parser.add_argument('--reference-size', type=float, help='피사체 장축 실제 길이 (mm)')
+    parser.add_argument('--thickness', type=float, default=3.0, help='재료 두께 (mm)')
+    parser.add_argument('--concurrency', type=int, default=8, help='동시 처리 이미지 수 (Vision 동시 호출 상한)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='OpenCV/SVG 프로세스 수')
+    parser.add_argument('--limit', type=int, help='앞에서부터 N개만 처리')
+    parser.add_argument('--report-every', type=float, default=5.0, help='진행률 출력 간격 (초)')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("[Bulk] 중단됨 — 같은 명령으로 다시 실행하면 이어서 처리합니다")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+로컬 OpenAI API 대역(stand-in) 서버
+실제 API 없이 동시성/부하를 측정하기 위해 OpenAI 클라이언트가 쓰는
+chat.completions 엔드포인트를 흉내냅니다.
+
+실행:
+    python fake_openai.py --port 8011 --latency lognormal:1.8,0.35 --error-rate 0.02
+    OPENAI_API_KEY=dummy OPENAI_BASE_URL=http://127.0.0.1:8011/v1 gunicorn app:app
+
+지연 분포 (--latency):
+    2.0                 고정 2초
+    uniform:1,3         1~3초 균등
+    lognormal:1.8,0.35  중앙값 1.8초, sigma 0.35 (실제 API 꼬리 지연 근사)
+    exp:1.5             평균 1.5초 지수분포
+"""
+
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+CANNED_ANSWER = {
+    'animal_type': '고양이 (코리안 숏헤어)',
+    'posture': '앉음',
+    'width': 520,
+    'height': 380,
+    'depth': 420,
+    'confidence': 0.9,
+    'confidence_breakdown': {
+        'animal_recognition': 0.95,
+        'size_estimation': 0.85,
+        'posture_clarity': 0.9,
+    },
+    'notes': 'stand-in 응답',
+}
+
+
+def parse_latency(spec):
+    """지연 분포 문자열 → 샘플 함수(초)"""
+    spec = str(spec)
+    if ':' not in spec:
+        value = float(spec)
+        return lambda: value
+
+    kind, args = spec.split(':', 1)
+    params = [float(v) for v in args.split(',')]
+    if kind == 'uniform':
+        lo, hi = params
+        return lambda: random.uniform(lo, hi)
+    if kind == 'lognormal':
+        median, sigma = params
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    if kind == 'exp':
+        mean, = params
+        return lambda: random.expovariate(1 / mean)
+    raise ValueError(f'알 수 없는 지연 분포: {spec}')
+
+
+def estimate_prompt_tokens(body):
+    """요청 크기로 토큰 사용량 근사 (이미지는 detail별 고정 토큰)"""
+    tokens = 0
+    for message in body.get('messages', []):
+        content = message.get('content', '')
+        parts = content if isinstance(content, list) else [{'type': 'text', 'text': content}]
+        for part in parts:
+            if part.get('type') == 'text':
+                tokens += len(part.get('text', '')) // 2
+            elif part.get('type') == 'image_url':
+                tokens += 85 if part['image_url'].get('detail') == 'low' else 765
+    return tokens
+
+
+def schema_fields(answer, body):
+    """response_format 스키마의 properties만 남김 (분류 요청 등 작은 스키마 대응)"""
+    schema = ((body.get('response_format') or {}).get('json_schema') or {}).get('schema') or {}
+    properties = schema.get('properties')
+    if not properties:
+        return answer
+    return {k: v for k, v in answer.items() if k in properties}
+
+
+def create_app(latency='2.0', error_rate=0.0, rate_limit_rate=0.0, answers=None, seed=None):
+    """
+    Args:
+        latency: 지연 분포 문자열 (parse_latency 참고)
+        error_rate: 500 응답 확률
+        rate_limit_rate: 429 응답 확률
+        answers: 응답 후보 목록 (없으면 CANNED_ANSWER). 요청마다 하나를 무작위 선택
+    """
+    sample = parse_latency(latency)
+    answers = answers or [CANNED_ANSWER]
+    rng = random.Random(seed)
+    stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    async def chat_completions(request):
+        body = await request.json()
+        stats['requests'] += 1
+        stats['in_flight'] += 1
+        stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        try:
+            await asyncio.sleep(max(0.0, sample()))
+
+            roll = rng.random()
+            if roll < error_rate:
+                stats['errors'] += 1
+                return JSONResponse({'error': {'message': 'stand-in 서버 오류', 'type': 'server_error'}},
+                                    status_code=500)
+            if roll < error_rate + rate_limit_rate:
+                stats['rate_limited'] += 1
+                return JSONResponse({'error': {'message': 'stand-in 레이트 리밋', 'type': 'rate_limit'}},
+                                    status_code=429, headers={'retry-after': '1'})
+
+            # Structured Outputs 모드처럼 요청 스키마에 있는 필드만 JSON 본문으로 반환
+            content = json.dumps(schema_fields(rng.choice(answers), body), ensure_ascii=False)
+            prompt_tokens = estimate_prompt_tokens(body)
+            completion_tokens = len(content) // 3
+            return JSONResponse({
+                'id': f'chatcmpl-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'gpt-4o'),
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': content},
+                }],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+        finally:
+            stats['in_flight'] -= 1
+
+    async def get_stats(request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route('/v1/chat/completions', chat_completions, methods=['POST']),
+        Route('/stats', get_stats),
+    ])
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='로컬 OpenAI API 대역 서버')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8011)
+    parser.add_argument('--latency', default='2.0', help='응답 지연 분포 (초)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500 응답 확률')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='429 응답 확률')
+    parser.add_argument('--answers', help='응답 후보 JSON 파일 (객체 또는 객체 배열)')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    answers = None
+    if args.answers:
+        with open(args.answers, encoding='utf-8') as f:
+            answers = json.load(f)
+        if isinstance(answers, dict):
+            answers = [answers]
+
+    app = create_app(args.latency, args.error_rate, args.rate_limit_rate, answers, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+로컬 S3 호환 저장소 대역(stand-in) 서버
+MinIO 없이 S3Storage를 시험하기 위한 최소 구현입니다.
+경로 방식(/버킷/키) PUT/HEAD/GET, Range 요청, response-content-disposition을 지원하며
+서명은 검사하지 않습니다. 객체는 메모리에만 보관합니다.
+
+실행:
+    python fake_s3.py --port 9010
+    PAWBOX_STORAGE=s3 PAWBOX_S3_BUCKET=pawbox PAWBOX_S3_ENDPOINT=http://127.0.0.1:9010 \\
+    AWS_ACCESS_KEY_ID=dummy AWS_SECRET_ACCESS_KEY=dummy gunicorn app:app
+"""
+
+import hashlib
+import argparse
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+def error_response(status, code, message):
+    body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{message}</Message></Error>'
+    return Response(body, status_code=status, media_type='application/xml')
+
+
+def decode_aws_chunked(body):
+    """
+    aws-chunked 본문(체크섬 trailer 포함 스트리밍 업로드) → 원본 바이트
+    형식: <hex 크기>[;chunk-signature=...]\\r\\n<데이터>\\r\\n ... 0\\r\\n<trailer>\\r\\n\\r\\n
+    """
+    out = bytearray()
+    pos = 0
+    while True:
+        end = body.index(b'\r\n', pos)
+        size = int(body[pos:end].split(b';')[0], 16)
+        if size == 0:
+            return bytes(out)
+        out += body[end + 2:end + 2 + size]
+        pos = end + 2 + size + 2
+
+
+def parse_range(header, size):
+    """'bytes=a-b' → (시작, 끝) 또는 None (만족 불가)"""
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    start, _, end = spec.strip().partition('-')
+    if start == '':
+        length = int(end)
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def create_app():
+    objects = {}
+    stats = {'puts': 0, 'gets': 0, 'heads': 0, 'bytes_served': 0}
+
+    async def object_handler(request):
+        bucket = request.path_params['bucket']
+        key = request.path_params['key']
+        obj = objects.get((bucket, key))
+
+        if request.method == 'PUT':
+            body = await request.body()
+            if 'aws-chunked' in request.headers.get('content-encoding', '') \
+                    or 'x-amz-decoded-content-length' in request.headers:
+                body = decode_aws_chunked(body)
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            objects[(bucket, key)] = {
+                'body': body,
+                'etag': etag,
+                'content_type': request.headers.get('content-type', 'application/octet-stream'),
+            }
+            stats['puts'] += 1
+            return Response(status_code=200, headers={'ETag': etag})
+
+        if obj is None:
+            if request.method == 'HEAD':
+                return Response(status_code=404)
+            return error_response(404, 'NoSuchKey', 'The specified key does not exist.')
+
+        headers = {
+            'ETag': obj['etag'],
+            'Accept-Ranges': 'bytes',
+            'Content-Type': obj['content_type'],
+        }
+        disposition = request.query_params.get('response-content-disposition')
+        if disposition:
+            headers['Content-Disposition'] = disposition
+
+        body = obj['body']
+        if request.method == 'HEAD':
+            stats['heads'] += 1
+            headers['Content-Length'] = str(len(body))
+            return Response(status_code=200, headers=headers)
+
+        stats['gets'] += 1
+        range_header = request.headers.get('range')
+        if range_header:
+            span = parse_range(range_header, len(body))
+            if span is None:
+                return Response(status_code=416, headers={'Content-Range': f'bytes */{len(body)}'})
+            start, end = span
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(body)}'
+            stats['bytes_served'] += end - start + 1
+            return Response(body[start:end + 1], status_code=206, headers=headers)
+
+        stats['bytes_served'] += len(body)
+        return Response(body, status_code=200, headers=headers)
+
+    async def bucket_handler(request):
+        # CreateBucket / HeadBucket — 버킷은 첫 PUT에서 자동 생성되므로 항상 성공
+        return Response(status_code=200)
+
+    async def get_stats(request):
+        return JSONResponse({**stats, 'objects': len(objects)})
+
+    return Starlette(routes=[
+        Route('/_stats', get_stats),
+        Route('/{bucket}', bucket_handler, methods=['PUT', 'HEAD']),
+        Route('/{bucket}/{key:path}', object_handler, methods=['GET', 'HEAD', 'PUT']),
+    ])
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='로컬 S3 호환 저장소 대역 서버')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9010)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+POST 요청 멱등성(Idempotency-Key) 처리 모듈
+클라이언트 재시도로 같은 업로드/분석/Vision 과금이 반복되지 않도록
+첫 요청의 응답을 일정 시간 저장하고, 진행 중인 동일 요청은 그 결과를 기다립니다(single-flight).
+같은 키로 본문이 다른 요청이 오면 저장된 응답을 돌려주지 않고 422로 거절합니다.
+상태는 SharedState(SQLite)에 두어 gunicorn 워커 전체에서 공유됩니다.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import tempfile
+from functools import wraps
+
+from flask import request, jsonify, make_response
+from werkzeug.exceptions import RequestEntityTooLarge
+
+
+HEADER = 'Idempotency-Key'
+CHUNK_SIZE = 64 * 1024
+SPOOL_MEMORY = 1024 * 1024    # 본문 사본을 메모리에 둘 최대 크기 (넘으면 임시 파일)
+
+
+class IdempotencyConflict(Exception):
+    """같은 키로 다른 요청이 들어옴"""
+
+
+class IdempotencyStore:
+    """Idempotency-Key → 저장된 응답"""
+
+    NAMESPACE = 'idempotency'
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, state, ttl=None, lock_timeout=120):
+        """
+        Args:
+            state: SharedState 인스턴스
+            ttl: 완료된 응답 보관 시간(초) (기본 PAWBOX_IDEMPOTENCY_TTL 또는 600)
+            lock_timeout: 진행 중 표시 유효 시간 — 처리 워커가 죽어도 이후 재시도가 진행되도록
+        """
+        self.state = state
+        self.ttl = float(ttl if ttl is not None else os.environ.get('PAWBOX_IDEMPOTENCY_TTL', 600))
+        self.lock_timeout = lock_timeout
+
+        state.ensure_schema(
+            "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+            " key TEXT PRIMARY KEY, fingerprint TEXT, state TEXT,"
+            " status INTEGER, body BLOB, content_type TEXT, expires REAL)"
+        )
+
+    # ──────────────────────────────────────────────────────────
+    #  저장소 연산
+    # ──────────────────────────────────────────────────────────
+
+    def begin(self, key, fingerprint):
+        """
+        Returns:
+            ('new', None)      — 이 요청이 계산을 맡음
+            ('done', record)   — 저장된 응답 (status, body, content_type)
+            ('pending', None)  — 다른 요청이 계산 중
+        Raises: IdempotencyConflict
+        """
+        now = time.time()
+        conflict = False
+        with self.state.transaction() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE expires < ?", (now,))
+            row = conn.execute(
+                "SELECT fingerprint, state, status, body, content_type FROM idempotency_keys "
+                "WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                conn.execute(
+                    "INSERT INTO idempotency_keys (key, fingerprint, state, expires) "
+                    "VALUES (?, ?, 'pending', ?)",
+                    (key, fingerprint, now + self.lock_timeout)
+                )
+                return 'new', None
+
+            if row[0] != fingerprint:
+                # 카운터가 롤백되지 않도록 트랜잭션 종료 후 예외
+                self.state.incr(self.NAMESPACE, 'conflicts', conn=conn)
+                conflict = True
+            elif row[1] == 'done':
+                self.state.incr(self.NAMESPACE, 'replayed', conn=conn)
+                return 'done', (row[2], row[3], row[4])
+            else:
+                self.state.incr(self.NAMESPACE, 'joined', conn=conn)
+                return 'pending', None
+
+        if conflict:
+            raise IdempotencyConflict('같은 Idempotency-Key로 다른 요청이 전송되었습니다')
+
+    def complete(self, key, status, body, content_type):
+        with self.state.transaction() as conn:
+            conn.execute(
+                "UPDATE idempotency_keys SET state = 'done', status = ?, body = ?,"
+                " content_type = ?, expires = ? WHERE key = ?",
+                (status, body, content_type, time.time() + self.ttl, key)
+            )
+            self.state.incr(self.NAMESPACE, 'stored', conn=conn)
+
+    def abandon(self, key):
+        """저장하지 않을 응답(5xx/혼잡)이면 키를 풀어 재시도가 다시 계산하게 함"""
+        with self.state.transaction() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND state = 'pending'", (key,))
+
+    def _check(self, key):
+        row = self.state.connect().execute(
+            "SELECT state, status, body, content_type FROM idempotency_keys WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return 'gone', None
+        if row[0] == 'done':
+            return 'done', (row[1], row[2], row[3])
+        return 'pending', None
+
+    def wait(self, key, timeout=None):
+        """진행 중인 요청의 결과 대기. Returns: record 또는 None(원 요청 실패/시간 초과)"""
+        deadline = time.monotonic() + (timeout or self.lock_timeout)
+        while time.monotonic() < deadline:
+            state, record = self._check(key)
+            if state != 'pending':
+                return record
+            time.sleep(self.POLL_INTERVAL)
+        return None
+
+    async def wait_async(self, key, timeout=None):
+        deadline = time.monotonic() + (timeout or self.lock_timeout)
+        while time.monotonic() < deadline:
+            state, record = await asyncio.to_thread(self._check, key)
+            if state != 'pending':
+                return record
+            await asyncio.sleep(self.POLL_INTERVAL)
+        return None
+
+    def stats(self):
+        return self.state.counters(self.NAMESPACE)
+
+    # ──────────────────────────────────────────────────────────
+    #  Flask 연동
+    # ──────────────────────────────────────────────────────────
+
+    def idempotent(self, route):
+        """
+        라우트 데코레이터. Idempotency-Key 헤더가 없으면 그대로 실행.
+        admission.limit()보다 바깥에 두어 중복 요청이 슬롯을 차지하지 않게 합니다.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                header = request.headers.get(HEADER)
+                if not header:
+                    return view(*args, **kwargs)
+
+                key = scoped_key(route, header, client_scope(request.headers))
+                try:
+                    fingerprint = request_fingerprint(request.method, request.full_path,
+                                                      request.mimetype, flask_body_digest())
+                except RequestEntityTooLarge:
+                    return jsonify({'error': '파일이 너무 큽니다'}), 413
+
+                # 같은 키의 요청이 진행 중이면 완료를 기다렸다가 저장된 응답 사용
+                for _ in range(3):
+                    try:
+                        outcome, record = self.begin(key, fingerprint)
+                    except IdempotencyConflict as e:
+                        return jsonify({'error': str(e)}), 422
+
+                    if outcome == 'pending':
+                        record = self.wait(key)
+                        if record is None:
+                            continue
+                    if record is not None:
+                        return replay_response(record)
+                    break
+                else:
+                    return jsonify({'error': '동일한 요청이 아직 처리 중입니다'}), 409
+
+                try:
+                    response = make_response(view(*args, **kwargs))
+                except BaseException:
+                    self.abandon(key)
+                    raise
+
+                if response.is_streamed:
+                    # 스트리밍 본문은 저장하려면 전부 버퍼링해야 함 → 저장하지 않음 (재시도는 다시 계산)
+                    self.abandon(key)
+                elif should_store(response.status_code):
+                    self.complete(key, response.status_code, response.get_data(), response.content_type)
+                else:
+                    self.abandon(key)
+                return response
+            return wrapper
+        return decorator
+
+
+def scoped_key(route, header, scope=''):
+    digest = hashlib.sha256(f'{scope}\0{header}'.encode()).hexdigest()[:32]
+    return f'{route}:{digest}'
+
+
+def client_scope(headers):
+    """다른 사용자가 같은 키를 써도 응답이 섞이지 않도록 인증 헤더로 범위 지정"""
+    return headers.get('Authorization', '')
+
+
+def request_fingerprint(method, path, mimetype, body=''):
+    """
+    비교 가능한 요청 요약 (body: 본문 요약 — form_digest / spool_body 참고).
+    multipart boundary는 재시도마다 바뀌므로 파라미터를 뺀 MIME 타입만 사용
+    """
+    return f'{method} {path} {mimetype or ""} {body}'
+
+
+def form_digest(fields, files):
+    """
+    multipart 본문 요약 — boundary가 달라도 필드·파일이 같으면 같은 값.
+    fields: (이름, 값) / files: (이름, 파일명, 파일 객체 — 끝까지 읽은 뒤 처음으로 되감음)
+    """
+    digest = hashlib.sha256()
+    for name, value in sorted(fields):
+        digest.update(f'{name}\0{value}\0'.encode())
+    for name, filename, stream in sorted(files, key=lambda f: f[:2]):
+        digest.update(f'{name}\0{filename}\0'.encode())
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        stream.seek(0)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def spool_body(stream):
+    """
+    본문을 해시하면서 사본(작으면 메모리, 크면 임시 파일)에 복사.
+    뷰는 사본을 원래 스트림처럼 청크 단위로 읽으므로 본문 전체가 메모리에 올라가지 않습니다.
+    Returns: (digest, 처음으로 되감은 사본)
+    """
+    digest = hashlib.sha256()
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        spooled.write(chunk)
+    spooled.seek(0)
+    return digest.hexdigest(), spooled
+
+
+def flask_body_digest():
+    """현재 Flask 요청의 본문 요약 (multipart가 아니면 request.stream을 사본으로 교체)"""
+    if request.mimetype == 'multipart/form-data':
+        return form_digest(
+            request.form.items(multi=True),
+            [(name, f.filename, f.stream) for name, f in request.files.items(multi=True)]
+        )
+    digest, spooled = spool_body(request.stream)
+    request.stream = spooled
+    return digest
+
+
+def should_store(status):
+    """2xx/4xx(결정적 결과)만 저장 — 5xx, 429, 503은 재시도가 다시 계산해야 함"""
+    return status < 500 and status not in (409, 429)
+
+
+def replay_response(record):
+    status, body, content_type = record
+    response = make_response(body, status)
+    response.headers['Content-Type'] = content_type
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def test_idempotency():
+    """재생 / 본문이 다른 재사용 거절 / multipart boundary 무관 / 동시 요청 single-flight 확인"""
+    import io
+    import threading
+    from flask import Flask
+    from shared_state import SharedState
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = IdempotencyStore(SharedState(os.path.join(tmp, 'state.sqlite3')))
+        app = Flask(__name__)
+        calls = []
+
+        @app.route('/generate', methods=['POST'])
+        @store.idempotent('generate')
+        def generate():
+            calls.append(1)
+            time.sleep(0.3)
+            return jsonify({'width': request.get_json()['width'], 'call': len(calls)})
+
+        @app.route('/upload', methods=['POST'])
+        @store.idempotent('upload')
+        def upload():
+            calls.append(1)
+            return jsonify({'size': len(request.files['image'].read()), 'call': len(calls)})
+
+        client = app.test_client()
+        first = client.post('/generate', json={'width': 200}, headers={HEADER: 'k1'})
+        replay = client.post('/generate', json={'width': 200}, headers={HEADER: 'k1'})
+        assert replay.headers.get('Idempotent-Replayed') == 'true'
+        assert replay.get_json() == first.get_json() and len(calls) == 1
+
+        changed = client.post('/generate', json={'width': 500}, headers={HEADER: 'k1'})
+        assert changed.status_code == 422 and len(calls) == 1
+
+        # multipart 재시도는 boundary가 달라도 같은 요청
+        for boundary in ('aaa', 'bbb'):
+            body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="c.jpg"\r\n'
+                    f'Content-Type: image/jpeg\r\n\r\n').encode() + b'\xff\xd8' * 100 \
+                + f'\r\n--{boundary}--\r\n'.encode()
+            response = client.post('/upload', data=io.BytesIO(body), headers={HEADER: 'k2'},
+                                   content_type=f'multipart/form-data; boundary={boundary}')
+            assert response.get_json()['size'] == 200
+        assert response.headers.get('Idempotent-Replayed') == 'true' and len(calls) == 2
+
+        # 동시에 들어온 같은 키는 한 번만 계산
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(app.test_client().post(
+            '/generate', json={'width': 300}, headers={HEADER: 'k3'}).get_json())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 3 and all(r == results[0] for r in results), results
+        print(f"calls={len(calls)} / {store.stats()}")
+
+
+if __name__ == '__main__':
+    test_idempotency()
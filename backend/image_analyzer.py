@@ -1,5 +1,5 @@
 """
-이미지 분석 모듈 (OpenAI GPT-4o Vision)
+이미지 분석 모듈 (OpenAI GPT-4o / Gemini Vision)
 반려동물 사진에서 박스 치수를 고정밀 추정합니다.
 목표 신뢰도: 90%+
 """
@@ -7,21 +7,240 @@
 import os
 import base64
 import json
-import re
 import math
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
 
 import cv2
 import numpy as np
 from PIL import Image
 
-# OpenAI
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OpenAI = None
-    OPENAI_AVAILABLE = False
+import image_io
+import vision_providers
+from breed_knowledge import BreedKnowledgeBase
+
+
+POSTURES = ['앉음', '엎드림', '서있음']
+
+# Structured Outputs 스키마 — 모델이 이 형식 외의 응답을 내지 못하도록 강제
+RESULT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'animal_type': {'type': 'string'},
+        'posture':     {'type': 'string', 'enum': POSTURES},
+        'width':       {'type': 'number'},
+        'height':      {'type': 'number'},
+        'depth':       {'type': 'number'},
+        'confidence':  {'type': 'number'},
+        'confidence_breakdown': {
+            'type': 'object',
+            'properties': {
+                'animal_recognition': {'type': 'number'},
+                'size_estimation':    {'type': 'number'},
+                'posture_clarity':    {'type': 'number'},
+            },
+            'required': ['animal_recognition', 'size_estimation', 'posture_clarity'],
+            'additionalProperties': False,
+        },
+        'notes': {'type': 'string'},
+    },
+    'required': ['animal_type', 'posture', 'width', 'height', 'depth',
+                 'confidence', 'confidence_breakdown', 'notes'],
+    'additionalProperties': False,
+}
+
+RESPONSE_FORMAT = {
+    'type': 'json_schema',
+    'json_schema': {'name': 'pet_box_dimensions', 'strict': True, 'schema': RESULT_SCHEMA},
+}
+
+# 스키마 JSON 응답은 ~120 토큰 — notes가 길어져도 여유 있게
+MAX_COMPLETION_TOKENS = 200
+
+# low detail 분류 호출 — 치수 없이 종류/자세만 (치수는 지식 베이스에서)
+CLASSIFY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'animal_type': {'type': 'string'},
+        'posture':     {'type': 'string', 'enum': POSTURES},
+        'confidence':  {'type': 'number'},
+    },
+    'required': ['animal_type', 'posture', 'confidence'],
+    'additionalProperties': False,
+}
+
+CLASSIFY_FORMAT = {
+    'type': 'json_schema',
+    'json_schema': {'name': 'pet_classification', 'strict': True, 'schema': CLASSIFY_SCHEMA},
+}
+
+CLASSIFY_MAX_TOKENS = 60
+
+# ── 분석 캐스케이드 (로컬 → low detail → high detail) ─────────────
+# 로컬 추정 신뢰도 보정 계수 (로지스틱). fit_local_calibration()으로 재학습 가능
+# 분할 품질만 보는 사전값 — 치수 정확도는 reference_size가 있을 때만 의미가 있음
+LOCAL_CALIBRATION = {
+    'bias': -3.2,
+    'weights': {
+        'area_fit':         2.0,   # 피사체 면적비가 적당한가 (0.4 근처 = 1)
+        'solidity':         3.0,   # 윤곽이 덩어리진 단일 형태인가
+        'centered':         1.5,   # 화면 중앙에 있는가
+        'extra_subjects':  -1.2,   # 비슷한 크기의 다른 덩어리 수
+        'touches_border':  -2.0,   # 피사체가 잘렸는가
+    },
+}
+
+# 참조 크기 없이 평균 체장 prior로 환산할 때의 신뢰도 감쇠 / 상한
+# (모든 피사체가 같은 체장으로 환산되므로 캐스케이드는 이 결과로 응답하지 않음)
+NO_REFERENCE_PENALTY = 0.85
+NO_REFERENCE_MAX_CONFIDENCE = 0.5
+DEFAULT_SUBJECT_LENGTH_MM = 450    # 소형견/고양이 평균 체장
+BODY_WIDTH_RATIO = 0.35            # 체폭 ≈ 체장 × 0.35
+
+# gpt-4o 입력/출력 단가 (USD / 1M tokens) — 절감액 추정용
+PRICE_PER_M_INPUT = 2.50
+PRICE_PER_M_OUTPUT = 10.00
+LOW_DETAIL_IMAGE_TOKENS = 85
+
+
+def high_detail_image_tokens(width, height):
+    """detail='high' 이미지 토큰 수 (2048 박스 → 짧은 변 768 → 512 타일당 170 + 85)"""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def fit_local_calibration(samples, epochs=2000, lr=0.1):
+    """
+    로컬 추정 신뢰도 보정 계수 학습 (로지스틱 회귀).
+
+    Args:
+        samples: [(features dict, correct: bool), ...]
+                 correct = 로컬 추정이 고해상도 Vision 결과와 허용오차 내로 일치했는지
+    Returns:
+        LOCAL_CALIBRATION 형식 dict
+    """
+    names = list(LOCAL_CALIBRATION['weights'])
+    X = np.array([[f[n] for n in names] for f, _ in samples], dtype=np.float64)
+    y = np.array([float(ok) for _, ok in samples])
+    w = np.zeros(len(names))
+    b = 0.0
+    for _ in range(epochs):
+        p = 1 / (1 + np.exp(-(X @ w + b)))
+        w -= lr * (X.T @ (p - y)) / len(y)
+        b -= lr * float(np.mean(p - y))
+    return {'bias': round(b, 4), 'weights': {n: round(float(v), 4) for n, v in zip(names, w)}}
+
+
+@dataclass
+class AnalysisResult:
+    """검증된 치수 추정 결과"""
+    width: float
+    height: float
+    depth: float
+    confidence: float
+    animal_type: str = ''
+    posture: str = ''
+    notes: str = ''
+    method: str = ''
+    usage: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_model_json(cls, raw_text: str, method: str, usage=None) -> 'AnalysisResult':
+        """
+        스키마 응답을 검증해 결과 객체로 변환.
+        Raises: ValueError (JSON 아님 / 필드 누락 / 수치 이상)
+        """
+        try:
+            data = json.loads(raw_text)
+        except (TypeError, json.JSONDecodeError) as e:
+            raise ValueError(f"JSON 응답이 아닙니다: {e}") from e
+
+        missing = [k for k in RESULT_SCHEMA['required'] if k not in data]
+        if missing:
+            raise ValueError(f"필수 필드 누락: {', '.join(missing)}")
+
+        def number(value, name):
+            try:
+                v = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} 값이 숫자가 아닙니다: {value!r}")
+            if not math.isfinite(v):
+                raise ValueError(f"{name} 값이 유효하지 않습니다: {value!r}")
+            return v
+
+        # 물리적 타당성 검사 (최소 50mm, 최대 2000mm)
+        def clamp(v, lo=50, hi=2000):
+            return max(lo, min(hi, v))
+
+        w = clamp(number(data['width'], 'width'))
+        h = clamp(number(data['height'], 'height'))
+        d = clamp(number(data['depth'], 'depth'))
+
+        raw_conf  = min(1.0, max(0.0, number(data['confidence'], 'confidence')))
+        breakdown = data['confidence_breakdown'] or {}
+
+        # 세부 항목 신뢰도 가중 평균과 종합 신뢰도의 평균
+        weighted = (
+            number(breakdown.get('animal_recognition', raw_conf), 'animal_recognition') * 0.4 +
+            number(breakdown.get('size_estimation', raw_conf), 'size_estimation') * 0.4 +
+            number(breakdown.get('posture_clarity', raw_conf), 'posture_clarity') * 0.2
+        )
+        confidence = (raw_conf + weighted) / 2
+
+        return cls(
+            width=round(w, 1),
+            height=round(h, 1),
+            depth=round(d, 1),
+            confidence=round(min(confidence, 0.98), 3),
+            animal_type=str(data['animal_type']),
+            posture=str(data['posture']),
+            notes=str(data['notes']),
+            method=method,
+            usage=dict(usage or {}),
+        )
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        if not result['usage']:
+            del result['usage']
+        return result
+
+
+def parse_classification(raw_text: str, usage=None) -> dict:
+    """
+    분류 스키마 응답 검증.
+    Raises: ValueError (JSON 아님 / 필드 누락 / 자세·신뢰도 이상)
+    """
+    try:
+        data = json.loads(raw_text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"JSON 응답이 아닙니다: {e}") from e
+
+    missing = [k for k in CLASSIFY_SCHEMA['required'] if k not in data]
+    if missing:
+        raise ValueError(f"필수 필드 누락: {', '.join(missing)}")
+    if data['posture'] not in POSTURES:
+        raise ValueError(f"알 수 없는 자세: {data['posture']!r}")
+    try:
+        confidence = float(data['confidence'])
+    except (TypeError, ValueError):
+        raise ValueError(f"confidence 값이 숫자가 아닙니다: {data['confidence']!r}")
+    if not math.isfinite(confidence) or not str(data['animal_type']).strip():
+        raise ValueError("분류 결과가 유효하지 않습니다")
+
+    return {
+        'animal_type': str(data['animal_type']).strip(),
+        'posture': data['posture'],
+        'confidence': round(min(1.0, max(0.0, confidence)), 3),
+        'usage': dict(usage or {}),
+    }
 
 
 
@@ -29,26 +248,71 @@ except ImportError:
 class ImageAnalyzer:
     """반려동물 이미지에서 박스 치수를 고정밀 추정합니다."""
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, local_threshold=None, low_detail_threshold=None,
+                 local_calibration=None, vision=None, knowledge=None):
+        """
+        Args:
+            api_key: OpenAI API 키 (없으면 OPENAI_API_KEY)
+            local_threshold: 이 신뢰도 이상이면 로컬 추정으로 응답 (PAWBOX_LOCAL_CONFIDENCE)
+            low_detail_threshold: low detail 분류 신뢰도가 이 이상이어야 지식 베이스로 응답
+                                  (PAWBOX_LOW_DETAIL_CONFIDENCE)
+            local_calibration: 로컬 신뢰도 보정 계수 (기본 LOCAL_CALIBRATION)
+            vision: VisionRouter (없으면 PAWBOX_VISION_PROVIDERS 설정으로 생성)
+            knowledge: BreedKnowledgeBase (없으면 워커 메모리에만 누적)
+        """
         self.openai_key = api_key or os.environ.get('OPENAI_API_KEY')
+        self.local_threshold = float(
+            local_threshold if local_threshold is not None
+            else os.environ.get('PAWBOX_LOCAL_CONFIDENCE', 0.8)
+        )
+        self.low_detail_threshold = float(
+            low_detail_threshold if low_detail_threshold is not None
+            else os.environ.get('PAWBOX_LOW_DETAIL_CONFIDENCE', 0.75)
+        )
+        self.local_calibration = local_calibration or LOCAL_CALIBRATION
         
-        # OpenAI 클라이언트
-        if self.openai_key and OPENAI_AVAILABLE:
-            self.openai_client = OpenAI(api_key=self.openai_key)
-            self.model = 'openai'
-        else:
-            self.openai_client = None
-            self.model = None
+        # Vision 제공자 (OpenAI / Gemini / 대역) — 키가 있는 제공자만 사용
+        self.vision = vision or vision_providers.from_env(openai_key=self.openai_key)
+        self.model = self.vision.names[0] if self.vision.providers else None
+
+        # 품종·자세별 치수 지식 베이스 (high detail 결과를 누적)
+        self.knowledge = knowledge or BreedKnowledgeBase.from_env()
+
+        # Vision 호출 토큰/지연 누적 (워커 단위)
+        self._usage_lock = threading.Lock()
+        self._usage = {'calls': 0, 'parse_failures': 0,
+                       'prompt_tokens': 0, 'completion_tokens': 0, 'latency_ms': 0.0}
+        self._cascade = {'local': 0, 'knowledge_base': 0, 'vision_high': 0,
+                         'saved_tokens': 0, 'saved_usd': 0.0,
+                         'analyses': 0, 'tokens': 0, 'latency_ms': 0.0,
+                         'escalations': {'unknown': 0, 'high_variance': 0,
+                                         'low_confidence': 0, 'classify_failed': 0}}
+
+    def __getstate__(self):
+        """
+        프로세스 풀(executor)로 보낼 때 락은 제외 (제공자 클라이언트는 각자 제외).
+        자식 프로세스에서는 OpenCV·인코딩 같은 로컬 계산만 수행합니다.
+        """
+        state = self.__dict__.copy()
+        state.update(_usage_lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._usage_lock = threading.Lock()
 
     # ──────────────────────────────────────────────────────────────
     #  OpenCV 보조 분석 — AI에게 추가 힌트 제공
     # ──────────────────────────────────────────────────────────────
-    def _opencv_hints(self, image_path):
+    def _opencv_hints(self, image_path, img=None, scale=1.0, original_size=None):
         """
         OpenCV로 주요 피사체의 픽셀 비율을 계산해 AI 프롬프트 보조 데이터로 사용.
+        img: 이미 디코딩된 이미지가 있으면 재사용 (scale/original_size는 image_io.load_bgr 결과)
         Returns: dict with pixel_ratio_wh, pixel_ratio_wd, img_w, img_h
+                 (pixel_bbox만 디코딩 해상도 기준, 나머지는 원본 해상도 기준)
         """
-        img = cv2.imread(image_path)
+        if img is None:
+            img, scale, original_size = image_io.load_bgr(image_path)
         if img is None:
             return {}
 
@@ -78,13 +342,16 @@ class ImageAnalyzer:
         short_side = min(rw, rh)
 
         ratio_wh = round(long_side / short_side, 3) if short_side > 0 else 1.0
+        ow, oh = original_size or (iw, ih)
 
         return {
-            'pixel_bbox_w': int(w),
-            'pixel_bbox_h': int(h),
+            'pixel_bbox_w': int(w / scale),
+            'pixel_bbox_h': int(h / scale),
             'pixel_ratio_long_short': ratio_wh,
             'subject_area_ratio': round(w * h / (iw * ih), 3),
-            'image_size': f"{iw}x{ih}",
+            'image_size': f"{ow}x{oh}",
+            'pixel_bbox': (int(x), int(y), int(w), int(h)),
+            'decode_scale': round(scale, 4),
         }
 
     # ──────────────────────────────────────────────────────────────
@@ -93,61 +360,40 @@ class ImageAnalyzer:
     def _build_prompt(self, hints: dict) -> str:
         hint_str = ""
         if hints:
-            hint_str = f"""
-[OpenCV 보조 데이터 — 무조건 참고하세요]
-- 피사체 바운딩박스 픽셀: {hints.get('pixel_bbox_w')}px(가로) × {hints.get('pixel_bbox_h')}px(세로)
-- 장축:단축 비율: {hints.get('pixel_ratio_long_short')}
-- 피사체가 이미지에서 차지하는 비율: {hints.get('subject_area_ratio')}
-- 원본 이미지 크기: {hints.get('image_size')}
-"""
-
-        return f"""당신은 반려동물 신체 치수 전문 측정 AI입니다.
-이 이미지에 찍힌 반려동물(강아지/고양이/토끼 등)이 편안하게 들어갈 수 있는
-골판지/MDF 집 박스의 최적 치수를 추정해 주세요.
-
+            hint_str = (
+                f"OpenCV 참고: 피사체 {hints.get('pixel_bbox_w')}×{hints.get('pixel_bbox_h')}px, "
+                f"장단축비 {hints.get('pixel_ratio_long_short')}, "
+                f"면적비 {hints.get('subject_area_ratio')}, 원본 {hints.get('image_size')}"
+            )
+
+        # 응답 형식은 RESPONSE_FORMAT 스키마가 강제하므로 프롬프트에서는 추정 규칙만 전달
+        return f"""반려동물이 편안히 들어갈 골판지/MDF 집 박스 치수(mm)를 추정하세요.
 {hint_str}
-
-[추정 단계 — 반드시 이 순서대로 추론하세요]
-STEP 1. 동물 종류와 품종을 파악하세요 (예: 소형견, 고양이, 대형견 등).
-STEP 2. 동물의 신체 각 부위(머리, 몸통, 다리)의 표준 신체 치수를 기억합니다.
-STEP 3. 이미지 내 동물의 자세(앉음/엎드림/서있음)와 픽셀 비율을 참고해 실제 크기를 보정합니다.
-STEP 4. 박스 치수를 계산합니다:
-   - 가로(width): 동물 몸통 길이 × 1.3 (여유 공간 포함)
-   - 높이(height): 앉았을 때 머리 끝 높이 × 1.2
-   - 깊이(depth): 동물 몸통 폭 × 1.4 (들어갈 수 있게)
-STEP 5. 각 치수의 신뢰도를 독립적으로 평가하고 종합 신뢰도를 계산합니다.
-
-[신뢰도 가이드]
-- 0.90~1.00: 동물 전신이 명확히 보이고 품종이 확실
-- 0.75~0.89: 동물이 보이지만 일부 가려지거나 자세가 불명확
-- 0.50~0.74: 동물이 모호하게 보임
-- 0.50 미만: 동물을 식별하기 어려움
-
-[응답 형식 — 반드시 JSON 코드블록만 반환]
-```json
-{{
-  "animal_type": "동물 종류와 품종",
-  "posture": "앉음/엎드림/서있음 중 하나",
-  "width": 가로_mm,
-  "height": 높이_mm,
-  "depth": 깊이_mm,
-  "confidence": 신뢰도_0~1,
-  "confidence_breakdown": {{
-    "animal_recognition": 0.0~1.0,
-    "size_estimation": 0.0~1.0,
-    "posture_clarity": 0.0~1.0
-  }},
-  "notes": "추정 근거 한 줄 요약"
-}}
-```"""
+1. 동물 종류·품종과 자세를 파악하고 품종 표준 신체 치수를 떠올립니다.
+2. 자세와 픽셀 비율로 실제 크기를 보정합니다.
+3. width = 몸통 길이 × 1.3, height = 앉은 키(머리 끝) × 1.2, depth = 몸통 폭 × 1.4
+4. confidence: 0.9+ 전신·품종 명확, 0.75+ 일부 가림, 0.5+ 모호, 그 미만 식별 곤란
+notes는 추정 근거 한 줄."""
+
+    def _build_classify_prompt(self) -> str:
+        labels = self.knowledge.labels()
+        label_str = f"\n가능하면 다음 표기 중 하나를 그대로 사용: {', '.join(labels)}" if labels else ""
+        return f"""사진 속 반려동물의 종류·품종과 자세만 판별하세요.
+animal_type은 '동물 (품종)' 형식 (예: 고양이 (코리안 숏헤어), 개 (말티즈)).{label_str}
+confidence: 0.9+ 품종·자세 명확, 0.75+ 대체로 확실, 그 미만 모호."""
 
     # ──────────────────────────────────────────────────────────────
-    #  OpenAI GPT-4o Vision 분석
+    #  Vision 분석 (OpenAI / Gemini — 제공자 경주는 vision_providers)
     # ──────────────────────────────────────────────────────────────
-    def analyze_with_openai(self, image_path: str) -> dict:
-        if not self.openai_client:
-            raise RuntimeError("OPENAI_API_KEY가 설정되지 않았습니다.")
-
+    def _vision_request(self, image_path: str, detail='high', hints=None,
+                        classify_prompt=None) -> dict:
+        """
+        chat.completions.create 인자 구성 (이미지 인코딩 + OpenCV 힌트 — CPU 작업).
+        동기/비동기 호출 경로와 모든 제공자가 함께 사용합니다 (model은 제공자가 지정).
+        classify_prompt: 있으면 치수 없이 종류/자세만 묻는 분류 요청
+                         (지식 베이스 라벨을 읽으므로 호출하는 프로세스에서 미리 생성)
+        """
+        classify = classify_prompt is not None
         # 이미지 → base64
         with open(image_path, 'rb') as f:
             b64 = base64.b64encode(f.read()).decode()
@@ -157,13 +403,18 @@ STEP 5. 각 치수의 신뢰도를 독립적으로 평가하고 종합 신뢰도
                 'png': 'image/png', 'webp': 'image/webp',
                 'gif': 'image/gif'}.get(ext, 'image/jpeg')
 
-        hints  = self._opencv_hints(image_path)
-        prompt = self._build_prompt(hints)
+        if classify:
+            prompt = classify_prompt
+        else:
+            if hints is None:
+                hints = self._opencv_hints(image_path)
+            prompt = self._build_prompt(hints)
 
-        response = self.openai_client.chat.completions.create(
+        return dict(
             model='gpt-4o',
             temperature=0.2,       # 낮은 temperature → 일관된 답변
-            max_tokens=800,
+            max_tokens=CLASSIFY_MAX_TOKENS if classify else MAX_COMPLETION_TOKENS,
+            response_format=CLASSIFY_FORMAT if classify else RESPONSE_FORMAT,
             messages=[
                 {
                     'role': 'user',
@@ -171,14 +422,95 @@ STEP 5. 각 치수의 신뢰도를 독립적으로 평가하고 종합 신뢰도
                         {'type': 'text', 'text': prompt},
                         {'type': 'image_url',
                          'image_url': {'url': f'data:{mime};base64,{b64}',
-                                       'detail': 'high'}},
+                                       'detail': detail}},
                     ],
                 }
             ],
         )
 
-        raw = response.choices[0].message.content
-        return self._parse_result(raw, method='openai_gpt4o')
+    def _vision_method(self, provider, detail):
+        return provider.method if detail == 'high' else f'{provider.method}_{detail}'
+
+    def _vision_plan(self, image_path, detail='high', hints=None, provider=None, label=None):
+        """
+        provider(기본: 설정 순서 첫 제공자)로 분석. 관측 p90을 넘기면 다음 제공자와 경주하고
+        먼저 검증을 통과한 응답을 씁니다.
+        high detail 결과는 지식 베이스에 누적
+        (label: 조회에 쓴 분류 결과 — 결과와 같은 동물·자세면 그 표기로 누적해 조회 키와 일치)
+        """
+        if not self.vision.providers:
+            raise RuntimeError("OPENAI_API_KEY / GEMINI_API_KEY가 설정되지 않았습니다.")
+
+        kwargs = yield 'request', (image_path, detail, hints, None)
+        result, info = yield 'race', (
+            kwargs, detail, provider,
+            lambda p, response, latency: self._parse_result(
+                response, method=self._vision_method(p, detail), latency=latency, provider=p.name)
+        )
+        result.update(info)
+        yield 'learn', (result, detail, label)
+        return result
+
+    def _classify_plan(self, image_path, provider=None):
+        """low detail 분류 호출 → {'animal_type', 'posture', 'confidence', 'usage', 'provider'}"""
+        if not self.vision.providers:
+            raise RuntimeError("OPENAI_API_KEY / GEMINI_API_KEY가 설정되지 않았습니다.")
+
+        # 지식 베이스 라벨을 읽으므로 호출하는 프로세스에서 미리 생성
+        prompt = yield 'classify_prompt', ()
+        kwargs = yield 'request', (image_path, 'low', None, prompt)
+        label, info = yield 'race', (
+            kwargs, 'classify', provider,
+            lambda p, response, latency: self._parse_classification(
+                response, latency=latency, provider=p.name)
+        )
+        label.update(info)
+        return label
+
+    def analyze_with_vision(self, image_path: str, detail='high', hints=None,
+                            provider=None, label=None) -> dict:
+        """Vision 분석 (_vision_plan 참고)"""
+        return self._run(self._vision_plan(image_path, detail, hints, provider, label))
+
+    def classify_with_vision(self, image_path: str, provider=None) -> dict:
+        """low detail 분류 (_classify_plan 참고)"""
+        return self._run(self._classify_plan(image_path, provider))
+
+    def _learn(self, result, detail, label=None):
+        if detail != 'high':
+            return
+        try:
+            self.knowledge.record(result, label)
+        except Exception as e:
+            # 지식 베이스 기록 실패가 분석 응답을 막지 않도록
+            print(f"[Knowledge] 기록 실패: {e}")
+
+    def _knowledge_result(self, label):
+        """
+        분류 결과 → 지식 베이스 치수.
+        Returns: (결과 dict 또는 None, 'hit' | 'low_confidence' | 'unknown' | 'high_variance')
+        """
+        if label['confidence'] < self.low_detail_threshold:
+            return None, 'low_confidence'
+        entry, reason = self.knowledge.lookup(label['animal_type'], label['posture'])
+        if entry is None:
+            return None, reason
+
+        result = AnalysisResult(
+            width=entry['width'],
+            height=entry['height'],
+            depth=entry['depth'],
+            # 분류 확신도 × (1 - 변동계수)
+            confidence=round(min(label['confidence'] * (1 - entry['cv']), 0.98), 3),
+            animal_type=label['animal_type'],
+            posture=label['posture'],
+            notes=f"과거 분석 {entry['count']}건 평균 (변동계수 {entry['cv']:.0%})",
+            method='knowledge_base',
+            usage=label['usage'],
+        ).to_dict()
+        result['provider'] = label['provider']
+        result['knowledge'] = {'count': entry['count'], 'std': entry['std'], 'cv': entry['cv']}
+        return result, 'hit'
 
 
 
@@ -186,7 +518,7 @@ STEP 5. 각 치수의 신뢰도를 독립적으로 평가하고 종합 신뢰도
     #  OpenCV 단독 분석 (최후 폴백)
     # ──────────────────────────────────────────────────────────────
     def analyze_with_opencv(self, image_path: str, reference_size=None) -> dict:
-        img = cv2.imread(image_path)
+        img, decode_scale, _ = image_io.load_bgr(image_path)
         if img is None:
             raise ValueError(f"이미지를 로드할 수 없습니다: {image_path}")
 
@@ -201,6 +533,8 @@ STEP 5. 각 치수의 신뢰도를 독립적으로 평가하고 종합 신뢰도
 
         largest = max(contours, key=cv2.contourArea)
         x, y, w, h = cv2.boundingRect(largest)
+        # 축소 디코딩 좌표 → 원본 픽셀
+        w, h = round(w / decode_scale), round(h / decode_scale)
         scale = (reference_size / max(w, h)) if reference_size else 1.0
 
         return {
@@ -212,81 +546,426 @@ STEP 5. 각 치수의 신뢰도를 독립적으로 평가하고 종합 신뢰도
             'method': 'opencv',
         }
 
+    # ──────────────────────────────────────────────────────────────
+    #  로컬 추정 (캐스케이드 1단계) — GrabCut 분할 + 보정 신뢰도
+    # ──────────────────────────────────────────────────────────────
+    def _segment_subject(self, img, hints):
+        """
+        _opencv_hints의 윤곽 bbox로 GrabCut을 초기화해 피사체를 분할하고
+        신뢰도 계산용 특징을 추출합니다. (긴 변 256px로 축소해 처리)
+        """
+        ih, iw = img.shape[:2]
+        scale = min(1.0, 256 / max(ih, iw))
+        small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) \
+            if scale < 1 else img
+        sh, sw = small.shape[:2]
+
+        # 초기 사각형: 힌트 bbox를 10% 확장, 없으면 중앙 90%
+        if hints.get('pixel_bbox'):
+            x, y, w, h = (v * scale for v in hints['pixel_bbox'])
+            x, y, w, h = x - w * 0.1, y - h * 0.1, w * 1.2, h * 1.2
+        else:
+            x, y, w, h = sw * 0.05, sh * 0.05, sw * 0.9, sh * 0.9
+        x0, y0 = max(1, int(x)), max(1, int(y))
+        x1, y1 = min(sw - 2, int(x + w)), min(sh - 2, int(y + h))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+
+        mask = np.zeros((sh, sw), np.uint8)
+        bgd = np.zeros((1, 65), np.float64)
+        fgd = np.zeros((1, 65), np.float64)
+        cv2.grabCut(small, mask, (x0, y0, x1 - x0, y1 - y0), bgd, fgd, 2, cv2.GC_INIT_WITH_RECT)
+
+        fg = np.where((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
+        fg = cv2.morphologyEx(fg, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+
+        n, _, stats, centroids = cv2.connectedComponentsWithStats(fg)
+        if n < 2:
+            return None
+        order = np.argsort(stats[1:, cv2.CC_STAT_AREA])[::-1] + 1
+        main = order[0]
+        main_area = stats[main, cv2.CC_STAT_AREA]
+        extra = sum(1 for i in order[1:] if stats[i, cv2.CC_STAT_AREA] > main_area * 0.2)
+
+        contours, _ = cv2.findContours((fg > 0).astype(np.uint8), cv2.RETR_EXTERNAL,
+                                       cv2.CHAIN_APPROX_SIMPLE)
+        largest = max(contours, key=cv2.contourArea)
+        hull_area = cv2.contourArea(cv2.convexHull(largest))
+        solidity = cv2.contourArea(largest) / hull_area if hull_area > 0 else 0.0
+
+        bx, by, bw, bh = (stats[main, k] for k in (cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP,
+                                                   cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT))
+        touches = bx <= 2 or by <= 2 or bx + bw >= sw - 2 or by + bh >= sh - 2
+
+        cx, cy = centroids[main]
+        offset = math.hypot(cx - sw / 2, cy - sh / 2) / math.hypot(sw / 2, sh / 2)
+        area_ratio = float(main_area) / (sw * sh)
+
+        return {
+            'features': {
+                'area_fit': round(max(0.0, 1 - abs(area_ratio - 0.4) / 0.4), 3),
+                'solidity': round(float(solidity), 3),
+                'centered': round(float(1 - offset), 3),
+                'extra_subjects': min(extra, 3),
+                'touches_border': int(touches),
+            },
+            'bbox_w_px': float(bw) / scale,
+            'bbox_h_px': float(bh) / scale,
+        }
+
+    def _local_confidence(self, features, has_reference):
+        cal = self.local_calibration
+        z = cal['bias'] + sum(cal['weights'][k] * features[k] for k in cal['weights'])
+        confidence = 1 / (1 + math.exp(-z))
+        if not has_reference:
+            confidence = min(confidence * NO_REFERENCE_PENALTY, NO_REFERENCE_MAX_CONFIDENCE)
+        return round(min(confidence, 0.98), 3)
+
+    def estimate_locally(self, image_path: str, reference_size=None, img=None):
+        """
+        Vision API 없이 분할 결과로 치수를 추정합니다.
+        reference_size: 피사체 장축 실제 길이(mm). 없으면 평균 체장 prior로 환산
+                        (신뢰도는 NO_REFERENCE_MAX_CONFIDENCE 이하).
+        Returns: (result dict, hints) — hints는 다음 단계 프롬프트에 재사용
+        """
+        scale, original_size = 1.0, None
+        if img is None:
+            img, scale, original_size = image_io.load_bgr(image_path)
+        if img is None:
+            raise ValueError(f"이미지를 로드할 수 없습니다: {image_path}")
+
+        hints = self._opencv_hints(image_path, img, scale, original_size)
+        seg = self._segment_subject(img, hints)
+        if seg is None:
+            raise ValueError("피사체 분할 실패")
+
+        long_px = max(seg['bbox_w_px'], seg['bbox_h_px'])
+        body_mm = reference_size or DEFAULT_SUBJECT_LENGTH_MM
+        mm_per_px = body_mm / long_px
+
+        # 분석 규칙은 _build_prompt와 동일 (가로 ×1.3, 높이 ×1.2, 깊이 ×1.4)
+        length_mm = seg['bbox_w_px'] * mm_per_px
+        height_mm = seg['bbox_h_px'] * mm_per_px
+        features = seg['features']
+        result = AnalysisResult(
+            width=round(max(50, min(2000, length_mm * 1.3)), 1),
+            height=round(max(50, min(2000, height_mm * 1.2)), 1),
+            depth=round(max(50, min(2000, length_mm * BODY_WIDTH_RATIO * 1.4)), 1),
+            confidence=self._local_confidence(features, bool(reference_size)),
+            notes=f"GrabCut 분할 {seg['bbox_w_px']:.0f}×{seg['bbox_h_px']:.0f}px"
+                  + ('' if reference_size else f", 체장 {body_mm}mm 가정"),
+            method='opencv_segmentation',
+        ).to_dict()
+        result['local_features'] = features
+        return result, hints
+
     # ──────────────────────────────────────────────────────────────
     #  JSON 파싱 + 검증
     # ──────────────────────────────────────────────────────────────
-    def _parse_result(self, raw_text: str, method: str) -> dict:
+    def _parse_result(self, response, method: str, latency=0.0, provider='openai') -> dict:
+        """
+        chat.completions 응답 → 검증된 결과 dict (토큰 사용량 포함).
+        Raises: ValueError — 거부/잘림/스키마 위반 (기본값으로 조용히 대체하지 않음)
+        """
+        return self._parse_response(
+            response, lambda text, usage: AnalysisResult.from_model_json(text, method, usage).to_dict(),
+            latency, provider
+        )
+
+    def _parse_classification(self, response, latency=0.0, provider='openai') -> dict:
+        return self._parse_response(response, parse_classification, latency, provider)
+
+    def _parse_response(self, response, parse, latency, provider):
+        """거부/잘림 검사 + parse(본문, usage) 검증 + 사용량 기록"""
+        message = response.choices[0].message
+        usage = {
+            'prompt_tokens': getattr(response.usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(response.usage, 'completion_tokens', 0) or 0,
+            'latency_ms': round(latency * 1000, 1),
+        }
+
         try:
-            match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', raw_text)
-            json_str = match.group(1) if match else raw_text
-            data = json.loads(json_str)
-
-            w = float(data.get('width', 300))
-            h = float(data.get('height', 250))
-            d = float(data.get('depth', 300))
-
-            # 물리적 타당성 검사 (최소 50mm, 최대 2000mm)
-            def clamp(v, lo=50, hi=2000):
-                return max(lo, min(hi, v))
-
-            w, h, d = clamp(w), clamp(h), clamp(d)
-
-            raw_conf   = float(data.get('confidence', 0.5))
-            breakdown  = data.get('confidence_breakdown', {})
-
-            # 세부 항목 신뢰도가 있으면 가중 평균으로 재계산
-            if breakdown:
-                sub_values = list(breakdown.values())
-                if sub_values:
-                    weighted = (
-                        breakdown.get('animal_recognition', raw_conf) * 0.4 +
-                        breakdown.get('size_estimation', raw_conf) * 0.4 +
-                        breakdown.get('posture_clarity', raw_conf) * 0.2
-                    )
-                    confidence = round((raw_conf + weighted) / 2, 3)
-                else:
-                    confidence = raw_conf
-            else:
-                confidence = raw_conf
-
-            return {
-                'width':      round(w, 1),
-                'height':     round(h, 1),
-                'depth':      round(d, 1),
-                'confidence': round(min(confidence, 0.98), 3),
-                'animal_type': data.get('animal_type', ''),
-                'posture':    data.get('posture', ''),
-                'notes':      data.get('notes', ''),
-                'method':     method,
-            }
+            if getattr(message, 'refusal', None):
+                raise ValueError(f"모델이 응답을 거부했습니다: {message.refusal}")
+            if response.choices[0].finish_reason == 'length':
+                raise ValueError("max_tokens 초과로 응답이 잘렸습니다")
+            result = parse(message.content, usage)
+        except ValueError as e:
+            self._record_usage(usage, provider, failed=True)
+            print(f"[ImageAnalyzer] 응답 검증 실패: {e}\n응답: {(message.content or '')[:300]}")
+            raise
+
+        self._record_usage(usage, provider)
+        return result
+
+    def _record_usage(self, usage, provider='openai', failed=False):
+        print(f"[Vision:{provider}] prompt={usage['prompt_tokens']} completion={usage['completion_tokens']} "
+              f"tokens, {usage['latency_ms']}ms")
+        with self._usage_lock:
+            self._usage['calls'] += 1
+            self._usage['parse_failures'] += int(failed)
+            self._usage['prompt_tokens'] += usage['prompt_tokens']
+            self._usage['completion_tokens'] += usage['completion_tokens']
+            self._usage['latency_ms'] += usage['latency_ms']
+
+    def usage_stats(self) -> dict:
+        """Vision 호출 누적 토큰/지연 (워커 단위, 동기 경로에서 경주에 진 호출 포함)"""
+        with self._usage_lock:
+            stats = dict(self._usage)
+        calls = stats['calls'] or 1
+        stats['avg_prompt_tokens'] = round(stats['prompt_tokens'] / calls, 1)
+        stats['avg_completion_tokens'] = round(stats['completion_tokens'] / calls, 1)
+        stats['avg_latency_ms'] = round(stats.pop('latency_ms') / calls, 1)
+        return stats
+
+    # ──────────────────────────────────────────────────────────────
+    #  분석 캐스케이드 — 로컬 → Vision low → Vision high
+    # ──────────────────────────────────────────────────────────────
+    def _image_size(self, hints):
+        try:
+            w, h = hints['image_size'].split('x')
+            return int(w), int(h)
+        except (KeyError, ValueError):
+            return 1024, 1024
+
+    def _finish_cascade(self, result, tier, tried, started, hints, escalation=None):
+        """
+        응답한 단계, 분석당 토큰/지연, 절감량(항상 high detail 호출했을 때 대비)을 결과에 기록.
+        escalation: 지식 베이스로 답하지 못하고 high detail로 올린 사유
+        """
+        high_tokens = high_detail_image_tokens(*self._image_size(hints))
+        stats = self.usage_stats()
+        avg_latency = stats['avg_latency_ms'] if stats['calls'] else 0.0
+        avg_prompt = stats['avg_prompt_tokens'] - high_tokens if stats['calls'] else 0.0
+        baseline_prompt = high_tokens + max(0.0, avg_prompt)
+
+        used_prompt = sum(t.get('prompt_tokens', 0) for t in tried)
+        used_completion = sum(t.get('completion_tokens', 0) for t in tried)
+        saved_tokens = int(baseline_prompt + MAX_COMPLETION_TOKENS * 0.6
+                           - used_prompt - used_completion)
+        saved_usd = (baseline_prompt - used_prompt) * PRICE_PER_M_INPUT / 1e6 \
+            + (MAX_COMPLETION_TOKENS * 0.6 - used_completion) * PRICE_PER_M_OUTPUT / 1e6
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        result['cascade'] = {
+            'tier': tier,
+            'tiers_tried': [t['tier'] for t in tried],
+            'steps': tried,
+            'latency_ms': latency_ms,
+            'prompt_tokens': used_prompt,
+            'completion_tokens': used_completion,
+        }
+        if self.vision.providers:
+            result['cascade'].update(
+                saved_tokens_est=saved_tokens,
+                saved_usd_est=round(saved_usd, 5),
+                saved_ms_est=round(max(0.0, avg_latency - latency_ms), 1) if tier == 'local' else 0.0,
+            )
+        else:
+            # Vision 제공자가 없으면 비교할 호출 자체가 없음 → 절감량 없음
+            saved_tokens, saved_usd = 0, 0.0
+        if escalation:
+            result['cascade']['escalation'] = escalation
+        with self._usage_lock:
+            self._cascade[tier] += 1
+            self._cascade['saved_tokens'] += saved_tokens
+            self._cascade['saved_usd'] += saved_usd
+            self._cascade['analyses'] += 1
+            self._cascade['tokens'] += used_prompt + used_completion
+            self._cascade['latency_ms'] += latency_ms
+            if escalation:
+                self._cascade['escalations'][escalation] += 1
+        return result
+
+    def _local_answers(self, best, reference_size):
+        """로컬 추정으로 바로 응답할지 — 실제 크기 기준(reference_size)이 있을 때만"""
+        return bool(reference_size) and best['confidence'] >= self.local_threshold
+
+    def _cascade_plan(self, image_path, reference_size=None, provider=None):
+        """
+        참조 크기가 있고 로컬 추정 신뢰도가 임계값 이상이면 바로 응답하고,
+        아니면 low detail로 종류/자세만 분류해 지식 베이스 치수로 답합니다.
+        품종을 모르거나 편차가 크면(또는 분류가 모호하면) high detail로 올립니다.
+        """
+        started = time.perf_counter()
+        tried = [{'tier': 'local'}]
+        try:
+            best, hints = yield 'local', (image_path, reference_size)
+        except ValueError as e:
+            print(f"[Cascade] 로컬 추정 실패: {e}")
+            best = None
+            hints = yield 'hints', (image_path,)
+
+        if best and (self._local_answers(best, reference_size) or not self.vision.providers):
+            return self._finish_cascade(best, 'local', tried, started, hints)
+
+        label, escalation = None, 'classify_failed'
+        try:
+            label = yield from self._classify_plan(image_path, provider)
+            tried.append({'tier': 'vision_low', **label['usage']})
+            result, escalation = yield 'knowledge', (label,)
+            if result is not None:
+                return self._finish_cascade(result, 'knowledge_base', tried, started, hints)
+        except Exception as e:
+            print(f"[Cascade] vision_low 실패: {e}")
+            tried.append({'tier': 'vision_low', 'failed': True})
 
+        # 분류가 맞았지만 지식이 부족했던 경우만 그 라벨로 누적 (확신 없는 분류 라벨은 쓰지 않음)
+        learn_label = label if escalation in ('unknown', 'high_variance') else None
+        tier = 'local'
+        try:
+            result = yield from self._vision_plan(image_path, 'high', hints, provider, learn_label)
+            tried.append({'tier': 'vision_high', **result.get('usage', {})})
+            if best is None or result['confidence'] >= best['confidence']:
+                best, tier = result, 'vision_high'
         except Exception as e:
-            print(f"[ImageAnalyzer] JSON 파싱 실패: {e}\n응답: {raw_text[:300]}")
-            return {
-                'width': 300.0, 'height': 250.0, 'depth': 300.0,
-                'confidence': 0.3,
-                'notes': f'파싱 실패 — 기본값 사용 ({method})',
-                'method': f'{method}_fallback',
-            }
+            print(f"[Cascade] vision_high 실패: {e}")
+            tried.append({'tier': 'vision_high', 'failed': True})
+
+        if best is None:
+            return (yield 'opencv', (image_path, reference_size))
+        return self._finish_cascade(best, tier, tried, started, hints, escalation)
+
+    def analyze_cascade(self, image_path: str, reference_size=None, provider=None) -> dict:
+        """분석 캐스케이드 (_cascade_plan 참고)"""
+        return self._run(self._cascade_plan(image_path, reference_size, provider))
+
+    def cascade_stats(self) -> dict:
+        """단계별 응답 수 + 분석당 평균 토큰/지연 + high detail로 올린 사유"""
+        with self._usage_lock:
+            stats = dict(self._cascade)
+            stats['escalations'] = dict(stats['escalations'])
+        stats['saved_usd'] = round(stats['saved_usd'], 4)
+        analyses = stats['analyses'] or 1
+        stats['avg_tokens'] = round(stats.pop('tokens') / analyses, 1)
+        stats['avg_latency_ms'] = round(stats.pop('latency_ms') / analyses, 1)
+        return stats
 
     # ──────────────────────────────────────────────────────────────
     #  통합 진입점
     # ──────────────────────────────────────────────────────────────
+    def _analyze_plan(self, image_path, method='auto', reference_size=None):
+        if method == 'auto':
+            return (yield from self._cascade_plan(image_path, reference_size))
+
+        if method in vision_providers.PROVIDERS:
+            try:
+                return (yield from self._vision_plan(image_path, provider=method))
+            except Exception as e:
+                print(f"[Vision] 실패: {e}")
+                # 'openai'만 실패를 그대로 알리고 나머지는 기존처럼 OpenCV로 폴백
+                if method == 'openai':
+                    raise
+
+        return (yield 'opencv', (image_path, reference_size))
+
     def analyze(self, image_path: str, method='auto', reference_size=None) -> dict:
         """
         Args:
             image_path: 이미지 경로
-            method: 'auto' | 'openai' | 'gemini' | 'opencv'
-            reference_size: OpenCV 모드 참조 크기 (mm)
+            method: 'auto'(캐스케이드) | 'openai' | 'gemini' | 'opencv'
+                    ('openai'/'gemini'는 해당 제공자를 먼저 호출, 느리면 다른 제공자와 경주.
+                     'openai'는 실패 시 예외, 그 외는 OpenCV 분석으로 폴백)
+            reference_size: 피사체 장축 실제 길이 (mm)
         """
-        if method == 'openai' or (method == 'auto' and self.openai_client):
+        return self._run(self._analyze_plan(image_path, method, reference_size))
+
+    # ──────────────────────────────────────────────────────────────
+    #  분석 계획 실행
+    #  *_plan 생성기는 단계를 (이름, 인자)로 yield하고 결과(또는 예외)를 돌려받습니다.
+    #  단계 판단은 계획에만 있고, 동기/비동기 경로는 단계를 실행하는 방법만 다릅니다.
+    # ──────────────────────────────────────────────────────────────
+
+    # executor(프로세스 풀일 수 있음)로 보내는 CPU 단계 — 나머지는 SQLite를 쓰므로 기본 스레드풀
+    CPU_STEPS = frozenset({'local', 'hints', 'opencv', 'request'})
+
+    def _step(self, name):
+        return {
+            'local': self.estimate_locally,
+            'hints': self._opencv_hints,
+            'opencv': self.analyze_with_opencv,
+            'request': self._vision_request,
+            'classify_prompt': self._build_classify_prompt,
+            'knowledge': self._knowledge_result,
+            'learn': self._learn,
+        }[name]
+
+    def _race(self, kwargs, kind, provider, parse):
+        """동기 경로 제공자 경주 — 패배한 호출은 끝까지 돌지만 결과는 버림"""
+        def attempt(p):
+            started = time.perf_counter()
+            response = p.complete(kwargs)
+            return parse(p, response, time.perf_counter() - started)
+
+        return self.vision.race(attempt, kind=kind, preferred=provider)
+
+    async def _arace(self, kwargs, kind, provider, parse):
+        """비동기 경로 제공자 경주 — 경주에서 진 호출은 취소"""
+        async def attempt(p):
+            started = time.perf_counter()
+            response = await p.acomplete(kwargs)
+            return parse(p, response, time.perf_counter() - started)
+
+        return await self.vision.arace(attempt, kind=kind, preferred=provider)
+
+    def _run(self, plan):
+        """계획을 현재 스레드에서 실행"""
+        value, error = None, None
+        while True:
+            try:
+                step, args = plan.throw(error) if error is not None else plan.send(value)
+            except StopIteration as done:
+                return done.value
             try:
-                return self.analyze_with_openai(image_path)
+                value = self._race(*args) if step == 'race' else self._step(step)(*args)
+                error = None
             except Exception as e:
-                print(f"[OpenAI] 실패: {e}")
-                if method == 'openai':
-                    raise
-
+                value, error = None, e
 
+    async def _arun(self, plan, executor=None):
+        """
+        계획을 이벤트 루프에서 실행. Vision 호출은 AsyncOpenAI로 대기하고,
+        CPU 단계는 executor(기본: 이벤트 루프 기본 스레드풀)로 넘깁니다.
+        """
+        loop = asyncio.get_running_loop()
+        value, error = None, None
+        while True:
+            try:
+                step, args = plan.throw(error) if error is not None else plan.send(value)
+            except StopIteration as done:
+                return done.value
+            try:
+                if step == 'race':
+                    value = await self._arace(*args)
+                else:
+                    value = await loop.run_in_executor(
+                        executor if step in self.CPU_STEPS else None, self._step(step), *args
+                    )
+                error = None
+            except Exception as e:
+                value, error = None, e
 
-        return self.analyze_with_opencv(image_path, reference_size)
+    # ──────────────────────────────────────────────────────────────
+    #  비동기 진입점 (ASGI 모드)
+    # ──────────────────────────────────────────────────────────────
+    async def analyze_with_vision_async(self, image_path: str, executor=None,
+                                        detail='high', hints=None, provider=None,
+                                        label=None) -> dict:
+        """analyze_with_vision()의 비동기 버전"""
+        return await self._arun(self._vision_plan(image_path, detail, hints, provider, label),
+                                executor)
+
+    async def classify_with_vision_async(self, image_path: str, executor=None,
+                                         provider=None) -> dict:
+        """classify_with_vision()의 비동기 버전"""
+        return await self._arun(self._classify_plan(image_path, provider), executor)
+
+    async def analyze_cascade_async(self, image_path: str, reference_size=None,
+                                    executor=None, provider=None) -> dict:
+        """analyze_cascade()의 비동기 버전"""
+        return await self._arun(self._cascade_plan(image_path, reference_size, provider), executor)
+
+    async def analyze_async(self, image_path: str, method='auto', reference_size=None,
+                            executor=None) -> dict:
+        """analyze()의 비동기 버전"""
+        return await self._arun(self._analyze_plan(image_path, method, reference_size), executor)
@@ -0,0 +1,182 @@
+"""
+분석용 이미지 디코딩 모듈
+윤곽/분할 분석에는 원본 해상도가 필요 없으므로 JPEG는 DCT 단계에서 축소 디코딩(Pillow draft,
+1/2·1/4·1/8)하고, 크기는 헤더만 읽어 구합니다.
+GIF/WebP는 첫 프레임을 쓰고 EXIF 방향을 적용합니다 (cv2.imread와 같은 방향).
+"""
+
+import os
+
+import cv2
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+
+# 분석용 디코딩 최대 변 길이 (0이면 원본 해상도)
+DECODE_MAX_SIDE = int(os.environ.get('PAWBOX_DECODE_MAX_SIDE', 1024))
+
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def _orientation(img):
+    try:
+        return img.getexif().get(EXIF_ORIENTATION, 1)
+    except Exception:
+        return 1
+
+
+def _oriented_size(size, orientation):
+    w, h = size
+    return (h, w) if orientation in (5, 6, 7, 8) else (w, h)
+
+
+def read_size(image_path):
+    """
+    헤더만 읽어 (가로, 세로) 반환 — EXIF 방향 적용 후 기준.
+    Returns: (w, h) 또는 None (열 수 없는 파일)
+    """
+    try:
+        with Image.open(image_path) as img:
+            return _oriented_size(img.size, _orientation(img))
+    except (OSError, UnidentifiedImageError):
+        return None
+
+
+def load_bgr(image_path, max_side=None):
+    """
+    분석용 BGR 이미지 디코딩 (긴 변 max_side 이하로 축소).
+
+    Args:
+        max_side: 최대 변 길이 (None이면 DECODE_MAX_SIDE, 0이면 원본)
+    Returns:
+        (img, scale, original_size)
+        img: BGR ndarray 또는 None (cv2.imread와 같은 실패 규약)
+        scale: 디코딩 크기 / 원본 크기
+        original_size: EXIF 방향 적용 후 원본 (w, h)
+    """
+    if max_side is None:
+        max_side = DECODE_MAX_SIDE
+
+    try:
+        with Image.open(image_path) as img:
+            orientation = _orientation(img)
+            original = img.size
+            target = None
+            if max_side and max(original) > max_side:
+                ratio = max_side / max(original)
+                target = (max(1, round(original[0] * ratio)), max(1, round(original[1] * ratio)))
+                # JPEG만 해당 — target 이상인 가장 작은 1/2^n 크기로 디코딩 (다른 형식은 무시됨)
+                img.draft('RGB', target)
+
+            # GIF/WebP 애니메이션은 열린 상태 그대로 첫 프레임
+            rgb = img.convert('RGB')
+    except (OSError, UnidentifiedImageError, ValueError):
+        img = cv2.imread(image_path)
+        if img is None:
+            return None, 1.0, None
+        h, w = img.shape[:2]
+        return img, 1.0, (w, h)
+
+    if target and rgb.size != target:
+        arr = cv2.resize(np.asarray(rgb), target, interpolation=cv2.INTER_AREA)
+        rgb = Image.fromarray(arr)
+    if orientation in ORIENTATION_TRANSPOSE:
+        rgb = rgb.transpose(ORIENTATION_TRANSPOSE[orientation])
+
+    bgr = cv2.cvtColor(np.asarray(rgb), cv2.COLOR_RGB2BGR)
+    original = _oriented_size(original, orientation)
+    return bgr, bgr.shape[1] / original[0], original
+
+
+def _peak_rss_kb():
+    # ru_maxrss는 exec 이전 부모 프로세스의 최고치를 물려받으므로 VmHWM 우선
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _bench_decode(path, reduced):
+    """별도 프로세스에서 디코딩 1회 → (소요 ms, 최대 RSS 증가 MB, 결과 크기)"""
+    import time
+
+    before = _peak_rss_kb()
+    started = time.perf_counter()
+    if reduced:
+        img, _, _ = load_bgr(path)
+    else:
+        img = cv2.imread(path)
+    elapsed = (time.perf_counter() - started) * 1000
+    peak = _peak_rss_kb()
+    assert img is not None
+    return round(elapsed, 1), round((peak - before) / 1024, 1), img.shape[:2]
+
+
+def test_image_io():
+    """테스트: 방향/첫 프레임 처리 + 48MP JPEG 디코딩 시간·메모리 (원본 디코딩 대비)"""
+    import tempfile
+    import multiprocessing
+
+    print("image_io 테스트")
+    print("-" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 세로 사진: 가로로 저장 + EXIF Orientation=6 (90° 회전)
+        base = Image.new('RGB', (400, 300), (220, 220, 220))
+        base.paste((60, 80, 120), (0, 0, 100, 300))
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        rotated = os.path.join(tmp, 'rotated.jpg')
+        base.save(rotated, exif=exif)
+        assert read_size(rotated) == (300, 400)
+        img, scale, original = load_bgr(rotated)
+        assert img.shape[:2] == (400, 300) and original == (300, 400)
+        assert img[5, 150, 0] > 100           # 왼쪽 띠가 회전 후 위쪽으로
+        assert cv2.imread(rotated).shape[:2] == img.shape[:2]
+
+        # GIF 애니메이션 / WebP: 첫 프레임
+        frames = [Image.new('RGB', (64, 48), c) for c in ((255, 0, 0), (0, 0, 255))]
+        gif = os.path.join(tmp, 'anim.gif')
+        frames[0].save(gif, save_all=True, append_images=frames[1:])
+        img, _, _ = load_bgr(gif)
+        assert img.shape[:2] == (48, 64) and img[0, 0, 2] > 200
+        webp = os.path.join(tmp, 'pet.webp')
+        frames[1].save(webp)
+        assert load_bgr(webp)[0][0, 0, 0] > 200
+
+        # 48MP 휴대폰 사진 크기 벤치마크
+        big = np.full((6000, 8000, 3), 225, np.uint8)
+        cv2.ellipse(big, (4000, 3200), (2200, 1400), 0, 0, 360, (70, 90, 130), -1)
+        noise = np.random.default_rng(0).integers(0, 12, big.shape, dtype=np.uint8)
+        big_path = os.path.join(tmp, 'big.jpg')
+        cv2.imwrite(big_path, cv2.add(big, noise), [cv2.IMWRITE_JPEG_QUALITY, 92])
+        del big, noise
+        print(f"48MP JPEG: {os.path.getsize(big_path) / 1e6:.1f}MB, 헤더 크기 {read_size(big_path)}")
+
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            full = pool.apply(_bench_decode, (big_path, False))
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            reduced = pool.apply(_bench_decode, (big_path, True))
+
+        print(f"원본 디코딩 (cv2.imread): {full[0]:7.1f}ms  최대 메모리 +{full[1]}MB  {full[2]}")
+        print(f"축소 디코딩 (load_bgr):   {reduced[0]:7.1f}ms  최대 메모리 +{reduced[1]}MB  {reduced[2]}")
+        assert max(reduced[2]) == DECODE_MAX_SIDE or not DECODE_MAX_SIDE
+
+
+if __name__ == '__main__':
+    test_image_io()
@@ -0,0 +1,153 @@
+"""
+치수 편집 실시간 미리보기
+클라이언트가 보낸 치수 변경마다 전체 도면을 다시 만들지 않고,
+BoxGenerator.svg_parts()로 부분별 SVG를 만든 뒤 이전 상태와 달라진 부분만 패치로 보냅니다.
+(크기가 같은 패널은 원점 기준 캐시를 재사용하고 위치만 transform으로 갱신)
+"""
+
+import time
+
+
+# 실시간 편집에서 허용하는 범위 (mm)
+DIMENSION_RANGE = (50.0, 2000.0)
+THICKNESS_RANGE = (1.0, 20.0)
+
+
+class LivePreviewSession:
+    """연결 하나의 미리보기 상태"""
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.params = None
+        self.canvas = None
+        self.parts = {}
+        self.stats = {'updates': 0, 'skipped': 0, 'bytes_sent': 0, 'bytes_full': 0,
+                      'render_ms': 0.0}
+
+    def normalize(self, message):
+        """
+        클라이언트 메시지 → (w, h, d, t). 이전 값에서 바뀐 항목만 보내도 됨.
+        Raises: ValueError
+        """
+        w, h, d, t = self.params or (None, None, None, 3.0)
+        try:
+            w = float(message.get('width', w))
+            h = float(message.get('height', h))
+            d = float(message.get('depth', d))
+            t = float(message.get('thickness', t))
+        except (TypeError, ValueError):
+            raise ValueError('치수는 숫자여야 합니다')
+
+        lo, hi = DIMENSION_RANGE
+        if not all(lo <= v <= hi for v in (w, h, d)):
+            raise ValueError(f'치수는 {lo:.0f}~{hi:.0f}mm 범위여야 합니다')
+        if not THICKNESS_RANGE[0] <= t <= THICKNESS_RANGE[1]:
+            raise ValueError(f'재료 두께는 {THICKNESS_RANGE[0]:.0f}~{THICKNESS_RANGE[1]:.0f}mm 범위여야 합니다')
+
+        # 저장될 도면과 같은 치수로 미리보기
+        if self.generator.quantization:
+            w, h, d, t = self.generator.quantization.quantize(w, h, d, t)
+        return float(w), float(h), float(d), float(t)
+
+    def update(self, message):
+        """
+        치수 변경 적용.
+        Returns:
+            첫 메시지: {'type': 'full', 'svg': ...}
+            이후:      {'type': 'patch', 'canvas': ..., 'parts': {id: {'transform', 'body'}}}
+            변화 없음: None (양자화 후 같은 치수)
+        """
+        params = self.normalize(message)
+        if params == self.params:
+            self.stats['skipped'] += 1
+            return None
+
+        started = time.perf_counter()
+        canvas_w, canvas_h, parts = self.generator.svg_parts(*params)
+        canvas = [round(canvas_w, 1), round(canvas_h, 1)]
+
+        if not self.parts:
+            patch = {'type': 'full', 'svg': self.generator.assemble_svg(canvas_w, canvas_h, parts)}
+        else:
+            changed = {}
+            for part_id, (transform, body) in parts.items():
+                old_transform, old_body = self.parts.get(part_id, (None, None))
+                diff = {}
+                if transform != old_transform:
+                    diff['transform'] = transform
+                if body != old_body:
+                    diff['body'] = body
+                if diff:
+                    changed[part_id] = diff
+            patch = {'type': 'patch', 'parts': changed}
+            if canvas != self.canvas:
+                patch['canvas'] = canvas
+
+        render_ms = (time.perf_counter() - started) * 1000
+        patch['params'] = dict(zip(('width', 'height', 'depth', 'thickness'), params))
+        patch['render_ms'] = round(render_ms, 2)
+
+        self.params, self.canvas, self.parts = params, canvas, parts
+        self.stats['updates'] += 1
+        self.stats['render_ms'] += render_ms
+        return patch
+
+    def record_sent(self, size):
+        """전송 바이트 (전체 도면 전송 대비 절감량 집계용)"""
+        self.stats['bytes_sent'] += size
+        self.stats['bytes_full'] += sum(len(body) for _, body in self.parts.values())
+
+
+def test_live_preview():
+    """연속 편집 시 패치 크기 / 렌더링 시간 (전체 재생성 대비)"""
+    import json
+    import tempfile
+    from box_generator import BoxGenerator
+    from box_catalog import QuantizationPolicy
+
+    print("LivePreviewSession 테스트")
+    print("-" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.py와 같은 설정 (10mm 양자화)
+        generator = BoxGenerator(output_dir=tmp, quantization=QuantizationPolicy())
+        session = LivePreviewSession(generator)
+
+        first = session.update({'width': 500, 'height': 380, 'depth': 400})
+        assert first['type'] == 'full'
+        session.record_sent(len(json.dumps(first)))
+
+        # 높이 슬라이더 드래그: Top/Bottom(w×d) 패널은 그대로, 나머지는 다시 그림
+        patch = session.update({'height': 421})
+        assert patch['params']['height'] == 430
+        assert 'body' not in patch['parts'].get('panel-Top', {})
+        assert 'transform' in patch['parts']['panel-Bottom']
+        assert 'body' not in patch['parts']['panel-Bottom']
+        assert 'dim-W' not in patch['parts'] and 'dim-H' in patch['parts']
+        assert session.update({'height': 428}) is None
+
+        # 슬라이더를 1mm씩 드래그 — 기존 방식은 매번 /api/generate(렌더링 + 저장) + /preview
+        heights = [300 + i for i in range(400)]
+        started = time.perf_counter()
+        for h in heights:
+            patch = session.update({'height': h})
+            if patch:
+                session.record_sent(len(json.dumps(patch)))
+        live_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for h in heights:
+            path = generator.create_simple_box_svg(500, h, 400, 3.0)
+            with open(path, 'rb') as f:
+                full_bytes = len(f.read())
+        full_ms = (time.perf_counter() - started) * 1000
+
+        stats = session.stats
+        print(f"편집 {len(heights)}회: 실시간 {live_ms:.0f}ms (렌더링 {stats['updates']}회, "
+              f"양자화로 생략 {stats['skipped']}회) / 기존 생성+미리보기 {full_ms:.0f}ms")
+        print(f"전송량: 패치 {stats['bytes_sent'] / 1024:.0f}KB / "
+              f"기존 {len(heights) * full_bytes / 1024:.0f}KB")
+
+
+if __name__ == '__main__':
+    test_live_preview()
@@ -0,0 +1,357 @@
+"""
+부하 테스트 하네스
+로컬 OpenAI 대역(fake_openai.py)과 gunicorn을 구성별로 띄우고
+app.py의 각 라우트 시나리오에 부하를 걸어 처리량과 p50/p95/p99 지연을 보고합니다.
+
+예시:
+    # gunicorn 워커/스레드 조합 비교
+    python loadtest.py --scenario analyze --concurrency 32 --duration 20 \\
+        --configs sync:1x1,sync:4x1,gthread:2x8,uvicorn:1x1 --latency lognormal:1.8,0.35
+
+    # 이미 떠 있는 서버에 부하만 걸기
+    python loadtest.py --target http://127.0.0.1:5000 --scenario generate
+
+    # 꼬리 지연이 긴 주 제공자 + 두 번째 제공자(Gemini 자리) 경주 효과 (--no-hedge와 비교)
+    python loadtest.py --configs uvicorn:1x1 --latency lognormal:1.0,0.8 \\
+        --gemini-latency lognormal:1.2,0.3
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ──────────────────────────────────────────────────────────
+#  시나리오
+# ──────────────────────────────────────────────────────────
+
+def sample_image(path=None):
+    """부하용 JPEG 바이트 (지정 파일 또는 합성 이미지)"""
+    if path:
+        with open(path, 'rb') as f:
+            return f.read()
+    img = np.full((960, 1280, 3), 225, np.uint8)
+    cv2.ellipse(img, (640, 520), (360, 230), 0, 0, 360, (70, 90, 130), -1)
+    cv2.circle(img, (930, 360), 120, (70, 90, 130), -1)
+    ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buf.tobytes()
+
+
+def multipart(fields, file_field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                   f'{value}\r\n'.encode())
+    body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+               f'filename="{filename}"\r\nContent-Type: image/jpeg\r\n\r\n'.encode())
+    body.write(content)
+    body.write(f'\r\n--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def build_scenarios(image, method, base_url_ref):
+    """
+    시나리오 이름 → (HTTP 메서드, 경로, 본문, 헤더) 생성 함수
+    base_url_ref: 현재 대상 서버 URL을 담은 dict (preview 준비 요청용)
+    """
+    b64 = base64.b64encode(image).decode()
+
+    def analyze():
+        body, ctype = multipart({'method': method}, 'image', 'pet.jpg', image)
+        return 'POST', '/api/analyze', body, {'Content-Type': ctype}
+
+    def analyze_base64():
+        body = json.dumps({'image_base64': b64, 'filename': 'pet.jpg', 'method': method}).encode()
+        return 'POST', '/api/analyze-base64', body, {'Content-Type': 'application/json'}
+
+    def analyze_raw():
+        return ('POST', f'/api/analyze-base64?filename=pet.jpg&method={method}', image,
+                {'Content-Type': 'application/octet-stream'})
+
+    def generate():
+        body = json.dumps({'width': random.randint(300, 900), 'height': random.randint(250, 700),
+                           'depth': random.randint(250, 700), 'thickness': 3.0}).encode()
+        return 'POST', '/api/generate', body, {'Content-Type': 'application/json'}
+
+    def generate_from_image():
+        body, ctype = multipart({'method': method, 'thickness': '3.0'}, 'image', 'pet.jpg', image)
+        return 'POST', '/api/generate-from-image', body, {'Content-Type': ctype}
+
+    def box_types():
+        return 'GET', '/api/box-types', None, {}
+
+    def health():
+        return 'GET', '/health', None, {}
+
+    preview_files = {}
+
+    def preview():
+        # 대상 서버마다 도면 하나를 먼저 생성해 두고 그 파일을 반복 조회
+        base_url = base_url_ref['url']
+        if base_url not in preview_files:
+            parts = urlsplit(base_url)
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            conn.request('POST', '/api/generate', body=json.dumps({'width': 500, 'height': 380,
+                                                                   'depth': 400}),
+                         headers={'Content-Type': 'application/json'})
+            preview_files[base_url] = json.loads(conn.getresponse().read())['filename']
+            conn.close()
+        return 'GET', f'/preview/{preview_files[base_url]}', None, {}
+
+    return {
+        'analyze': analyze,
+        'analyze-base64': analyze_base64,
+        'analyze-raw': analyze_raw,
+        'generate': generate,
+        'generate-from-image': generate_from_image,
+        'box-types': box_types,
+        'health': health,
+        'preview': preview,
+    }
+
+
+# ──────────────────────────────────────────────────────────
+#  부하 생성 (closed-loop: 가상 사용자 N명이 응답 받는 즉시 다음 요청)
+# ──────────────────────────────────────────────────────────
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run_load(base_url, make_request, concurrency, duration, timeout=120):
+    parts = urlsplit(base_url)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def user():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+        while time.monotonic() < deadline:
+            method, path, body, headers = make_request()
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = 'conn_error'
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        conn.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        'requests': sum(statuses.values()),
+        'ok': len(latencies),
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        'throughput': round(len(latencies) / wall, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'wall_s': round(wall, 1),
+    }
+
+
+# ──────────────────────────────────────────────────────────
+#  서버 기동
+# ──────────────────────────────────────────────────────────
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, timeout=30):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', parts.path or '/health')
+            if conn.getresponse().status < 500:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'서버가 준비되지 않았습니다: {url}')
+
+
+def parse_config(spec):
+    """'gthread:2x8' → ('gthread', 2, 8)"""
+    worker_class, shape = spec.split(':')
+    workers, threads = shape.split('x')
+    return worker_class, int(workers), int(threads)
+
+
+def start_gunicorn(config, port, env, workdir):
+    worker_class, workers, threads = config
+    if worker_class == 'uvicorn':
+        target, extra = 'asgi_app:app', ['-k', 'uvicorn.workers.UvicornWorker']
+    else:
+        target, extra = 'app:app', ['-k', worker_class, '--threads', str(threads)]
+    cmd = [sys.executable, '-m', 'gunicorn', target, '-b', f'127.0.0.1:{port}',
+           '-w', str(workers), '--timeout', '300', *extra]
+    return subprocess.Popen(cmd, env=env, cwd=workdir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def server_env(stand_in_url, workdir, admission, gemini_url=None, hedge=True):
+    env = dict(os.environ)
+    env.update({
+        'OPENAI_API_KEY': 'loadtest',
+        'OPENAI_BASE_URL': f'{stand_in_url}/v1',
+        'PAWBOX_VISION_PROVIDERS': 'openai,gemini' if gemini_url else 'openai',
+        'PAWBOX_HEDGE': '1' if hedge else '0',
+        'PAWBOX_STATE_DB': os.path.join(workdir, 'state.sqlite3'),
+        # 부하 발생기는 한 IP라 클라이언트별 레이트 리밋은 끈다
+        'PAWBOX_RATE_PER_MIN': '0',
+        # 작업 디렉토리는 구성별 임시 폴더, 모듈은 backend/에서 import
+        'PYTHONPATH': os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])),
+    })
+    if gemini_url:
+        env.update({'GEMINI_API_KEY': 'loadtest', 'PAWBOX_GEMINI_BASE_URL': f'{gemini_url}/v1'})
+    if not admission:
+        env.update({'PAWBOX_ANALYZE_CONCURRENCY': '100000', 'PAWBOX_ANALYZE_QUEUE': '100000'})
+    return env
+
+
+def print_table(rows):
+    header = f"{'config':<14}{'scenario':<22}{'conc':>5}{'ok':>7}{'req/s':>9}" \
+             f"{'p50':>9}{'p95':>9}{'p99':>9}  statuses"
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        print(f"{r['config']:<14}{r['scenario']:<22}{r['concurrency']:>5}{r['ok']:>7}"
+              f"{r['throughput']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}  {r['statuses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Paw-Box 부하 테스트')
+    parser.add_argument('--scenario', default='analyze',
+                        help='쉼표 구분 (analyze, analyze-base64, analyze-raw, generate, '
+                             'generate-from-image, box-types, health, preview, all)')
+    parser.add_argument('--configs', default='sync:1x1,gthread:2x8,uvicorn:1x1',
+                        help='gunicorn 구성 목록 worker_class:워커x스레드 (sync/gthread/uvicorn)')
+    parser.add_argument('--target', help='이미 실행 중인 서버 URL (지정 시 서버를 띄우지 않음)')
+    parser.add_argument('--concurrency', default='16', help='동시 사용자 수 (쉼표 구분 가능)')
+    parser.add_argument('--duration', type=float, default=15, help='시나리오별 측정 시간(초)')
+    parser.add_argument('--method', default='openai', help="분석 method (기본 'openai' — Vision 경로)")
+    parser.add_argument('--image', help='부하에 쓸 이미지 파일 (기본: 합성 이미지)')
+    parser.add_argument('--latency', default='lognormal:1.8,0.35', help='대역 서버 지연 분포')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-latency',
+                        help='지정하면 두 번째 대역 서버를 Gemini 제공자로 띄움 (경주 측정)')
+    parser.add_argument('--no-hedge', action='store_true', help='제공자 경주 끄기 (PAWBOX_HEDGE=0)')
+    parser.add_argument('--admission', action='store_true',
+                        help='입장 제어 기본값 유지 (기본은 한도를 풀어 순수 처리량 측정)')
+    parser.add_argument('--json', help='결과를 JSON 파일로 저장')
+    args = parser.parse_args(argv)
+
+    current = {'url': None}
+    scenarios = build_scenarios(sample_image(args.image), args.method, current)
+    names = list(scenarios) if args.scenario == 'all' else args.scenario.split(',')
+    concurrencies = [int(c) for c in args.concurrency.split(',')]
+    rows = []
+
+    def measure(label, base_url):
+        current['url'] = base_url
+        for name in names:
+            for conc in concurrencies:
+                print(f"[loadtest] {label} {name} c={conc} ...", flush=True)
+                result = run_load(base_url, scenarios[name], conc, args.duration)
+                rows.append({'config': label, 'scenario': name, 'concurrency': conc, **result})
+
+    if args.target:
+        measure('target', args.target.rstrip('/'))
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            stand_in_port = free_port()
+            stand_in_url = f'http://127.0.0.1:{stand_in_port}'
+            stand_ins = [subprocess.Popen(
+                [sys.executable, os.path.join(BACKEND_DIR, 'fake_openai.py'),
+                 '--port', str(stand_in_port), '--latency', args.latency,
+                 '--error-rate', str(args.error_rate),
+                 '--rate-limit-rate', str(args.rate_limit_rate)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )]
+            gemini_url = None
+            if args.gemini_latency:
+                gemini_port = free_port()
+                gemini_url = f'http://127.0.0.1:{gemini_port}'
+                stand_ins.append(subprocess.Popen(
+                    [sys.executable, os.path.join(BACKEND_DIR, 'fake_openai.py'),
+                     '--port', str(gemini_port), '--latency', args.gemini_latency],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                ))
+            try:
+                wait_ready(f'{stand_in_url}/stats')
+                if gemini_url:
+                    wait_ready(f'{gemini_url}/stats')
+                for spec in args.configs.split(','):
+                    config = parse_config(spec)
+                    port = free_port()
+                    # 구성마다 업로드/출력/상태 디렉토리를 분리
+                    run_dir = os.path.join(workdir, spec.replace(':', '_'))
+                    os.makedirs(run_dir)
+                    env = server_env(stand_in_url, run_dir, args.admission,
+                                     gemini_url, hedge=not args.no_hedge)
+                    server = start_gunicorn(config, port, env, run_dir)
+                    try:
+                        wait_ready(f'http://127.0.0.1:{port}/health')
+                        measure(spec, f'http://127.0.0.1:{port}')
+                    finally:
+                        server.terminate()
+                        server.wait(timeout=30)
+            finally:
+                for stand_in in stand_ins:
+                    stand_in.terminate()
+                    stand_in.wait(timeout=10)
+
+    print()
+    print_table(rows)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
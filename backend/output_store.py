@@ -0,0 +1,202 @@
+"""
+콘텐츠 주소 기반(content-addressed) 출력 파일 저장소
+도면 파일명을 내용 해시로 정하고 저장소 백엔드(storage.py)에 원자적으로 기록합니다.
+요청 파라미터 → 해시 색인을 두어 같은 요청은 렌더링과 쓰기를 모두 건너뜁니다.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from storage import LocalStorage
+
+
+class OutputStore:
+    """해시 이름 파일 저장소"""
+
+    NAMESPACE = 'outputs'
+
+    def __init__(self, directory, state=None, prefix='box', index_size=4096, storage=None):
+        """
+        Args:
+            directory: 출력 디렉토리 (반환 경로의 기준, 로컬 저장소 위치)
+            state: SharedState (있으면 파라미터 색인을 워커 간 공유)
+            prefix: 파일명 접두사 ({prefix}_{해시}.{확장자})
+            index_size: 색인 최대 항목 수 (메모리/SQLite 각각)
+            storage: 저장소 백엔드 (없으면 directory의 LocalStorage)
+        """
+        self.directory = directory
+        self.state = state
+        self.prefix = prefix
+        self.index_size = index_size
+        self.storage = storage or LocalStorage(directory)
+
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._stats = {'requests': 0, 'index_hits': 0, 'renders': 0, 'writes': 0, 'deduplicated': 0}
+
+        if state is not None:
+            state.ensure_schema(
+                "CREATE TABLE IF NOT EXISTS output_index ("
+                " params TEXT PRIMARY KEY, filename TEXT, used REAL)"
+            )
+
+    @staticmethod
+    def params_key(*params):
+        """요청 파라미터 → 색인 키 (float은 0.1mm 단위로 정규화)"""
+        return '|'.join(f'{round(p, 1):g}' if isinstance(p, float) else str(p) for p in params)
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    # ──────────────────────────────────────────────────────────
+    #  조회 / 저장
+    # ──────────────────────────────────────────────────────────
+
+    def get_or_create(self, params, render, ext='svg'):
+        """
+        Args:
+            params: 요청 파라미터 튜플 (같은 파라미터 → 같은 도면)
+            render: () → 파일 내용(str) 함수. 색인 적중 시 호출되지 않음
+        Returns:
+            str: 저장된 파일 경로
+        """
+        key = self.params_key(*params, ext)
+        with self._lock:
+            self._stats['requests'] += 1
+
+        filename = self.lookup(key)
+        if filename is not None:
+            with self._lock:
+                self._stats['index_hits'] += 1
+            return self.path(filename)
+
+        content = render()
+        with self._lock:
+            self._stats['renders'] += 1
+        return self.path(self.add(params, content, ext))
+
+    def add(self, params, content, ext='svg'):
+        """
+        이미 렌더링한 내용을 저장하고 파라미터 색인에 등록 (인라인 응답의 지연 저장용).
+        Returns: 파일명
+        """
+        filename = self.put(content, ext)
+        self._remember(self.params_key(*params, ext), filename)
+        return filename
+
+    def lookup(self, key):
+        """색인에서 파일명 조회 (파일이 지워졌으면 색인 항목도 무시)"""
+        with self._lock:
+            filename = self._index.get(key)
+            if filename is not None:
+                self._index.move_to_end(key)
+
+        if filename is None and self.state is not None:
+            row = self.state.connect().execute(
+                "SELECT filename FROM output_index WHERE params = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                filename = row[0]
+                self._remember_local(key, filename)
+
+        if filename is not None and not self.storage.exists(filename):
+            with self._lock:
+                self._index.pop(key, None)
+            return None
+        return filename
+
+    def put(self, content, ext='svg'):
+        """
+        내용을 해시 이름 파일로 저장. 같은 내용이 이미 있으면 쓰지 않음.
+        Returns: 파일명
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        filename = f'{self.prefix}_{digest}.{ext}'
+
+        if self.storage.exists(filename):
+            with self._lock:
+                self._stats['deduplicated'] += 1
+            return filename
+
+        self.storage.write(filename, data)
+
+        with self._lock:
+            self._stats['writes'] += 1
+        return filename
+
+    def _remember_local(self, key, filename):
+        with self._lock:
+            self._index[key] = filename
+            self._index.move_to_end(key)
+            while len(self._index) > self.index_size:
+                self._index.popitem(last=False)
+
+    def _remember(self, key, filename):
+        self._remember_local(key, filename)
+        if self.state is None:
+            return
+        with self.state.transaction() as conn:
+            conn.execute(
+                "INSERT INTO output_index (params, filename, used) VALUES (?, ?, ?) "
+                "ON CONFLICT (params) DO UPDATE SET filename = excluded.filename, used = excluded.used",
+                (key, filename, time.time())
+            )
+            conn.execute(
+                "DELETE FROM output_index WHERE params NOT IN "
+                "(SELECT params FROM output_index ORDER BY used DESC LIMIT ?)",
+                (self.index_size,)
+            )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['index_entries'] = len(self._index)
+        requests = stats['requests']
+        stats['index_hit_rate'] = round(stats['index_hits'] / requests, 3) if requests else 0.0
+        return stats
+
+
+def test_output_store():
+    """동시 요청 원자성 / 중복 제거 / 색인 적중 확인"""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    renders = []
+
+    def render(w):
+        renders.append(w)
+        time.sleep(0.01)
+        return f'<svg width="{w}">' + 'x' * 200_000 + '</svg>'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OutputStore(tmp)
+
+        # 같은 파라미터 동시 요청 → 모두 같은 완성 파일
+        with ThreadPoolExecutor(16) as pool:
+            paths = list(pool.map(lambda _: store.get_or_create((500.0, 3.0), lambda: render(500)),
+                                  range(64)))
+        assert len(set(paths)) == 1
+        with open(paths[0], encoding='utf-8') as f:
+            assert f.read().endswith('</svg>')
+
+        # 파라미터는 다르지만 내용이 같으면 파일 하나
+        other = store.get_or_create((500.04, 3.0, 'alias'), lambda: render(500))
+        assert other == paths[0]
+
+        # 색인 적중 시 렌더링 없음
+        before = len(renders)
+        store.get_or_create((500.0, 3.0), lambda: render(500))
+        assert len(renders) == before
+
+        files = [n for n in os.listdir(tmp)]
+        assert len(files) == 1 and not files[0].endswith('.tmp'), files
+        print(f"렌더링 {len(renders)}회 / 요청 66회, 파일 {len(files)}개")
+        print(store.stats())
+
+
+if __name__ == '__main__':
+    test_output_store()
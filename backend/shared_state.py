@@ -0,0 +1,82 @@
+"""
+워커 간 공유 상태 저장소
+같은 호스트의 gunicorn 워커 프로세스들이 함께 쓰는 SQLite 기반 저장소입니다.
+(동시성 슬롯, 레이트 리밋 버킷, 카운터 등)
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SharedState:
+    """프로세스/스레드 간에 공유되는 SQLite 저장소"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: SQLite 파일 경로 (없으면 PAWBOX_STATE_DB 환경변수 → state/pawbox.sqlite3)
+        """
+        self.path = path or os.environ.get('PAWBOX_STATE_DB', os.path.join('state', 'pawbox.sqlite3'))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        with self.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " namespace TEXT, name TEXT, value REAL,"
+                " PRIMARY KEY (namespace, name))"
+            )
+
+    def connect(self):
+        """스레드별 커넥션 (sqlite3 커넥션은 스레드 간 공유 불가)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """쓰기 잠금을 즉시 잡는 트랜잭션 (워커 간 원자적 갱신용)"""
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    def ensure_schema(self, *statements):
+        """모듈별 테이블 생성"""
+        with self.transaction() as conn:
+            for sql in statements:
+                conn.execute(sql)
+
+    # ──────────────────────────────────────────────────────────
+    #  카운터
+    # ──────────────────────────────────────────────────────────
+
+    def incr(self, namespace, name, delta=1, conn=None):
+        sql = (
+            "INSERT INTO counters (namespace, name, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (namespace, name) DO UPDATE SET value = value + excluded.value"
+        )
+        if conn is not None:
+            conn.execute(sql, (namespace, name, delta))
+        else:
+            with self.transaction() as c:
+                c.execute(sql, (namespace, name, delta))
+
+    def counters(self, namespace):
+        rows = self.connect().execute(
+            "SELECT name, value FROM counters WHERE namespace = ?", (namespace,)
+        ).fetchall()
+        return {name: (int(value) if float(value).is_integer() else value) for name, value in rows}
@@ -0,0 +1,171 @@
+"""
+출력 파일 저장소 백엔드
+도면 파일을 로컬 디스크 또는 S3 호환 스토리지(AWS S3, MinIO 등)에 저장합니다.
+여러 인스턴스가 같은 버킷을 쓰면 어느 인스턴스에서 만든 도면이든 내려받을 수 있고,
+다운로드는 presigned URL 리다이렉트(S3) 또는 리버스 프록시 sendfile(로컬)로 넘겨
+Python 워커가 파일 본문을 보내지 않습니다.
+
+환경변수:
+    PAWBOX_STORAGE       local(기본) | s3
+    PAWBOX_S3_BUCKET     버킷 이름
+    PAWBOX_S3_PREFIX     키 접두사 (기본 outputs/)
+    PAWBOX_S3_ENDPOINT   S3 호환 엔드포인트 (MinIO 또는 fake_s3.py)
+    PAWBOX_S3_REGION     리전 (기본 us-east-1)
+    PAWBOX_S3_URL_TTL    presigned URL 유효 시간(초, 기본 300)
+"""
+
+import os
+import uuid
+
+# S3 백엔드 (선택)
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+    BOTO3_AVAILABLE = True
+except ImportError:
+    boto3 = BotoConfig = ClientError = None
+    BOTO3_AVAILABLE = False
+
+
+class LocalStorage:
+    """로컬 디렉토리 저장소"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def local_path(self, name):
+        return os.path.join(self.directory, name)
+
+    def exists(self, name):
+        return os.path.exists(self.local_path(name))
+
+    def size(self, name):
+        return os.path.getsize(self.local_path(name))
+
+    def write(self, name, data):
+        """임시 파일에 쓴 뒤 rename → 읽는 쪽은 항상 완성된 파일만 봄"""
+        final_path = self.local_path(name)
+        tmp_path = self.local_path(f'.{name}.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def publish(self, path):
+        """로컬에서 만든 파일(boxes.py 출력 등)을 저장소에 반영 — 같은 디렉토리면 할 일 없음"""
+        name = os.path.basename(path)
+        if os.path.abspath(path) != os.path.abspath(self.local_path(name)):
+            with open(path, 'rb') as f:
+                self.write(name, f.read())
+        return name
+
+    def url(self, name, download_name=None):
+        """직접 내려받을 URL (로컬은 없음 → 앱이 파일을 서빙)"""
+        return None
+
+
+class S3Storage:
+    """S3 호환 오브젝트 스토리지"""
+
+    def __init__(self, bucket, prefix='outputs/', endpoint_url=None, region=None,
+                 url_ttl=300, client=None):
+        """
+        Args:
+            bucket: 버킷 이름
+            prefix: 키 접두사
+            endpoint_url: S3 호환 엔드포인트 (없으면 AWS)
+            url_ttl: presigned URL 유효 시간(초)
+            client: 미리 만든 boto3 S3 클라이언트 (없으면 생성)
+        """
+        if client is None:
+            if not BOTO3_AVAILABLE:
+                raise RuntimeError("S3 저장소에는 boto3가 필요합니다 (pip install boto3)")
+            client = boto3.client(
+                's3',
+                endpoint_url=endpoint_url,
+                region_name=region or 'us-east-1',
+                # MinIO 등 S3 호환 서버는 경로 방식 주소가 기본
+                config=BotoConfig(s3={'addressing_style': 'path'} if endpoint_url else {},
+                                  signature_version='s3v4'),
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_ttl = url_ttl
+
+    def key(self, name):
+        return f'{self.prefix}{name}'
+
+    def local_path(self, name):
+        return None
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def size(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['ContentLength']
+
+    def write(self, name, data):
+        # PUT은 객체 단위로 원자적 — 읽는 쪽은 이전 객체 또는 완성된 새 객체만 봄
+        self.client.put_object(Bucket=self.bucket, Key=self.key(name), Body=data,
+                               ContentType=content_type(name))
+
+    def publish(self, path):
+        name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            self.write(name, f.read())
+        return name
+
+    def url(self, name, download_name=None):
+        """presigned GET URL (Range 요청은 스토리지가 직접 처리)"""
+        params = {'Bucket': self.bucket, 'Key': self.key(name)}
+        if download_name:
+            params['ResponseContentDisposition'] = f'attachment; filename="{download_name}"'
+        return self.client.generate_presigned_url('get_object', Params=params,
+                                                  ExpiresIn=self.url_ttl)
+
+
+def content_type(name):
+    ext = name.rsplit('.', 1)[-1].lower()
+    return {
+        'svg': 'image/svg+xml',
+        'pdf': 'application/pdf',
+        'dxf': 'image/vnd.dxf',
+        'ps': 'application/postscript',
+    }.get(ext, 'application/octet-stream')
+
+
+def from_env(local_directory):
+    """PAWBOX_STORAGE 설정에 따른 저장소"""
+    kind = os.environ.get('PAWBOX_STORAGE', 'local').lower()
+    if kind == 'local':
+        return LocalStorage(local_directory)
+    if kind == 's3':
+        bucket = os.environ.get('PAWBOX_S3_BUCKET')
+        if not bucket:
+            raise RuntimeError("PAWBOX_STORAGE=s3에는 PAWBOX_S3_BUCKET이 필요합니다")
+        return S3Storage(
+            bucket,
+            prefix=os.environ.get('PAWBOX_S3_PREFIX', 'outputs/'),
+            endpoint_url=os.environ.get('PAWBOX_S3_ENDPOINT'),
+            region=os.environ.get('PAWBOX_S3_REGION'),
+            url_ttl=int(os.environ.get('PAWBOX_S3_URL_TTL', 300)),
+        )
+    raise RuntimeError(f"알 수 없는 PAWBOX_STORAGE: {kind}")
@@ -0,0 +1,372 @@
+"""
+스트리밍 이미지 수신 모듈
+요청 본문을 청크 단위로 읽어 base64를 점진적으로 디코딩하며 바로 디스크에 씁니다.
+(request.get_json() → b64decode → write 로 이미지 사본이 3개 이상 메모리에 올라가던 문제 해결)
+
+지원 형식:
+  - application/json: {"image_base64": "...", "filename": ..., "method": ..., ...}
+    image_base64 외 필드는 작은 값만 허용 (FIELD_LIMIT)
+  - application/octet-stream: 본문 = 이미지 원본 바이트, 나머지는 쿼리 파라미터
+"""
+
+import os
+import json
+import uuid
+import string
+import binascii
+
+from werkzeug.utils import secure_filename
+
+
+CHUNK_SIZE = 64 * 1024
+FIELD_LIMIT = 64 * 1024    # image_base64 외 필드의 최대 크기
+
+_B64_ALPHABET = (string.ascii_letters + string.digits + '+/').encode()
+# b64decode(validate=False)처럼 알파벳 외 문자(공백/개행 등)는 버린다
+_B64_DELETE = bytes(c for c in range(256) if c not in _B64_ALPHABET)
+_WHITESPACE = b' \t\r\n'
+
+
+class Base64JsonStreamDecoder:
+    """
+    최상위 JSON 객체를 청크 단위로 파싱.
+    image_field 문자열 값은 버퍼링 없이 base64 디코딩해 sink에 쓰고,
+    나머지 필드는 작은 dict로 모읍니다.
+    """
+
+    def __init__(self, sink, image_field='image_base64', field_limit=FIELD_LIMIT):
+        self.sink = sink
+        self.image_field = image_field
+        self.field_limit = field_limit
+
+        self.fields = {}
+        self.found_image = False
+        self.decoded_bytes = 0
+
+        self._state = 'start'
+        self._buf = bytearray()      # 현재 키/값 원문
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._pending = b''          # 4바이트 정렬 전 base64 잔여분
+
+    # ──────────────────────────────────────────────────────────
+    #  base64 값 처리
+    # ──────────────────────────────────────────────────────────
+
+    def _emit_base64(self, data, final=False):
+        data = self._pending + data.translate(None, _B64_DELETE)
+        usable = len(data) if final else len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            block = data[:usable]
+            if final and len(block) % 4:
+                block += b'=' * (-len(block) % 4)
+            decoded = _b64decode(block)
+            self.decoded_bytes += len(decoded)
+            self.sink.write(decoded)
+
+    def _feed_base64(self, chunk, pos):
+        """닫는 따옴표까지 한 번에 잘라 처리. Returns: 다음 위치"""
+        quote = chunk.find(b'"', pos)
+        stop = len(chunk) if quote < 0 else quote
+        segment = chunk[pos:stop]
+
+        # 청크 경계에 걸린 이스케이프 처리
+        if self._escape:
+            segment = b'\\' + segment
+            self._escape = False
+        if segment.endswith(b'\\') and quote < 0:
+            segment = segment[:-1]
+            self._escape = True
+
+        # JSON 이스케이프: \/ → '/', 줄바꿈 이스케이프(\n 등)는 버림
+        if b'\\' in segment:
+            segment = segment.replace(b'\\/', b'/')
+            for esc in (b'\\n', b'\\r', b'\\t'):
+                segment = segment.replace(esc, b'')
+        self._emit_base64(segment)
+
+        if quote < 0:
+            return stop
+
+        # 값 종료
+        self._emit_base64(b'', final=True)
+        if self._pending:
+            raise ValueError('base64 데이터 길이가 올바르지 않습니다')
+        self.found_image = True
+        self._state = 'after_value'
+        return stop + 1
+
+    # ──────────────────────────────────────────────────────────
+    #  일반 토큰 처리
+    # ──────────────────────────────────────────────────────────
+
+    def _append(self, byte):
+        self._buf.append(byte)
+        if len(self._buf) > self.field_limit:
+            raise ValueError('JSON 필드가 너무 큽니다')
+
+    def _finish_value(self):
+        self.fields[self._key] = json.loads(bytes(self._buf))
+        self._buf.clear()
+
+    def feed(self, chunk):
+        pos = 0
+        end = len(chunk)
+        while pos < end:
+            state = self._state
+
+            if state == 'b64':
+                pos = self._feed_base64(chunk, pos)
+                continue
+
+            c = chunk[pos]
+            pos += 1
+
+            if state in ('start', 'key_or_end', 'colon', 'value_start', 'after_value', 'done') \
+                    and c in _WHITESPACE:
+                continue
+
+            if state == 'start':
+                if c != ord('{'):
+                    raise ValueError('JSON 객체가 아닙니다')
+                self._state = 'key_or_end'
+
+            elif state == 'key_or_end':
+                if c == ord('}'):
+                    self._state = 'done'
+                elif c == ord('"'):
+                    self._buf = bytearray(b'"')
+                    self._state = 'key'
+                else:
+                    raise ValueError('JSON 키가 필요합니다')
+
+            elif state == 'key':
+                self._append(c)
+                if self._escape:
+                    self._escape = False
+                elif c == ord('\\'):
+                    self._escape = True
+                elif c == ord('"'):
+                    self._key = json.loads(bytes(self._buf))
+                    self._buf.clear()
+                    self._state = 'colon'
+
+            elif state == 'colon':
+                if c != ord(':'):
+                    raise ValueError("':'가 필요합니다")
+                self._state = 'value_start'
+
+            elif state == 'value_start':
+                if self._key == self.image_field:
+                    if c != ord('"'):
+                        raise ValueError(f'{self.image_field}는 문자열이어야 합니다')
+                    self._state = 'b64'
+                else:
+                    self._depth = 0
+                    self._in_string = False
+                    self._state = 'value'
+                    pos -= 1
+
+            elif state == 'value':
+                if self._in_string:
+                    self._append(c)
+                    if self._escape:
+                        self._escape = False
+                    elif c == ord('\\'):
+                        self._escape = True
+                    elif c == ord('"'):
+                        self._in_string = False
+                    continue
+
+                if self._depth == 0 and c in (ord(','), ord('}')):
+                    self._finish_value()
+                    self._state = 'key_or_end' if c == ord(',') else 'done'
+                    continue
+
+                self._append(c)
+                if c == ord('"'):
+                    self._in_string = True
+                elif c in (ord('{'), ord('[')):
+                    self._depth += 1
+                elif c in (ord('}'), ord(']')):
+                    self._depth -= 1
+
+            elif state == 'after_value':
+                if c == ord(','):
+                    self._state = 'key_or_end'
+                elif c == ord('}'):
+                    self._state = 'done'
+                else:
+                    raise ValueError("',' 또는 '}'가 필요합니다")
+
+            else:  # done
+                raise ValueError('JSON 객체 뒤에 데이터가 있습니다')
+
+    def close(self):
+        if self._state != 'done':
+            raise ValueError('JSON 본문이 완전하지 않습니다')
+        return self.fields
+
+
+def _b64decode(block):
+    try:
+        return binascii.a2b_base64(block)
+    except binascii.Error as e:
+        raise ValueError(f'base64 디코딩 실패: {e}') from e
+
+
+class StreamingUpload:
+    """
+    청크를 받아 uploads/에 임시 파일(.part)로 쓰고, 완료 시 최종 이름으로 rename.
+    메모리에는 청크 하나와 4바이트 미만의 base64 잔여분만 유지됩니다.
+    """
+
+    def __init__(self, upload_dir, raw=False, filename=None):
+        """
+        Args:
+            raw: True면 본문이 이미지 원본(octet-stream), False면 base64 JSON
+            filename: raw 모드의 원본 파일명 (JSON 모드는 본문의 filename 필드)
+        """
+        self.upload_dir = upload_dir
+        self.raw = raw
+        self.filename = filename
+        self.part_path = os.path.join(upload_dir, f'{uuid.uuid4()}.part')
+        self.file = open(self.part_path, 'wb')
+        self.decoder = None if raw else Base64JsonStreamDecoder(self.file)
+        self.size = 0
+
+    def feed(self, chunk):
+        if self.raw:
+            self.file.write(chunk)
+            self.size += len(chunk)
+        else:
+            self.decoder.feed(chunk)
+
+    def finish(self):
+        """
+        Returns: (unique_filename, filepath, fields)
+        Raises: ValueError — 이미지 데이터 없음 / 형식 오류
+        """
+        try:
+            fields = {} if self.raw else self.decoder.close()
+            self.file.close()
+            if self.raw and self.size == 0:
+                raise ValueError('이미지 데이터가 없습니다')
+            if not self.raw and not self.decoder.decoded_bytes:
+                raise ValueError('이미지 데이터가 없습니다')
+        except Exception:
+            self.abort()
+            raise
+
+        filename = secure_filename(self.filename or fields.get('filename') or 'upload.jpg') \
+            or 'upload.jpg'
+        unique_filename = f"{uuid.uuid4()}_{filename}"
+        filepath = os.path.join(self.upload_dir, unique_filename)
+        os.replace(self.part_path, filepath)
+        return unique_filename, filepath, fields
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def ingest(stream, upload_dir, raw=False, filename=None, chunk_size=CHUNK_SIZE):
+    """동기 스트림(file-like, Flask request.stream)에서 업로드 수신"""
+    upload = StreamingUpload(upload_dir, raw=raw, filename=filename)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            upload.feed(chunk)
+    except Exception:
+        upload.abort()
+        raise
+    return upload.finish()
+
+
+async def ingest_async(chunks, upload_dir, raw=False, filename=None):
+    """비동기 청크 이터레이터(Starlette request.stream())에서 업로드 수신"""
+    upload = StreamingUpload(upload_dir, raw=raw, filename=filename)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                upload.feed(chunk)
+    except Exception:
+        upload.abort()
+        raise
+    return upload.finish()
+
+
+def test_streaming_upload():
+    """테스트: 정확성 + 요청당 최대 메모리 (기존 get_json 경로 대비)"""
+    import io
+    import base64
+    import tempfile
+    import tracemalloc
+
+    print("StreamingUpload 테스트")
+    print("-" * 50)
+
+    image = os.urandom(12 * 1024 * 1024)
+    body = json.dumps({
+        'filename': '../cat photo.jpg',
+        'image_base64': base64.b64encode(image).decode().replace('/', '\\/'),
+        'method': 'auto',
+        'reference_size': 420,
+        'extra': {'nested': [1, 2, {'a': '}'}]},
+    }).encode()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        unique, path, fields = ingest(io.BytesIO(body), tmp)
+        _, streaming_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        with open(path, 'rb') as f:
+            assert f.read() == image
+        assert unique.endswith('_cat_photo.jpg'), unique
+        assert fields == {'filename': '../cat photo.jpg', 'method': 'auto',
+                          'reference_size': 420, 'extra': {'nested': [1, 2, {'a': '}'}]}}
+
+        # 기존 경로: 본문 → dict(str) → bytes → 파일
+        tracemalloc.start()
+        data = json.loads(io.BytesIO(body).read())
+        with open(os.path.join(tmp, 'legacy.jpg'), 'wb') as f:
+            f.write(base64.b64decode(data['image_base64']))
+        _, legacy_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del data
+
+        # 청크 경계가 이스케이프/필드 중간에 걸리는 경우
+        small = os.urandom(3001)
+        small_body = json.dumps({'image_base64': base64.encodebytes(small).decode().replace('/', '\\/'),
+                                 'filename': 'a"b.jpg'}).encode()
+        for size in (1, 2, 3, 7, 64):
+            _, path, fields = ingest(io.BytesIO(small_body), tmp, chunk_size=size)
+            with open(path, 'rb') as f:
+                assert f.read() == small, size
+            assert fields == {'filename': 'a"b.jpg'}
+
+        unique, path, fields = ingest(io.BytesIO(image), tmp, raw=True, filename='raw.png')
+        assert os.path.getsize(path) == len(image) and fields == {}
+
+        for bad in (b'{"method": "auto"}', b'{"image_base64": "abc', b'[1]'):
+            try:
+                ingest(io.BytesIO(bad), tmp)
+            except ValueError as e:
+                print(f"거부됨 {bad[:20]!r}: {e}")
+            else:
+                raise AssertionError(bad)
+        assert not [n for n in os.listdir(tmp) if n.endswith('.part')]
+
+    print(f"페이로드 {len(body) / 1e6:.1f}MB (이미지 {len(image) / 1e6:.1f}MB)")
+    print(f"최대 메모리 — 스트리밍: {streaming_peak / 1e6:.2f}MB, 기존: {legacy_peak / 1e6:.1f}MB")
+
+
+if __name__ == '__main__':
+    test_streaming_upload()
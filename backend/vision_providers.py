@@ -0,0 +1,530 @@
+"""
+Vision 제공자(provider) 추상화 + 요청 경주(hedging)
+OpenAI / Gemini(OpenAI 호환 엔드포인트) / 로컬 대역을 같은 chat.completions 형식으로 호출하고
+제공자·detail별 최근 지연을 추적합니다. 첫 제공자가 관측 p90을 넘기면 다음 제공자를 띄워
+먼저 도착한 유효 응답을 쓰고 나머지는 취소합니다 (동기 경로는 결과만 버림).
+
+환경변수:
+    PAWBOX_VISION_PROVIDERS   우선순위 순서 (기본 openai,gemini — 키가 있는 것만 사용, standin은 명시 시)
+    PAWBOX_HEDGE              1(기본) | 0 — 제공자가 둘 이상일 때 경주
+    PAWBOX_HEDGE_QUANTILE     경주 시작 기준 분위수 (기본 0.9)
+    PAWBOX_HEDGE_DELAY        표본이 모이기 전 기준 지연(초, 기본 3.0)
+    PAWBOX_HEDGE_BUDGET       최근 요청 중 경주 허용 비율 (기본 0.2 — 장애 시 부하 폭증 방지)
+    PAWBOX_VISION_TIMEOUT     제공자 호출 제한 시간(초, 기본 60)
+    GEMINI_API_KEY            Gemini 키
+    PAWBOX_GEMINI_MODEL       기본 gemini-2.0-flash
+    PAWBOX_GEMINI_BASE_URL    OpenAI 호환 엔드포인트 (기본 Google, 대역 서버로 바꿔 시험 가능)
+    PAWBOX_STANDIN_LATENCY    standin 지연 분포 (fake_openai.py 형식, 기본 lognormal:1.5,0.3)
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import deque
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# OpenAI (Gemini도 같은 클라이언트로 호출)
+try:
+    from openai import OpenAI, AsyncOpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OpenAI = AsyncOpenAI = None
+    OPENAI_AVAILABLE = False
+
+
+GEMINI_BASE_URL = 'https://generativelanguage.googleapis.com/v1beta/openai/'
+LATENCY_WINDOW = 200       # 제공자·detail별 보관할 최근 지연 표본 수
+MIN_SAMPLES = 20           # 분위수를 믿기 위한 최소 표본 수
+MIN_HEDGE_DELAY = 0.05     # 초
+
+
+class VisionProvider:
+    """chat.completions 형식 Vision 제공자"""
+
+    name = ''
+    method = ''    # 결과 method 라벨 (low detail이면 _low 접미사)
+
+    def __init__(self, model):
+        self.model = model
+
+    @property
+    def available(self):
+        return True
+
+    def complete(self, kwargs):
+        raise NotImplementedError
+
+    async def acomplete(self, kwargs):
+        raise NotImplementedError
+
+
+class OpenAICompatibleProvider(VisionProvider):
+    """OpenAI SDK로 호출하는 제공자 (base_url만 다르면 Gemini 등도 동일)"""
+
+    def __init__(self, model, api_key, base_url=None, timeout=60.0):
+        super().__init__(model)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        # 클라이언트는 처음 쓸 때 생성 (비동기 클라이언트는 사용하는 이벤트 루프에서)
+        self._client = None
+        self._async_client = None
+
+    def __getstate__(self):
+        """프로세스 풀로 보낼 때 클라이언트는 제외"""
+        state = self.__dict__.copy()
+        state.update(_client=None, _async_client=None)
+        return state
+
+    @property
+    def available(self):
+        return bool(self.api_key) and OPENAI_AVAILABLE
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                  timeout=self.timeout)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             timeout=self.timeout)
+        return self._async_client
+
+    def complete(self, kwargs):
+        return self.client.chat.completions.create(**{**kwargs, 'model': self.model})
+
+    async def acomplete(self, kwargs):
+        return await self.async_client.chat.completions.create(**{**kwargs, 'model': self.model})
+
+
+class OpenAIProvider(OpenAICompatibleProvider):
+    name = 'openai'
+    method = 'openai_gpt4o'
+
+    @classmethod
+    def from_env(cls, api_key=None, timeout=60.0):
+        # base_url은 OpenAI 클라이언트가 OPENAI_BASE_URL에서 직접 읽음
+        return cls('gpt-4o', api_key or os.environ.get('OPENAI_API_KEY'), timeout=timeout)
+
+
+class GeminiProvider(OpenAICompatibleProvider):
+    name = 'gemini'
+    method = 'gemini'
+
+    @classmethod
+    def from_env(cls, api_key=None, timeout=60.0):
+        return cls(
+            os.environ.get('PAWBOX_GEMINI_MODEL', 'gemini-2.0-flash'),
+            api_key or os.environ.get('GEMINI_API_KEY'),
+            base_url=os.environ.get('PAWBOX_GEMINI_BASE_URL', GEMINI_BASE_URL),
+            timeout=timeout,
+        )
+
+
+class StandInProvider(VisionProvider):
+    """
+    네트워크 없이 fake_openai.py와 같은 고정 응답을 지연 분포대로 돌려주는 프로세스 내 대역.
+    키 없이 개발하거나 경주 동작을 시험할 때 PAWBOX_VISION_PROVIDERS에 standin을 넣어 사용.
+    """
+
+    name = 'standin'
+    method = 'standin'
+
+    def __init__(self, latency='lognormal:1.5,0.3', answer=None, name=None):
+        super().__init__('standin')
+        from fake_openai import CANNED_ANSWER
+        self.latency = latency
+        self.answer = answer or CANNED_ANSWER
+        if name:
+            self.name = name
+
+    @classmethod
+    def from_env(cls, api_key=None, timeout=60.0):
+        return cls(os.environ.get('PAWBOX_STANDIN_LATENCY', 'lognormal:1.5,0.3'))
+
+    def _sample(self):
+        from fake_openai import parse_latency
+        return max(0.0, parse_latency(self.latency)())
+
+    def _response(self, kwargs):
+        from fake_openai import estimate_prompt_tokens, schema_fields
+        content = json.dumps(schema_fields(self.answer, kwargs), ensure_ascii=False)
+        return SimpleNamespace(
+            id=f'standin-{uuid.uuid4().hex}',
+            choices=[SimpleNamespace(
+                finish_reason='stop',
+                message=SimpleNamespace(role='assistant', content=content, refusal=None),
+            )],
+            usage=SimpleNamespace(prompt_tokens=estimate_prompt_tokens(kwargs),
+                                  completion_tokens=len(content) // 3),
+        )
+
+    def complete(self, kwargs):
+        time.sleep(self._sample())
+        return self._response(kwargs)
+
+    async def acomplete(self, kwargs):
+        await asyncio.sleep(self._sample())
+        return self._response(kwargs)
+
+
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'gemini': GeminiProvider,
+    'standin': StandInProvider,
+}
+
+
+class VisionRouter:
+    """제공자 선택 + 지연 추적 + 경주"""
+
+    def __init__(self, providers, hedge=True, quantile=0.9, initial_delay=3.0,
+                 budget=0.2, threads=32):
+        """
+        Args:
+            providers: 우선순위 순서의 VisionProvider 목록 (사용 불가 제공자는 제외)
+            hedge: 제공자가 둘 이상일 때 경주 여부
+            quantile: 이 분위수 지연을 넘기면 다음 제공자 시작
+            initial_delay: 표본이 MIN_SAMPLES 미만일 때의 기준 지연(초)
+            budget: 최근 100건 중 경주를 허용할 최대 비율
+            threads: 동기 경로 호출 스레드 수
+        """
+        self.providers = [p for p in providers if p.available]
+        self.hedge = hedge
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.budget = budget
+        self.threads = threads
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._latency = {}       # (제공자, detail) → deque(초)
+        self._recent = deque(maxlen=100)
+        self._stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0,
+                       'cancelled': 0, 'budget_skipped': 0}
+        self._provider_stats = {p.name: {'calls': 0, 'errors': 0, 'wins': 0, 'cancelled': 0}
+                                for p in self.providers}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_lock=None, _executor=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        return [p.name for p in self.providers]
+
+    def order(self, preferred=None):
+        """preferred 제공자를 맨 앞으로. 없으면 설정 순서 그대로."""
+        first = [p for p in self.providers if p.name == preferred]
+        return first + [p for p in self.providers if p.name != preferred]
+
+    # ──────────────────────────────────────────────────────────
+    #  지연 추적
+    # ──────────────────────────────────────────────────────────
+
+    def _record(self, provider, kind, seconds, outcome):
+        """outcome: 'ok' | 'error' | 'cancelled' (취소는 '최소 이만큼 걸림'으로 기록)"""
+        with self._lock:
+            stats = self._provider_stats[provider.name]
+            stats['calls'] += 1
+            if outcome == 'error':
+                stats['errors'] += 1
+                return
+            if outcome == 'cancelled':
+                stats['cancelled'] += 1
+            self._latency.setdefault((provider.name, kind), deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def percentile(self, provider, kind, q):
+        with self._lock:
+            samples = sorted(self._latency.get((provider.name, kind), ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self, provider, kind):
+        """이 제공자 호출 후 다음 제공자를 띄울 때까지 기다릴 시간(초)"""
+        observed = self.percentile(provider, kind, self.quantile)
+        return max(MIN_HEDGE_DELAY, observed if observed is not None else self.initial_delay)
+
+    def _may_hedge(self):
+        with self._lock:
+            if not self._recent or sum(self._recent) < self.budget * len(self._recent) + 1:
+                return True
+            self._stats['budget_skipped'] += 1
+            return False
+
+    def _finish(self, winner, started, hedged):
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['hedged'] += int(len(started) > 1 and hedged)
+            self._stats['hedge_wins'] += int(winner is not started[0])
+            self._provider_stats[winner.name]['wins'] += 1
+            self._recent.append(int(hedged))
+        info = {'provider': winner.name}
+        if len(started) > 1:
+            info['raced'] = [p.name for p in started]
+        return info
+
+    # ──────────────────────────────────────────────────────────
+    #  동기 경로 (gunicorn 스레드) — 패배한 호출은 끝까지 돌지만 결과는 버림
+    # ──────────────────────────────────────────────────────────
+
+    def _timed(self, provider, kind, attempt):
+        started = time.perf_counter()
+        try:
+            result = attempt(provider)
+        except Exception:
+            self._record(provider, kind, time.perf_counter() - started, 'error')
+            raise
+        self._record(provider, kind, time.perf_counter() - started, 'ok')
+        return result
+
+    def race(self, attempt, kind='high', preferred=None):
+        """
+        Args:
+            attempt: provider → 검증된 결과. 예외면 실패로 보고 다음 제공자 시도
+            kind: 지연 추적 구분 (detail)
+        Returns:
+            (결과, {'provider', 'raced'?})
+        Raises: 모든 제공자가 실패하면 마지막 예외
+        """
+        queue = self.order(preferred)
+        if not queue:
+            raise RuntimeError("사용 가능한 Vision 제공자가 없습니다 (OPENAI_API_KEY / GEMINI_API_KEY)")
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='vision')
+
+        started, pending, hedged = [], {}, False
+        hedging_disabled = not self.hedge
+        last_error = None
+
+        def launch():
+            provider = queue.pop(0)
+            started.append(provider)
+            pending[self._executor.submit(self._timed, provider, kind, attempt)] = provider
+
+        launch()
+        while pending:
+            timeout = None
+            if queue and not hedging_disabled:
+                timeout = self.hedge_delay(started[-1], kind)
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # 관측 분위수 초과 → 다음 제공자와 경주
+                if self._may_hedge():
+                    hedged = True
+                    launch()
+                    continue
+                # 예산 소진 → 시간 기준 경주만 중단 (오류 시 다음 제공자로 넘기는 대기열은 유지)
+                hedging_disabled = True
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[Vision] {provider.name} 실패: {e}")
+                    last_error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                return result, self._finish(provider, started, hedged)
+
+            if not pending and queue:
+                with self._lock:
+                    self._stats['failovers'] += 1
+                launch()
+
+        raise last_error
+
+    # ──────────────────────────────────────────────────────────
+    #  비동기 경로 (ASGI) — 패배한 호출은 취소해 연결을 끊음
+    # ──────────────────────────────────────────────────────────
+
+    async def _atimed(self, provider, kind, attempt):
+        started = time.perf_counter()
+        try:
+            result = await attempt(provider)
+        except asyncio.CancelledError:
+            self._record(provider, kind, time.perf_counter() - started, 'cancelled')
+            raise
+        except Exception:
+            self._record(provider, kind, time.perf_counter() - started, 'error')
+            raise
+        self._record(provider, kind, time.perf_counter() - started, 'ok')
+        return result
+
+    async def arace(self, attempt, kind='high', preferred=None):
+        """race()의 비동기 버전. attempt는 provider → awaitable."""
+        queue = self.order(preferred)
+        if not queue:
+            raise RuntimeError("사용 가능한 Vision 제공자가 없습니다 (OPENAI_API_KEY / GEMINI_API_KEY)")
+
+        started, pending, hedged = [], {}, False
+        hedging_disabled = not self.hedge
+        last_error = None
+
+        def launch():
+            provider = queue.pop(0)
+            started.append(provider)
+            pending[asyncio.ensure_future(self._atimed(provider, kind, attempt))] = provider
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if queue and not hedging_disabled:
+                    timeout = self.hedge_delay(started[-1], kind)
+                done, _ = await asyncio.wait(list(pending), timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if self._may_hedge():
+                        hedged = True
+                        launch()
+                        continue
+                    hedging_disabled = True
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        print(f"[Vision] {provider.name} 실패: {task.exception()}")
+                        last_error = task.exception()
+                        continue
+                    return task.result(), self._finish(provider, started, hedged)
+
+                if not pending and queue:
+                    with self._lock:
+                        self._stats['failovers'] += 1
+                    launch()
+        finally:
+            # 패배한 호출 취소 (httpx 요청이 끊겨 제공자 쪽 작업도 중단)
+            for task in pending:
+                task.cancel()
+            if pending:
+                with self._lock:
+                    self._stats['cancelled'] += len(pending)
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        raise last_error
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            providers = {name: dict(s) for name, s in self._provider_stats.items()}
+            keys = list(self._latency)
+        for name, kind in keys:
+            provider = next(p for p in self.providers if p.name == name)
+            latency = {}
+            for label, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+                value = self.percentile(provider, kind, q)
+                latency[f'{label}_ms'] = round(value * 1000, 1) if value is not None else None
+            providers[name][f'latency_{kind}'] = latency
+        stats['providers'] = providers
+        stats['hedge'] = self.hedge and len(self.providers) > 1
+        return stats
+
+
+def from_env(openai_key=None):
+    """PAWBOX_VISION_PROVIDERS / PAWBOX_HEDGE* 설정에 따른 라우터"""
+    timeout = float(os.environ.get('PAWBOX_VISION_TIMEOUT', 60))
+    providers = []
+    for name in os.environ.get('PAWBOX_VISION_PROVIDERS', 'openai,gemini').split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in PROVIDERS:
+            raise RuntimeError(f"알 수 없는 Vision 제공자: {name}")
+        providers.append(PROVIDERS[name].from_env(
+            api_key=openai_key if name == 'openai' else None, timeout=timeout
+        ))
+
+    return VisionRouter(
+        providers,
+        hedge=os.environ.get('PAWBOX_HEDGE', '1') != '0',
+        quantile=float(os.environ.get('PAWBOX_HEDGE_QUANTILE', 0.9)),
+        initial_delay=float(os.environ.get('PAWBOX_HEDGE_DELAY', 3.0)),
+        budget=float(os.environ.get('PAWBOX_HEDGE_BUDGET', 0.2)),
+    )
+
+
+def test_vision_providers():
+    """꼬리 지연이 긴 제공자 + 안정적인 제공자: 경주 여부에 따른 p50/p99 비교"""
+    import random
+
+    random.seed(7)
+    print("VisionRouter 경주 테스트 (프로세스 내 대역)")
+    print("-" * 50)
+
+    async def run(hedge, n=300):
+        # 주 제공자: 중앙값 20ms, 8% 확률로 200ms+ 정체 / 보조: 30ms 안팎
+        slow = StandInProvider('lognormal:0.02,0.2', name='primary')
+        original = slow._sample
+        slow._sample = lambda: original() + (0.2 if random.random() < 0.08 else 0.0)
+        steady = StandInProvider('lognormal:0.03,0.15', name='secondary')
+        router = VisionRouter([slow, steady], hedge=hedge, initial_delay=0.06, budget=0.3)
+
+        async def attempt(provider):
+            response = await provider.acomplete({'messages': []})
+            return json.loads(response.choices[0].message.content)
+
+        latencies = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            result, info = await router.arace(attempt)
+            assert result['width'] == 520 and info['provider'] in ('primary', 'secondary')
+            latencies.append(time.perf_counter() - t0)
+        latencies.sort()
+        return latencies, router.stats()
+
+    for hedge in (False, True):
+        latencies, stats = asyncio.run(run(hedge))
+        p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+        print(f"hedge={hedge!s:<5} p50 {p(0.5):6.0f}ms  p90 {p(0.9):6.0f}ms  p99 {p(0.99):6.0f}ms  "
+              f"경주 {stats['hedged']}회, 보조 승리 {stats['hedge_wins']}회, 취소 {stats['cancelled']}회")
+
+    # 실패 → 즉시 다음 제공자 (동기 경로)
+    class Broken(StandInProvider):
+        def complete(self, kwargs):
+            raise RuntimeError('stand-in 장애')
+
+    router = VisionRouter([Broken('0', name='broken'), StandInProvider('0.01')])
+    result, info = router.race(lambda p: p.complete({'messages': []}))
+    assert info['provider'] == 'standin' and router.stats()['failovers'] == 1
+    print(f"장애 전환: {info}")
+
+    # 경주 예산 소진 중에도 (느리다가) 실패하면 다음 제공자로 전환
+    class SlowBroken(StandInProvider):
+        def complete(self, kwargs):
+            time.sleep(0.2)
+            raise RuntimeError('stand-in 장애')
+
+    router = VisionRouter([SlowBroken('0', name='broken'), StandInProvider('0.01')],
+                          initial_delay=0.01, budget=0.0)
+    router._recent.extend([1] * 20)
+    result, info = router.race(lambda p: p.complete({'messages': []}))
+    assert info['provider'] == 'standin' and router.stats()['budget_skipped'] >= 1
+    print(f"예산 소진 중 장애 전환: {info}")
+
+
+if __name__ == '__main__':
+    test_vision_providers()
@@ -12,17 +12,63 @@ export interface Dimensions {
     confidence: number;
     notes: string;
     method: string;
+    /** 응답한 Vision 제공자 / 경주한 제공자 목록 */
+    provider?: "openai" | "gemini" | "standin";
+    raced?: string[];
+    animal_type?: string;
+    posture?: string;
+    usage?: {
+        prompt_tokens: number;
+        completion_tokens: number;
+        latency_ms: number;
+    };
+    knowledge?: {
+        count: number;
+        std: { width: number; height: number; depth: number };
+        cv: number;
+    };
+    cascade?: {
+        tier: "local" | "knowledge_base" | "vision_high";
+        tiers_tried: string[];
+        /** 지식 베이스로 답하지 못한 사유 (high detail로 올림) */
+        escalation?: "unknown" | "high_variance" | "low_confidence" | "classify_failed";
+        /** failed: 호출 실패 (이 경우 결과는 서버에 재사용용으로 기록되지 않음) */
+        steps: {
+            tier: string;
+            failed?: boolean;
+            prompt_tokens?: number;
+            completion_tokens?: number;
+            latency_ms?: number;
+        }[];
+        latency_ms: number;
+        prompt_tokens: number;
+        completion_tokens: number;
+        saved_tokens_est?: number;
+        saved_usd_est?: number;
+        saved_ms_est?: number;
+    };
 }
 
 export interface AnalyzeResponse {
     success: boolean;
     dimensions: Dimensions;
+    /** 업로드 참조 — 이후 요청에 보내면 재업로드·재분석 없음 */
+    image_id: string;
     image_path: string;
     error?: string;
 }
 
+/** 실제로 그린 치수 (양자화 정책 적용 후) */
+export interface BoxDimensions {
+    width: number;
+    height: number;
+    depth: number;
+    thickness: number;
+}
+
 export interface GenerateResponse {
     success: boolean;
+    box_dimensions: BoxDimensions;
     filename: string;
     download_url: string;
     file_size: number;
@@ -32,12 +78,32 @@ export interface GenerateResponse {
 export interface GenerateFromImageResponse {
     success: boolean;
     dimensions: Dimensions;
+    box_dimensions: BoxDimensions;
+    image_id: string;
     filename: string;
     download_url: string;
     file_size: number;
     error?: string;
 }
 
+/**
+ * POST 요청 — 네트워크 오류 시 같은 Idempotency-Key로 재시도
+ * (서버가 키 기준으로 중복 업로드/분석을 막고 첫 응답을 돌려줌)
+ */
+async function postWithRetry(url: string, init: RequestInit, retries = 2): Promise<Response> {
+    const headers = new Headers(init.headers);
+    headers.set("Idempotency-Key", crypto.randomUUID());
+
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await fetch(url, { ...init, method: "POST", headers });
+        } catch (err) {
+            if (attempt >= retries) throw err;
+            await new Promise((resolve) => setTimeout(resolve, 500 * 2 ** attempt));
+        }
+    }
+}
+
 /** 이미지 업로드 → 치수 분석 */
 export async function analyzeImage(
     file: File,
@@ -47,8 +113,7 @@ export async function analyzeImage(
     formData.append("image", file);
     formData.append("method", method);
 
-    const response = await fetch(`${API_BASE}/api/analyze`, {
-        method: "POST",
+    const response = await postWithRetry(`${API_BASE}/api/analyze`, {
         body: formData,
     });
 
@@ -65,8 +130,7 @@ export async function generateBox(
     dimensions: Pick<Dimensions, "width" | "height" | "depth">,
     thickness = 3.0,
 ): Promise<GenerateResponse> {
-    const response = await fetch(`${API_BASE}/api/generate`, {
-        method: "POST",
+    const response = await postWithRetry(`${API_BASE}/api/generate`, {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
             ...dimensions,
@@ -84,18 +148,59 @@ export async function generateBox(
     return response.json();
 }
 
-/** 이미지에서 직접 박스 도면 생성 (통합) */
+export interface InlineBox {
+    svg: string;
+    /** 서버가 양자화한 실제 치수 [가로, 세로, 깊이, 두께] */
+    dimensions: number[];
+}
+
+/** 치수 → SVG 도면 본문을 바로 받음 (파일 저장·미리보기 요청 없이 한 번에) */
+export async function generateBoxInline(
+    dimensions: Pick<Dimensions, "width" | "height" | "depth">,
+    thickness = 3.0,
+    persist = false,
+): Promise<InlineBox> {
+    const response = await postWithRetry(`${API_BASE}/api/generate?inline=1`, {
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+            ...dimensions,
+            thickness,
+            format: "svg",
+            simple: true,
+            persist,
+        }),
+    });
+
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({ error: "서버 오류" }));
+        throw new Error(err.error || "도면 생성 실패");
+    }
+
+    const header = response.headers.get("X-Box-Dimensions") ?? "";
+    return {
+        svg: await response.text(),
+        dimensions: header ? header.split(",").map(Number) : [],
+    };
+}
+
+/**
+ * 이미지에서 직접 박스 도면 생성 (통합)
+ * image에 이전 응답의 image_id를 넘기면 저장된 이미지·분석 결과를 재사용
+ */
 export async function generateFromImage(
-    file: File,
+    image: File | string,
     thickness = 3.0,
+    overrides: Partial<Pick<Dimensions, "width" | "height" | "depth">> = {},
 ): Promise<GenerateFromImageResponse> {
     const formData = new FormData();
-    formData.append("image", file);
+    formData.append(typeof image === "string" ? "image_id" : "image", image);
+    for (const [key, value] of Object.entries(overrides)) {
+        formData.append(key, String(value));
+    }
     formData.append("thickness", String(thickness));
     formData.append("format", "svg");
 
-    const response = await fetch(`${API_BASE}/api/generate-from-image`, {
-        method: "POST",
+    const response = await postWithRetry(`${API_BASE}/api/generate-from-image`, {
         body: formData,
     });
 
@@ -117,6 +222,81 @@ export function getPreviewUrl(filename: string): string {
     return `${API_BASE}/preview/${filename}`;
 }
 
+export interface LivePreviewParams {
+    width: number;
+    height: number;
+    depth: number;
+    thickness: number;
+}
+
+export interface LivePreviewMessage {
+    type: "full" | "patch" | "error";
+    svg?: string;
+    parts?: Record<string, { transform?: string | null; body?: string }>;
+    canvas?: [number, number];
+    params?: LivePreviewParams;
+    render_ms?: number;
+    error?: string;
+}
+
+/** 실시간 미리보기 메시지를 container 안의 SVG에 적용 (바뀐 패널/치수선만 교체) */
+export function applyLivePreview(container: HTMLElement, message: LivePreviewMessage): void {
+    if (message.type === "full" && message.svg) {
+        container.innerHTML = message.svg;
+        return;
+    }
+    const svg = container.querySelector("svg");
+    if (message.type !== "patch" || !svg) return;
+
+    if (message.canvas) {
+        const [w, h] = message.canvas;
+        svg.setAttribute("width", `${w}mm`);
+        svg.setAttribute("height", `${h}mm`);
+        svg.setAttribute("viewBox", `0 0 ${w} ${h}`);
+    }
+    for (const [id, part] of Object.entries(message.parts ?? {})) {
+        const el = svg.querySelector(`#${id}`);
+        if (!el) continue;
+        if (part.transform !== undefined) {
+            if (part.transform) el.setAttribute("transform", part.transform);
+            else el.removeAttribute("transform");
+        }
+        if (part.body !== undefined) el.innerHTML = part.body;
+    }
+}
+
+/**
+ * 치수 편집 실시간 미리보기 (ASGI 모드의 /ws/preview)
+ * update()는 바뀐 항목만 보내도 되며, 서버가 렌더링 중 들어온 변경을 합쳐 최신 값만 그립니다.
+ */
+export function openLivePreview(
+    container: HTMLElement,
+    onMessage?: (message: LivePreviewMessage) => void,
+) {
+    const socket = new WebSocket(`${API_BASE.replace(/^http/, "ws")}/ws/preview`);
+    let queued: Partial<LivePreviewParams> | null = null;
+
+    socket.onopen = () => {
+        if (queued) socket.send(JSON.stringify(queued));
+        queued = null;
+    };
+    socket.onmessage = (event) => {
+        const message: LivePreviewMessage = JSON.parse(event.data);
+        applyLivePreview(container, message);
+        onMessage?.(message);
+    };
+
+    return {
+        update(params: Partial<LivePreviewParams>) {
+            if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify(params));
+            else queued = { ...queued, ...params };
+        },
+        close() {
+            socket.close();
+        },
+    };
+}
+
 /** 백엔드 헬스 체크 */
 export async function checkHealth(): Promise<boolean> {
     try {